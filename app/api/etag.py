@@ -0,0 +1,75 @@
+import hashlib
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.models.season import Season
+from app.models.user import User
+
+# GET condicional: o ETag sai dos contadores de versão (app/services/data_version.py),
+# então a validação custa no máximo uma query pequena. Se o If-None-Match bater,
+# a dependência responde 304 antes do corpo do endpoint rodar.
+
+def make_etag(*parts) -> str:
+    """ETag forte a partir das partes (recurso, ids, versões, query string)."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match usa comparação fraca (W/"x" vale o mesmo que "x")."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def check_not_modified(request: Request, etag: str, cache_control: str = "no-cache"):
+    """Levanta 304 (sem corpo) se o cliente já tem essa versão."""
+    if etag_matches(request, etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def conditional(request: Request, response: Response, etag: str, private: bool = False) -> str:
+    """304 se o cliente já tem a versão; senão grava ETag/Cache-Control na resposta do endpoint."""
+    # no-cache: o navegador guarda a resposta, mas sempre revalida com o If-None-Match
+    cache_control = "private, no-cache" if private else "no-cache"
+    check_not_modified(request, etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return etag
+
+def _season_version(db: Session, season_id: Optional[int]):
+    """(id, data_version) da temporada pedida ou da ativa. (None, 0) se não existir."""
+    query = db.query(Season.id, Season.data_version)
+    row = query.filter(Season.id == season_id).first() if season_id else query.filter(Season.is_active == True).first()
+    return (row.id, row.data_version or 0) if row else (None, 0)
+
+def races_etag(
+    request: Request,
+    response: Response,
+    season_id: Optional[int] = Query(None),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> str:
+    """Calendário da temporada: muda com Season.data_version (CRUD, status e pontuação das corridas)."""
+    target_season_id, version = _season_version(db, season_id)
+    return conditional(request, response, make_etag("races", target_season_id, version))
+
+def user_etag(resource: str, with_active_season: bool = False):
+    """
+    Dependência para dados "do usuário logado": muda com User.data_version.
+    with_active_season=True inclui a temporada ativa (troca de temporada, corridas renomeadas).
+    """
+    def dependency(
+        request: Request,
+        response: Response,
+        db: Session = Depends(deps.get_db),
+        current_user: User = Depends(deps.get_current_user)
+    ) -> str:
+        parts = [resource, current_user.id, current_user.data_version or 0]
+        if with_active_season:
+            parts.extend(_season_version(db, None))
+        return conditional(request, response, make_etag(*parts), private=True)
+    return dependency
@@ -0,0 +1,81 @@
+import json
+import base64
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, DateTime
+from sqlalchemy.orm import Session
+
+from app.services import search_index
+
+# Paginação por cursor (keyset): o cursor é a chave de ordenação do último item da página,
+# e a próxima página começa com um WHERE "depois dessa chave" em vez de OFFSET.
+# Com um índice na ordem da listagem, a página 1000 custa o mesmo que a primeira.
+
+def encode_cursor(values) -> str:
+    """Cursor opaco (base64 url-safe do JSON da chave)."""
+    payload = json.dumps(list(values), default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int = None) -> list:
+    """Chave de ordenação do cursor. 400 se o cursor foi adulterado ou é de outra listagem."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return values
+
+def _cursor_value(column, value):
+    if value is not None and isinstance(column.type, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return value
+
+def _after(order_by: list, values: list):
+    """(a, b) "depois de" (va, vb) respeitando a direção de cada coluna: a > va OR (a = va AND b > vb)."""
+    conditions = []
+    for i, (column, descending) in enumerate(order_by):
+        previous = [c == v for (c, _), v in zip(order_by[:i], values[:i])]
+        conditions.append(and_(*previous, column < values[i] if descending else column > values[i]))
+    return or_(*conditions)
+
+def keyset_page(query, order_by: list, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    Aplica ordenação + cursor + LIMIT numa query de entidades e devolve o envelope {items, next_cursor}.
+    order_by: [(coluna, desc?)], terminando numa coluna única (ex: id) para a chave nunca empatar.
+    """
+    if cursor:
+        values = [_cursor_value(column, value) for (column, _), value in zip(order_by, decode_cursor(cursor, len(order_by)))]
+        query = query.filter(_after(order_by, values))
+
+    rows = query.order_by(
+        *[column.desc() if descending else column.asc() for column, descending in order_by]
+    ).limit(limit + 1).all()
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in order_by])
+    return {"items": items, "next_cursor": next_cursor}
+
+def search_page(db: Session, index: str, model, query: str, limit: int, cursor: Optional[str] = None,
+                criteria=(), only_active: bool = False, options=()) -> dict:
+    """
+    Mesmo envelope para buscas no índice em memória (services/search_index.py):
+    o cursor é a chave de relevância do último item, então as páginas seguintes não usam offset.
+    """
+    after = decode_cursor(cursor, 5) if cursor else None
+    try:
+        hits = search_index.search(db, index, query, limit + 1, after=after, only_active=only_active)
+    except TypeError: # Cursor com tipos que não batem com a chave de relevância
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+    page = hits[:limit]
+    items = search_index.fetch_ranked(db, model, [entity_id for _, entity_id in page], *criteria, options=options)
+    next_cursor = encode_cursor(page[-1][0]) if len(hits) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
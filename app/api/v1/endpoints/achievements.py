@@ -1,17 +1,28 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks
 from sqlalchemy.orm import Session
+from sqlalchemy import select
 
 from app.api import deps
+from app.api.etag import user_etag
 from app.models.achievement import Achievement, UserAchievement, AchievementRuleType
 from app.models.user import User
+from app.models.background_job import BackgroundJobKind
 from app.schemas.achievement import AchievementCreate, AchievementResponse, UserAchievementResponse
+from app.services.background_jobs import enqueue_job, run_background_job
+from app.services import data_version
 
 router = APIRouter()
 
+def schedule_backfill(db: Session, background_tasks: BackgroundTasks, achievement: Achievement):
+    """Agenda a entrega retroativa da conquista para quem já cumpre a meta."""
+    job = enqueue_job(db, BackgroundJobKind.ACHIEVEMENT_BACKFILL, {"achievement_id": achievement.id})
+    background_tasks.add_task(run_background_job, job.id)
+    achievement.backfill_job_id = job.id # Acompanhar em GET /admin/jobs/{id}
+
 # ... (Endpoints de Admin Create/Delete mantidos iguais) ...
 @router.post("/", response_model=AchievementResponse, status_code=status.HTTP_201_CREATED)
-def create_achievement(achievement_in: AchievementCreate, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_admin)):
+def create_achievement(achievement_in: AchievementCreate, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_admin)):
     existing = db.query(Achievement).filter(Achievement.name == achievement_in.name).first()
     if existing: raise HTTPException(status_code=400, detail="Já existe uma conquista com este nome.")
     new_achievement = Achievement(
@@ -21,8 +32,32 @@ def create_achievement(achievement_in: AchievementCreate, db: Session = Depends(
     db.add(new_achievement)
     db.commit()
     db.refresh(new_achievement)
+    schedule_backfill(db, background_tasks, new_achievement)
     return new_achievement
 
+@router.put("/{id}", response_model=AchievementResponse)
+def update_achievement(id: int, achievement_in: AchievementCreate, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_admin)):
+    """
+    Edita a conquista e reavalia todos os usuários em background.
+    Quem já tem a medalha continua com ela, mesmo que a meta tenha subido.
+    """
+    ach = db.query(Achievement).filter(Achievement.id == id).first()
+    if not ach: raise HTTPException(404, "Conquista não encontrada.")
+    duplicate = db.query(Achievement).filter(Achievement.name == achievement_in.name, Achievement.id != id).first()
+    if duplicate: raise HTTPException(status_code=400, detail="Já existe uma conquista com este nome.")
+    ach.name = achievement_in.name
+    ach.description = achievement_in.description
+    ach.icon = achievement_in.icon
+    ach.color = achievement_in.color
+    ach.rule_type = achievement_in.rule_type.value
+    ach.threshold = achievement_in.threshold
+    # Nome/ícone aparecem nas conquistas de quem já tem a medalha
+    data_version.bump_users(db, select(UserAchievement.user_id).where(UserAchievement.achievement_id == ach.id))
+    db.commit()
+    db.refresh(ach)
+    schedule_backfill(db, background_tasks, ach)
+    return ach
+
 @router.get("/all", response_model=List[AchievementResponse])
 def list_all_achievements(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     return db.query(Achievement).all()
@@ -31,6 +66,7 @@ def list_all_achievements(db: Session = Depends(deps.get_db), current_user: User
 def delete_achievement(id: int, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_admin)):
     ach = db.query(Achievement).filter(Achievement.id == id).first()
     if not ach: raise HTTPException(404, "Conquista não encontrada.")
+    data_version.bump_users(db, select(UserAchievement.user_id).where(UserAchievement.achievement_id == ach.id))
     db.delete(ach)
     db.commit()
     return {"message": "Conquista removida."}
@@ -41,7 +77,7 @@ def get_my_achievements(db: Session = Depends(deps.get_db), current_user: User =
 
 # --- NOVOS ENDPOINTS DE NOTIFICAÇÃO ---
 
-@router.get("/me/new", response_model=List[UserAchievementResponse])
+@router.get("/me/new", response_model=List[UserAchievementResponse], dependencies=[Depends(user_etag("achievements-new"))])
 def get_new_achievements(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
@@ -67,6 +103,7 @@ def mark_achievements_seen(
         UserAchievement.id.in_(ids),
         UserAchievement.user_id == current_user.id
     ).update({UserAchievement.seen: True}, synchronize_session=False)
+    data_version.bump_users(db, [current_user.id])
     
     db.commit()
     return {"message": "Marked as seen"}
\ No newline at end of file
@@ -1,9 +1,8 @@
 from typing import Any, List, Optional
 from app.models.ranking_cache import RankingCache
-from app.services.badge import BadgeService
 from app.services.email import EmailService
-from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks, Query
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 from sqlalchemy import desc, func
 
@@ -15,9 +14,19 @@ from app.models.race import Race, RaceResult
 from app.models.team import Team
 from app.models.bet import Bet # <--- Importante para contar apostas
 from app.schemas.season import SeasonCreate, SeasonResponse
+from app.schemas.pagination import Page
+from app.api.pagination import keyset_page, search_page
 from app.schemas.race import RaceStatus
 from app.services.push import PushService
-from app.services.scoring import calculate_race_points, calculate_race_points_async_wrapper 
+from app.services.scoring import preview_race_result
+from app.services.scoring_jobs import enqueue_scoring_job, get_latest_scoring_job, run_scoring_job
+from app.schemas.scoring_job import ScoringJobResponse
+from app.schemas.background_job import BackgroundJobResponse
+from app.models.background_job import BackgroundJob, BackgroundJobKind
+from app.services.background_jobs import enqueue_job, run_background_job
+from app.services.leaderboard import LeaderboardService
+from app.services.snapshots import publish_snapshots
+from app.services import data_version, search_index, grid_lookup
 
 router = APIRouter()
 
@@ -159,13 +168,15 @@ def get_dashboard_stats(
 # --- 1. CRUD F1 (TEAMS/DRIVERS) ---
 
 @router.post("/f1/teams/", status_code=status.HTTP_201_CREATED)
-def create_real_team(team_in: RealTeamBase, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
+def create_real_team(team_in: RealTeamBase, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season: raise HTTPException(status_code=400, detail="No active season.")
     new_team = RealTeam(**team_in.model_dump(), season_id=active_season.id)
     db.add(new_team)
     db.commit()
     db.refresh(new_team)
+    grid_lookup.invalidate(new_team.season_id)
+    background_tasks.add_task(publish_snapshots, grid_seasons=[new_team.season_id])
     return new_team
 
 @router.get("/f1/teams/")
@@ -175,25 +186,30 @@ def list_real_teams(db: Session = Depends(deps.get_db), current_user = Depends(d
     return db.query(RealTeam).filter(RealTeam.season_id == active_season.id).all()
 
 @router.put("/f1/teams/{team_id}")
-def update_real_team(team_id: int, team_in: RealTeamBase, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
+def update_real_team(team_id: int, team_in: RealTeamBase, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
     team = db.query(RealTeam).filter(RealTeam.id == team_id).first()
     if not team: raise HTTPException(404, "Team not found.")
     team.name = team_in.name
     team.logo_url = team_in.logo_url
     db.commit()
     db.refresh(team)
+    grid_lookup.invalidate(team.season_id)
+    background_tasks.add_task(publish_snapshots, grid_seasons=[team.season_id])
     return team
 
 @router.delete("/f1/teams/{team_id}")
-def delete_real_team(team_id: int, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
+def delete_real_team(team_id: int, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
     team = db.query(RealTeam).filter(RealTeam.id == team_id).first()
     if not team: raise HTTPException(404, "Team not found.")
+    season_id = team.season_id
     db.delete(team)
     db.commit()
+    grid_lookup.invalidate(season_id)
+    background_tasks.add_task(publish_snapshots, grid_seasons=[season_id])
     return {"message": "Team deleted"}
 
 @router.post("/f1/drivers/", status_code=status.HTTP_201_CREATED)
-def create_real_driver(driver_in: RealDriverBase, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
+def create_real_driver(driver_in: RealDriverBase, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season: raise HTTPException(400, "No active season.")
     team = db.query(RealTeam).filter(RealTeam.id == driver_in.real_team_id).first()
@@ -202,6 +218,8 @@ def create_real_driver(driver_in: RealDriverBase, db: Session = Depends(deps.get
     db.add(new_driver)
     db.commit()
     db.refresh(new_driver)
+    grid_lookup.invalidate(new_driver.season_id)
+    background_tasks.add_task(publish_snapshots, grid_seasons=[new_driver.season_id])
     return new_driver
 
 @router.get("/f1/drivers/")
@@ -211,7 +229,7 @@ def list_real_drivers(db: Session = Depends(deps.get_db), current_user = Depends
     return db.query(RealDriver).filter(RealDriver.season_id == active_season.id).all()
 
 @router.put("/f1/drivers/{driver_id}")
-def update_real_driver(driver_id: int, driver_in: RealDriverBase, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
+def update_real_driver(driver_id: int, driver_in: RealDriverBase, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
     driver = db.query(RealDriver).filter(RealDriver.id == driver_id).first()
     if not driver: raise HTTPException(404, "Driver not found.")
     driver.name = driver_in.name
@@ -220,14 +238,19 @@ def update_real_driver(driver_id: int, driver_in: RealDriverBase, db: Session =
     driver.real_team_id = driver_in.real_team_id
     db.commit()
     db.refresh(driver)
+    grid_lookup.invalidate(driver.season_id)
+    background_tasks.add_task(publish_snapshots, grid_seasons=[driver.season_id])
     return driver
 
 @router.delete("/f1/drivers/{driver_id}")
-def delete_real_driver(driver_id: int, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
+def delete_real_driver(driver_id: int, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_active_admin)):
     driver = db.query(RealDriver).filter(RealDriver.id == driver_id).first()
     if not driver: raise HTTPException(404, "Driver not found.")
+    season_id = driver.season_id
     db.delete(driver)
     db.commit()
+    grid_lookup.invalidate(season_id)
+    background_tasks.add_task(publish_snapshots, grid_seasons=[season_id])
     return {"message": "Driver deleted"}
 
 
@@ -238,7 +261,7 @@ def list_seasons(db: Session = Depends(deps.get_db), current_user: User = Depend
     return db.query(Season).order_by(Season.year.desc()).all()
 
 @router.post("/seasons/", response_model=SeasonResponse)
-def create_new_season(season_in: SeasonCreate, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_admin)):
+def create_new_season(season_in: SeasonCreate, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_admin)):
     existing = db.query(Season).filter(Season.year == season_in.year).first()
     if existing: raise HTTPException(status_code=400, detail="Temporada já existe")
     
@@ -248,28 +271,35 @@ def create_new_season(season_in: SeasonCreate, db: Session = Depends(deps.get_db
     db.add(new_season)
     db.commit()
     db.refresh(new_season)
+    background_tasks.add_task(publish_snapshots, seasons_list=True)
     return new_season
 
 @router.put("/seasons/{season_id}/close", response_model=SeasonResponse)
 def close_season(
     season_id: int, 
+    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db), 
     current_user: User = Depends(deps.get_current_active_admin)
 ):
+    """
+    Fecha a temporada e agenda a premiação em background.
+    Acompanhe a entrega das medalhas em GET /admin/jobs/{awards_job_id}.
+    """
     season = db.query(Season).filter(Season.id == season_id).first()
     if not season:
         raise HTTPException(status_code=404, detail="Temporada não encontrada")
     
-    # 1. Processar Premiação
-    badge_service = BadgeService()
-    badge_service.process_season_end_awards(db, season_id)
-    
-    # 2. Fechar temporada
+    # 1. Fechar temporada
     season.is_active = False
     season.is_finished = True
-    
     db.commit()
     db.refresh(season)
+    
+    # 2. Processar Premiação (fora da requisição)
+    job = enqueue_job(db, BackgroundJobKind.SEASON_AWARDS, {"season_id": season_id})
+    background_tasks.add_task(run_background_job, job.id)
+    background_tasks.add_task(publish_snapshots, seasons_list=True)
+    season.awards_job_id = job.id
     return season
 
 @router.post("/races/{race_id}/result")
@@ -286,42 +316,91 @@ def set_race_result(
     race = db.query(Race).filter(Race.id == race_id).first()
     if not race: raise HTTPException(status_code=404, detail="Corrida não encontrada")
     
-    # Se já existir resultado, removemos o objeto RaceResult antigo
+    # Se já existir resultado, corrige o gabarito no lugar.
+    # O job compara com o último gabarito pontuado e só re-calcula as apostas afetadas.
     existing_result = db.query(RaceResult).filter(RaceResult.race_id == race_id).first()
     if existing_result: 
-        db.delete(existing_result)
-        db.commit()
-    
-    # Cria novo gabarito
-    result = RaceResult(race_id=race_id, **result_in.model_dump())
-    db.add(result)
+        for field, value in result_in.model_dump().items():
+            setattr(existing_result, field, value)
+    else:
+        # Cria novo gabarito
+        db.add(RaceResult(race_id=race_id, **result_in.model_dump()))
     db.commit()
     
-    # --- AGENDAMENTO ASSÍNCRONO ---
-    # O servidor responde imediatamente, e o cálculo roda "por fora"
-    background_tasks.add_task(calculate_race_points_async_wrapper, race_id)
+    # --- AGENDAMENTO ASSÍNCRONO (JOB DURÁVEL) ---
+    # O servidor responde imediatamente, e o cálculo roda "por fora".
+    # O job fica gravado em scoring_jobs e é retomado se o worker reiniciar.
+    # Envios seguidos (correção de digitação) são agrupados no job que ainda está na fila.
+    job, created = enqueue_scoring_job(db, race_id)
+    if not created:
+        return {"msg": "Resultado atualizado! Ele será usado no processamento que já está na fila.", "job_id": job.id}
+
+    background_tasks.add_task(run_scoring_job, job.id)
     
-    return {"msg": "Resultado salvo! O processamento dos pontos iniciou em segundo plano."}
+    return {"msg": "Resultado salvo! O processamento dos pontos iniciou em segundo plano.", "job_id": job.id}
+
+@router.post("/races/{race_id}/preview")
+def preview_race_result_endpoint(
+    race_id: int,
+    result_in: RaceResultCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_admin)
+):
+    """
+    Simula o gabarito (somente leitura): pontos projetados, maiores movimentações
+    e classificação projetada, para validar antes de salvar o resultado.
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race: raise HTTPException(status_code=404, detail="Corrida não encontrada")
+    return preview_race_result(db, race, result_in)
+
+@router.get("/races/{race_id}/scoring-status", response_model=ScoringJobResponse)
+def get_scoring_status(
+    race_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_admin)
+):
+    """
+    Progresso do último processamento de pontos da corrida (status, fase atual e tempos).
+    """
+    job = get_latest_scoring_job(db, race_id)
+    if not job: raise HTTPException(status_code=404, detail="Nenhum processamento encontrado para esta corrida.")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=BackgroundJobResponse)
+def get_background_job(
+    job_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_admin)
+):
+    """Status e progresso de uma tarefa em background (ex: entrega retroativa de conquistas)."""
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job: raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return job
 
 # --- 4. MODERAÇÃO DE EQUIPES (COMUNIDADE) ---
 
-@router.get("/teams/", response_model=List[dict])
+@router.get("/teams/", response_model=Page[dict])
 def list_user_teams(
-    skip: int = 0,
-    limit: int = 50,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
     search: str | None = None,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_admin)
 ):
-    query = db.query(Team)
-    if search: query = query.filter(Team.name.ilike(f"%{search}%"))
-    teams = query.order_by(Team.id.desc()).offset(skip).limit(limit).all()
-    return [{"id": t.id, "name": t.name, "logo_url": t.logo_url, "primary_color": t.primary_color, "secondary_color": t.secondary_color, "captain_name": t.captain.full_name if t.captain else "Unknown", "partner_name": t.partner.full_name if t.partner else "Vaga", "total_points": t.total_points} for t in teams]
+    member_options = (joinedload(Team.captain), joinedload(Team.partner))
+    if search:
+        page = search_page(db, "teams", Team, search, limit, cursor, options=member_options)
+    else:
+        page = keyset_page(db.query(Team).options(*member_options), [(Team.id, True)], limit, cursor)
+    page["items"] = [{"id": t.id, "name": t.name, "logo_url": t.logo_url, "primary_color": t.primary_color, "secondary_color": t.secondary_color, "captain_name": t.captain.full_name if t.captain else "Unknown", "partner_name": t.partner.full_name if t.partner else "Vaga", "total_points": t.total_points} for t in page["items"]]
+    return page
 
 @router.put("/teams/{team_id}/moderate")
 def moderate_team(
     team_id: int,
     mod_in: TeamModeration,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_admin)
 ):
@@ -329,20 +408,31 @@ def moderate_team(
     if not team: raise HTTPException(404, "Equipe não encontrada")
     if mod_in.name: team.name = mod_in.name
     if mod_in.remove_logo: team.logo_url = None
+    data_version.bump_team_members(db, team)
+    seasons = LeaderboardService().refresh_display(db, team_ids=[team.id])
     db.commit()
+    search_index.invalidate("teams")
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     db.refresh(team)
     return {"message": "Equipe moderada com sucesso", "team_name": team.name}
 
 @router.delete("/teams/{team_id}")
 def delete_user_team(
     team_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_admin)
 ):
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team: raise HTTPException(404, "Equipe não encontrada")
+    member_ids = [team.captain_id, team.partner_id]
+    data_version.bump_users(db, member_ids)
     db.delete(team)
+    # Remove a equipe do ranking e tira o nome dela do card dos membros
+    seasons = LeaderboardService().refresh_display(db, user_ids=member_ids, team_ids=[team_id])
     db.commit()
+    search_index.invalidate("teams")
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     return {"message": "Equipe excluída com sucesso"}
 
 # --- ANNOUNCEMENTS (COM PUSH) ---
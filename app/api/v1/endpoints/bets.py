@@ -1,16 +1,19 @@
-from typing import List, Any
+from typing import List, Any, Optional
 from datetime import datetime
 import pytz
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session, contains_eager
 
 from app.api import deps
 from app.models.bet import Bet
 from app.models.race import Race, RaceStatus
 from app.models.user import User
 from app.models.team import Team # <--- Importar Team
-from app.schemas.bet import BetCreate, BetResponse
+from app.schemas.bet import BetCreate, BetResponse, BetDetailResponse
+from app.schemas.pagination import Page
+from app.api.pagination import keyset_page
+from app.services import data_version, grid_lookup
 
 router = APIRouter()
 
@@ -88,6 +91,7 @@ def create_or_update_bet(
         # Atualiza a equipe caso ele tenha trocado de time desde a última vez que salvou este palpite
         existing_bet.team_id = team_id_snapshot 
         
+        data_version.bump_users(db, [current_user.id])
         db.commit()
         db.refresh(existing_bet)
         return existing_bet
@@ -100,14 +104,31 @@ def create_or_update_bet(
             **bet_in.model_dump()
         )
         db.add(new_bet)
+        data_version.bump_users(db, [current_user.id])
         db.commit()
         db.refresh(new_bet)
         return new_bet
 
-@router.get("/my-bets", response_model=List[BetResponse])
+@router.get("/my-bets", response_model=Page[BetDetailResponse])
 def read_my_bets(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    bets = db.query(Bet).filter(Bet.user_id == current_user.id).all()
-    return bets
\ No newline at end of file
+    """
+    Palpites do usuário, mais recentes primeiro. Próxima página: ?cursor={next_cursor}.
+    Pilotos/equipe vêm resolvidos do grid em memória (nenhuma query extra por palpite).
+    """
+    query = db.query(Bet).join(Race, Race.id == Bet.race_id).options(contains_eager(Bet.race)) \
+        .filter(Bet.user_id == current_user.id)
+    page = keyset_page(query, [(Bet.id, True)], limit, cursor)
+
+    grids = grid_lookup.get_grids(db, {bet.race.season_id for bet in page["items"]})
+    items = []
+    for bet in page["items"]:
+        bet_data = BetResponse.model_validate(bet).model_dump()
+        bet_data.update(grid_lookup.resolve(grids.get(bet.race.season_id), bet_data))
+        items.append(bet_data)
+    page["items"] = items
+    return page
@@ -1,10 +1,13 @@
 from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.api.etag import races_etag
 from app.models.race import Race, RaceStatus
 from app.models.season import Season, RealDriver, RealTeam
+from app.services.snapshots import SnapshotService
+from app.services import data_version, public_data
 from app.schemas.race import RaceCreate, RaceUpdate, RaceResponse as RaceSchema, RaceStatus as RaceStatusEnum
 
 router = APIRouter()
@@ -53,6 +56,7 @@ def create_race(
         status=RaceStatus.SCHEDULED
     )
     db.add(race)
+    data_version.bump_season(db, active_season.id)
     db.commit()
     db.refresh(race)
     return race
@@ -79,11 +83,12 @@ def update_race_details(
     for field, value in update_data.items():
         setattr(race, field, value)
     
+    data_version.bump_season(db, race.season_id)
     db.commit()
     db.refresh(race)
     return race
 
-@router.get("/", response_model=List[RaceSchema])
+@router.get("/", response_model=List[RaceSchema], dependencies=[Depends(races_etag)])
 def list_races(
     season_id: Optional[int] = Query(None), 
     db: Session = Depends(deps.get_db), 
@@ -107,6 +112,7 @@ def update_race_status(
     race = db.query(Race).filter(Race.id == race_id).first()
     if not race: raise HTTPException(404, "Corrida não encontrada")
     race.status = new_status
+    data_version.bump_season(db, race.season_id)
     db.commit()
     db.refresh(race)
     return race
@@ -119,6 +125,7 @@ def delete_race(
 ):
     race = db.query(Race).filter(Race.id == race_id).first()
     if not race: raise HTTPException(404, "Corrida não encontrada")
+    data_version.bump_season(db, race.season_id)
     db.delete(race)
     db.commit()
     return {"message": "Corrida removida com sucesso"}
@@ -135,32 +142,17 @@ def get_race_result_public(
     return {"race": race, "result": race.result}
 
 @router.get("/seasons-list", response_model=List[dict])
-def get_public_seasons_list(db: Session = Depends(deps.get_db)):
-    seasons = db.query(Season).order_by(Season.year.desc()).all()
-    return [{"id": s.id, "year": s.year, "is_active": s.is_active} for s in seasons]
+def get_public_seasons_list(request: Request, db: Session = Depends(deps.get_db)):
+    snapshot = SnapshotService().response(request, "seasons-list")
+    if snapshot: return snapshot
+    return public_data.seasons_list(db)
 
 @router.get("/grid-info", response_model=List[dict])
 def get_grid_info(
+    request: Request,
     season_id: Optional[int] = Query(None), 
     db: Session = Depends(deps.get_db)
 ):
-    if season_id:
-        season = db.query(Season).filter(Season.id == season_id).first()
-    else:
-        season = db.query(Season).filter(Season.is_active == True).first()
-    
-    if not season: return []
-
-    teams = db.query(RealTeam).filter(RealTeam.season_id == season.id).all()
-    drivers = db.query(RealDriver).filter(RealDriver.season_id == season.id).all()
-
-    grid = []
-    for t in teams:
-        team_drivers = [d for d in drivers if d.real_team_id == t.id]
-        grid.append({
-            "id": t.id,
-            "name": t.name,
-            "logo_url": t.logo_url,
-            "drivers": [{"id": d.id, "name": d.name, "number": d.number, "photo_url": d.photo_url} for d in team_drivers]
-        })
-    return grid
\ No newline at end of file
+    snapshot = SnapshotService().response(request, f"grid-info-s{season_id}" if season_id else "grid-info")
+    if snapshot: return snapshot
+    return public_data.grid_info(db, season_id)
\ No newline at end of file
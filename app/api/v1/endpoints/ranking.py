@@ -1,114 +1,170 @@
 from typing import List, Any, Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from sqlalchemy.orm import Session
 from app.api import deps
-from app.models.team import Team
+from app.api.etag import make_etag, check_not_modified, conditional
 from app.models.season import Season
-from app.models.user import User
 from app.models.ranking_cache import RankingCache # <--- NOVO
+from app.models.race import Race, RaceStatus
+from app.services.ranking_history import RankingHistoryService
+from app.services import points_matrix
+from app.services.public_data import ranking_window
+from app.services.snapshots import SnapshotService
+from app.services.leaderboard import LeaderboardService
 
 router = APIRouter()
 
+def resolve_season_id(db: Session, season_id: Optional[int]) -> Optional[int]:
+    """Temporada pedida ou a ativa (None se não houver)."""
+    if season_id:
+        return season_id
+    active = db.query(Season).filter(Season.is_active == True).first()
+    return active.id if active else None
+
+def race_window_ranking(
+    db: Session, season_id: int, from_race: Optional[int], to_race: Optional[int],
+    offset: int = 0, limit: Optional[int] = None,
+    position_from: Optional[int] = None, position_to: Optional[int] = None,
+    around: Optional[int] = None, radius: int = 5
+) -> list:
+    """
+    Ranking de pilotos somando só as corridas da janela [from_race, to_race] (matriz em memória).
+    Mesmos filtros de ranking_window; os campos de exibição vêm do cache só para a fatia devolvida.
+    """
+    standings = points_matrix.get_matrix(db, season_id).window_standings(from_race, to_race)
+    if standings is None:
+        raise HTTPException(status_code=400, detail="Corrida fora da temporada ou ainda não finalizada.")
+
+    if around is not None:
+        center = next((position for user_id, _, position in standings if user_id == around), None)
+        if center is None:
+            return []
+        position_from, position_to = max(1, center - radius), center + radius
+
+    # Mesma fatia do ranking_window: faixa de posições (empatados dividem a posição), depois offset/limit
+    page = [
+        (position, user_id, points) for user_id, points, position in standings
+        if (position_from is None or position >= position_from) and (position_to is None or position <= position_to)
+    ]
+    page = page[offset:] if limit is None else page[offset:offset + limit]
+    if not page:
+        return []
+
+    display = dict(db.query(RankingCache.entity_id, RankingCache.display).filter(
+        RankingCache.season_id == season_id,
+        RankingCache.category == 'DRIVER',
+        RankingCache.entity_id.in_([user_id for _, user_id, _ in page])
+    ).all())
+
+    return [
+        {"id": user_id, **display[user_id], "points": points, "position": position}
+        for position, user_id, points in page if display.get(user_id)
+    ]
+
+def ranking_snapshot_or_etag(category: str, snapshot_name: str):
+    """
+    Dependência de GET condicional do ranking.
+    Sem filtros (só season_id): devolve o snapshot pré-gerado, com o hash do arquivo como ETag,
+    se ele foi gerado na versão atual do ranking (senão cai no banco, como com filtros).
+    Com filtros: ETag = versão do ranking da temporada + query string (devolve None).
+    Em ambos os casos, If-None-Match igual -> 304 sem executar o endpoint.
+    """
+    def dependency(
+        request: Request,
+        response: Response,
+        season_id: Optional[int] = Query(None),
+        db: Session = Depends(deps.get_db)
+    ):
+        target_season_id = resolve_season_id(db, season_id)
+        version = LeaderboardService().get_version(db, target_season_id) if target_season_id else 0
+
+        # Tabela inteira: arquivo pré-gerado (um hook de publicação perdido não serve dado velho)
+        if set(request.query_params) <= {"season_id"}:
+            snapshot = SnapshotService().response(
+                request, f"{snapshot_name}-s{season_id}" if season_id else snapshot_name, version=version
+            )
+            if snapshot:
+                check_not_modified(request, snapshot.headers["etag"])
+                return snapshot
+
+        conditional(request, response, make_etag("ranking", category, target_season_id, version, request.url.query))
+        return None
+    return dependency
+
 @router.get("/teams")
 def get_teams_ranking(
     season_id: Optional[int] = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    position_from: Optional[int] = Query(None, ge=1),
+    position_to: Optional[int] = Query(None, ge=1),
+    around: Optional[int] = Query(None, description="ID da equipe (centro da janela)"),
+    radius: int = Query(5, ge=0, le=50),
+    snapshot = Depends(ranking_snapshot_or_etag('TEAM', "ranking-teams")),
     db: Session = Depends(deps.get_db)
 ):
-    """Ranking de Construtores (Via Cache)"""
+    """Ranking de Construtores (Via Cache). Sem filtros devolve a tabela inteira."""
+    if snapshot: return snapshot
     
-    if season_id:
-        target_season_id = season_id
-    else:
-        active = db.query(Season).filter(Season.is_active == True).first()
-        if not active: return []
-        target_season_id = active.id
-
-    # Busca do Cache
-    cached_data = db.query(RankingCache).filter(
-        RankingCache.season_id == target_season_id,
-        RankingCache.category == 'TEAM'
-    ).order_by(RankingCache.position).all()
-    
-    # Se não tiver cache (ex: temporada nova sem corridas), retorna vazio ou busca direto
-    if not cached_data:
-        return []
+    target_season_id = resolve_season_id(db, season_id)
+    if not target_season_id: return []
 
-    ranking = []
-    for row in cached_data:
-        # Busca dados detalhados da equipe
-        team = db.query(Team).options(
-            joinedload(Team.captain), joinedload(Team.partner)
-        ).filter(Team.id == row.entity_id).first()
-        
-        if team:
-            captain_data = {
-                "id": team.captain.id,
-                "name": team.captain.full_name,
-                "photo": team.captain.profile_image_url
-            } if team.captain else None
-
-            partner_data = {
-                "id": team.partner.id,
-                "name": team.partner.full_name,
-                "photo": team.partner.profile_image_url
-            } if team.partner else None
-
-            ranking.append({
-                "id": team.id,
-                "name": team.name,
-                "logo_url": team.logo_url,
-                "primary_color": team.primary_color,
-                "secondary_color": team.secondary_color,
-                "points": row.points, # Usa pontos do cache
-                "captain": captain_data,
-                "partner": partner_data
-            })
-    return ranking
+    # Se não tiver cache (ex: temporada nova sem corridas), retorna vazio
+    return ranking_window(
+        db, target_season_id, 'TEAM', offset=offset, limit=limit,
+        position_from=position_from, position_to=position_to, around=around, radius=radius
+    )
 
 @router.get("/drivers")
 def get_drivers_ranking(
     season_id: Optional[int] = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    position_from: Optional[int] = Query(None, ge=1),
+    position_to: Optional[int] = Query(None, ge=1),
+    around: Optional[int] = Query(None, description="ID do usuário (centro da janela)"),
+    radius: int = Query(5, ge=0, le=50),
+    from_race: Optional[int] = Query(None, description="ID da primeira corrida da janela"),
+    to_race: Optional[int] = Query(None, description="ID da última corrida da janela"),
+    snapshot = Depends(ranking_snapshot_or_etag('DRIVER', "ranking-drivers")),
     db: Session = Depends(deps.get_db)
 ):
-    """Ranking de Pilotos (Via Cache)"""
+    """
+    Ranking de Pilotos (Via Cache). Ex: top 20 = ?limit=20; vizinhança = ?around={user_id}&radius=3
+    Com from_race/to_race soma só as corridas da janela (ex: forma recente, segundo turno).
+    """
+    if snapshot: return snapshot
     
-    if season_id:
-        target_season_id = season_id
-    else:
-        active = db.query(Season).filter(Season.is_active == True).first()
-        if not active: return []
-        target_season_id = active.id
-
-    # Busca do Cache
-    cached_data = db.query(RankingCache).filter(
-        RankingCache.season_id == target_season_id,
-        RankingCache.category == 'DRIVER'
-    ).order_by(RankingCache.position).all()
-
-    if not cached_data:
-        return []
+    target_season_id = resolve_season_id(db, season_id)
+    if not target_season_id: return []
+
+    if from_race or to_race:
+        return race_window_ranking(
+            db, target_season_id, from_race, to_race, offset=offset, limit=limit,
+            position_from=position_from, position_to=position_to, around=around, radius=radius
+        )
+
+    return ranking_window(
+        db, target_season_id, 'DRIVER', offset=offset, limit=limit,
+        position_from=position_from, position_to=position_to, around=around, radius=radius
+    )
+
+@router.get("/climbers")
+def get_biggest_climbers(
+    category: str = Query("DRIVER", pattern="^(DRIVER|TEAM)$"),
+    race_id: Optional[int] = Query(None, description="Padrão: última corrida finalizada da temporada ativa"),
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(deps.get_db)
+):
+    """Quem mais subiu no campeonato na corrida."""
+    if not race_id:
+        target_season_id = resolve_season_id(db, None)
+        if not target_season_id: return []
+        last_race = db.query(Race.id).filter(
+            Race.season_id == target_season_id,
+            Race.status == RaceStatus.FINISHED
+        ).order_by(Race.race_date.desc(), Race.id.desc()).first()
+        if not last_race: return []
+        race_id = last_race.id
 
-    ranking = []
-    for row in cached_data:
-        user = db.query(User).filter(User.id == row.entity_id).first()
-        
-        if user:
-            # Busca equipe para exibir no card
-            team = db.query(Team).filter(
-                Team.season_id == target_season_id,
-                (Team.captain_id == user.id) | (Team.partner_id == user.id)
-            ).first()
-
-            ranking.append({
-                "id": user.id,
-                "name": user.full_name,
-                "profile_image_url": user.profile_image_url,
-                "team_id": team.id if team else None,
-                "team_name": team.name if team else "Sem Equipe",
-                "team_color": team.primary_color if team else "#666",
-                "team_logo": team.logo_url if team else None,
-                "points": row.points # Pontos do cache
-            })
-        
-    return ranking
\ No newline at end of file
+    return RankingHistoryService().get_climbers(db, race_id, category, limit=limit)
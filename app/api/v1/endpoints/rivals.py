@@ -1,5 +1,5 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks # <--- Importar BackgroundTasks
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query # <--- Importar BackgroundTasks
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_
 
@@ -8,28 +8,36 @@ from app.models.rivalry import Rivalry, RivalryStatus
 from app.models.race import Race, RaceStatus
 from app.models.user import User
 from app.schemas.rivalry import RivalryCreate, RivalryResponse
+from app.schemas.pagination import Page
+from app.api.pagination import keyset_page
 from app.services.email import EmailService # <--- Importar EmailService
 
 router = APIRouter()
 
-@router.get("/user/{user_id}/history", response_model=List[RivalryResponse])
+# Mais recentes primeiro; o id desempata duelos criados no mesmo instante
+RIVALRY_ORDER = [(Rivalry.created_at, True), (Rivalry.id, True)]
+
+@router.get("/user/{user_id}/history", response_model=Page[RivalryResponse])
 def get_user_rivalry_history(
     user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(deps.get_db)
 ):
     """
     Retorna o histórico de duelos FINALIZADOS de um piloto específico (Perfil Público).
+    Próxima página: ?cursor={next_cursor}.
     """
-    rivalries = db.query(Rivalry).options(
+    query = db.query(Rivalry).options(
         joinedload(Rivalry.challenger),
         joinedload(Rivalry.opponent),
         joinedload(Rivalry.race)
     ).filter(
         or_(Rivalry.challenger_id == user_id, Rivalry.opponent_id == user_id),
         Rivalry.status == RivalryStatus.FINISHED
-    ).order_by(Rivalry.created_at.desc()).all()
+    )
     
-    return rivalries
+    return keyset_page(query, RIVALRY_ORDER, limit, cursor)
 
 @router.post("/challenge", response_model=RivalryResponse)
 def create_challenge(
@@ -142,17 +150,19 @@ def decline_challenge(
     db.commit()
     return {"message": "Desafio recusado."}
 
-@router.get("/my-rivals", response_model=List[RivalryResponse])
+@router.get("/my-rivals", response_model=Page[RivalryResponse])
 def get_my_rivals(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    rivalries = db.query(Rivalry).options(
+    query = db.query(Rivalry).options(
         joinedload(Rivalry.challenger),
         joinedload(Rivalry.opponent),
         joinedload(Rivalry.race)
     ).filter(
         or_(Rivalry.challenger_id == current_user.id, Rivalry.opponent_id == current_user.id)
-    ).order_by(Rivalry.created_at.desc()).all()
+    )
     
-    return rivalries
\ No newline at end of file
+    return keyset_page(query, RIVALRY_ORDER, limit, cursor)
\ No newline at end of file
@@ -1,10 +1,11 @@
 import os
 from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status, BackgroundTasks
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, desc
 
 from app.api import deps
+from app.api.etag import user_etag
 from app.models.team import Team
 from app.models.season import Season
 from app.models.user import User
@@ -12,6 +13,11 @@ from app.models.bet import Bet
 from app.models.race import Race
 
 from app.utils.image import process_and_validate_image
+from app.services.user_stats import UserStatsService
+from app.services.leaderboard import LeaderboardService
+from app.services.snapshots import publish_snapshots
+from app.services import rank_index, data_version, search_index
+from app.services.ranking_history import RankingHistoryService
 
 router = APIRouter()
 
@@ -30,17 +36,9 @@ def get_public_team_profile(team_id: int, db: Session = Depends(deps.get_db)):
     
     # 1. Posição no Ranking de Construtores
     rank = "N/A"
-    active_season = db.query(Season).filter(Season.id == team.season_id).first()
-    
-    if active_season:
-        team_ranking = db.query(Team).filter(
-            Team.season_id == active_season.id
-        ).order_by(desc(Team.total_points)).all()
-
-        for idx, t in enumerate(team_ranking):
-            if t.id == team.id:
-                rank = f"#{idx + 1}"
-                break
+    standing = rank_index.lookup(db, team.season_id, 'TEAM', team.id) if team.season_id else None
+    if standing:
+        rank = f"#{standing['rank']}"
     
     # 2. Histórico de Pontos por Corrida (Para Gráfico)
     # Soma os pontos de todas as apostas vinculadas a este time (via snapshot team_id)
@@ -62,6 +60,8 @@ def get_public_team_profile(team_id: int, db: Session = Depends(deps.get_db)):
         "secondary_color": team.secondary_color,
         "total_points": team.total_points,
         "rank": rank, # <--- NOVO
+        "percentile": standing["percentile"] if standing else None,
+        "points_to_next": standing["points_to_next"] if standing else None,
         "history": history, # <--- NOVO
         "captain": {
             "id": team.captain.id,
@@ -76,10 +76,17 @@ def get_public_team_profile(team_id: int, db: Session = Depends(deps.get_db)):
     }
     return response
 
+@router.get("/{team_id}/ranking-history")
+def get_team_ranking_history(team_id: int, db: Session = Depends(deps.get_db)):
+    """Posição da equipe no campeonato de construtores após cada corrida."""
+    team = db.query(Team).filter(Team.id == team_id).first()
+    if not team: raise HTTPException(404, "Equipe não encontrada.")
+    return RankingHistoryService().get_trajectory(db, team.season_id, 'TEAM', team.id)
+
 # --- CRUD BÁSICO (CREATE, UPDATE, READ) ---
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_team(name: str = Form(...), primary_color: str = Form(...), secondary_color: str = Form(...), logo: UploadFile = File(None), db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+async def create_team(background_tasks: BackgroundTasks, name: str = Form(...), primary_color: str = Form(...), secondary_color: str = Form(...), logo: UploadFile = File(None), db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season: raise HTTPException(400, "Não há temporada ativa.")
     existing_team = db.query(Team).filter(Team.season_id == active_season.id, (Team.captain_id == current_user.id) | (Team.partner_id == current_user.id)).first()
@@ -88,12 +95,16 @@ async def create_team(name: str = Form(...), primary_color: str = Form(...), sec
     if logo: logo_url = await process_and_validate_image(logo, "teams")
     new_team = Team(name=name, primary_color=primary_color, secondary_color=secondary_color, logo_url=logo_url, season_id=active_season.id, captain_id=current_user.id, total_points=0)
     db.add(new_team)
+    data_version.bump_users(db, [current_user.id])
+    seasons = LeaderboardService().refresh_display(db, user_ids=[current_user.id])
     db.commit()
+    search_index.invalidate("teams")
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     db.refresh(new_team)
     return new_team
 
 @router.put("/{team_id}")
-async def update_team(team_id: int, name: str = Form(...), primary_color: str = Form(...), secondary_color: str = Form(...), logo: UploadFile = File(None), db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+async def update_team(team_id: int, background_tasks: BackgroundTasks, name: str = Form(...), primary_color: str = Form(...), secondary_color: str = Form(...), logo: UploadFile = File(None), db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team: raise HTTPException(404, "Equipe não encontrada.")
     if team.captain_id != current_user.id: raise HTTPException(403, "Apenas o capitão pode editar.")
@@ -107,20 +118,23 @@ async def update_team(team_id: int, name: str = Form(...), primary_color: str =
     team.name = name
     team.primary_color = primary_color
     team.secondary_color = secondary_color
+    data_version.bump_team_members(db, team)
+    seasons = LeaderboardService().refresh_display(db, team_ids=[team.id])
     db.commit()
+    search_index.invalidate("teams")
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     db.refresh(team)
     return team
 
-@router.get("/my-team")
+@router.get("/my-team", dependencies=[Depends(user_etag("my-team", with_active_season=True))])
 def get_my_team(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season: return None
     team = db.query(Team).options(joinedload(Team.captain), joinedload(Team.partner)).filter(Team.season_id == active_season.id, (Team.captain_id == current_user.id) | (Team.partner_id == current_user.id)).first()
     if not team: return None
-    captain_points = db.query(func.sum(Bet.points)).join(Race).filter(Bet.user_id == team.captain_id, Race.season_id == active_season.id, Race.status == 'FINISHED').scalar() or 0
-    partner_points = 0
-    if team.partner_id:
-        partner_points = db.query(func.sum(Bet.points)).join(Race).filter(Bet.user_id == team.partner_id, Race.season_id == active_season.id, Race.status == 'FINISHED').scalar() or 0
+    member_points = UserStatsService().get_points(db, [team.captain_id, team.partner_id] if team.partner_id else [team.captain_id], active_season.id)
+    captain_points = member_points[team.captain_id]
+    partner_points = member_points.get(team.partner_id, 0) if team.partner_id else 0
     recent_races = db.query(Race).filter(Race.season_id == active_season.id, Race.status == 'FINISHED').order_by(Race.race_date.desc()).limit(5).all()
     recent_performance = []
     for race in reversed(recent_races):
@@ -137,7 +151,7 @@ def preview_team(team_id: int, db: Session = Depends(deps.get_db), current_user:
     return {"id": team.id, "name": team.name, "logo_url": team.logo_url, "captain_name": team.captain.full_name if team.captain else "Desconhecido", "members_count": 2 if team.partner_id else 1}
 
 @router.post("/{team_id}/join")
-def join_team(team_id: int, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+def join_team(team_id: int, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team: raise HTTPException(404, "Equipe não encontrada")
     if team.partner_id: raise HTTPException(400, "Equipe cheia")
@@ -146,7 +160,10 @@ def join_team(team_id: int, db: Session = Depends(deps.get_db), current_user: Us
     existing = db.query(Team).filter(Team.season_id == active_season.id, (Team.captain_id == current_user.id) | (Team.partner_id == current_user.id)).first()
     if existing: raise HTTPException(400, "Você já tem equipe")
     team.partner_id = current_user.id
+    data_version.bump_team_members(db, team)
+    seasons = LeaderboardService().refresh_display(db, team_ids=[team.id])
     db.commit()
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     return {"message": f"Bem-vindo à {team.name}!"}
 
 # --- FUNÇÃO AUXILIAR PARA DÉBITO DE PONTOS ---
@@ -168,7 +185,7 @@ def debit_points_from_team(db: Session, team: Team, user_id: int):
 # --- ENDPOINTS COM LÓGICA DE DÉBITO ---
 
 @router.post("/leave")
-def leave_team(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+def leave_team(background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season: raise HTTPException(400, "Sem temporada ativa")
 
@@ -184,12 +201,15 @@ def leave_team(db: Session = Depends(deps.get_db), current_user: User = Depends(
     
     # 2. Remove da equipe
     team.partner_id = None
+    data_version.bump_users(db, [team.captain_id, current_user.id])
+    seasons = LeaderboardService().refresh_display(db, user_ids=[current_user.id], team_ids=[team.id])
     db.commit()
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     
     return {"message": f"Você saiu da equipe. {points_removed} pontos foram debitados."}
 
 @router.post("/{team_id}/kick")
-def kick_partner(team_id: int, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+def kick_partner(team_id: int, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team: raise HTTPException(404, "Equipe não encontrada")
     if team.captain_id != current_user.id: raise HTTPException(403, "Apenas o capitão pode remover membros.")
@@ -202,6 +222,9 @@ def kick_partner(team_id: int, db: Session = Depends(deps.get_db), current_user:
 
     # 2. Remove da equipe
     team.partner_id = None
+    data_version.bump_users(db, [team.captain_id, partner_id])
+    seasons = LeaderboardService().refresh_display(db, user_ids=[partner_id], team_ids=[team.id])
     db.commit()
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     
     return {"message": f"Parceiro removido. {points_removed} pontos foram debitados da equipe."}
\ No newline at end of file
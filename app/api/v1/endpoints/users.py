@@ -1,133 +1,73 @@
 import os
 from typing import Any, List, Optional
 # Importamos UploadFile, File, Form para lidar com multipart/form-data
-from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
 from sqlalchemy import or_, func, desc
 
 from app.api import deps
 from app.core.security import get_password_hash
-from app.models.achievement import UserAchievement
 from app.models.season import Season
-from app.models.team import Team
 from app.models.user import User
-from app.models.bet import Bet
-from app.models.race import Race
 from app.schemas.user import UserCreate, UserResponse
+from app.schemas.pagination import Page
+from app.api.pagination import keyset_page, search_page
 
 # Importação da Utils
 from app.utils.image import process_and_validate_image
 # Importação do Serviço de Email
 from app.services.email import EmailService
+from app.services.leaderboard import LeaderboardService
+from app.services.snapshots import publish_snapshots
+from app.services import data_version, user_profile, search_index, bet_history
+from app.services.ranking_history import RankingHistoryService
 
 router = APIRouter()
 
-@router.get("/search", response_model=List[UserResponse])
+@router.get("/search", response_model=Page[UserResponse])
 def search_users(
     q: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Busca pública de pilotos para desafios (Apenas usuários ativos).
+    Com `q`: índice em memória, sem acento/maiúsculas, por prefixo de palavra e ranqueado.
+    Próxima página: ?cursor={next_cursor}.
     """
-    query = db.query(User).filter(User.is_active == True)
-    
     if q:
-        # Busca por nome (case insensitive)
-        query = query.filter(User.full_name.ilike(f"%{q}%"))
-        
-    return query.order_by(User.full_name).offset(skip).limit(limit).all()
+        return search_page(db, "users", User, q, limit, cursor, criteria=(User.is_active == True,), only_active=True)
+
+    query = db.query(User).filter(User.is_active == True)
+    return keyset_page(query, [(User.full_name, False), (User.id, False)], limit, cursor)
 
 @router.get("/{user_id}/public")
 def get_public_user_profile(user_id: int, db: Session = Depends(deps.get_db)):
     """
     Retorna o perfil público de um piloto com Stats Avançados e Medalhas.
+    Montado em poucas queries e guardado em cache por versão (ver services/user_profile.py).
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    profile = user_profile.get_public_profile(db, user_id)
+    if profile is None:
         raise HTTPException(status_code=404, detail="Piloto não encontrado.")
-    
-    # 1. Dados Básicos e Equipe
-    active_season = db.query(Season).filter(Season.is_active == True).first()
-    team_data = None
-    season_stats = {"rank": "N/A", "points": 0, "history": []}
+    return profile
 
-    if active_season:
-        # Busca Equipe
-        team = db.query(Team).filter(
-            Team.season_id == active_season.id,
-            (Team.captain_id == user.id) | (Team.partner_id == user.id)
-        ).first()
-        
-        if team:
-            team_data = {
-                "id": team.id,
-                "name": team.name,
-                "logo": team.logo_url,
-                "colors": [team.primary_color, team.secondary_color]
-            }
-
-        # 2. Pontos na Temporada Atual (Soma das corridas terminadas desta season)
-        points_query = db.query(func.sum(Bet.points)).join(Race).filter(
-            Bet.user_id == user.id,
-            Race.season_id == active_season.id,
-            Race.status == 'FINISHED'
-        )
-        season_stats["points"] = points_query.scalar() or 0
-
-        # 3. Posição no Ranking (Cálculo dinâmico)
-        ranking_sub = db.query(
-            Bet.user_id,
-            func.sum(Bet.points).label("total")
-        ).join(Race).filter(
-            Race.season_id == active_season.id,
-            Race.status == 'FINISHED'
-        ).group_by(Bet.user_id).order_by(desc("total")).all()
-
-        for idx, row in enumerate(ranking_sub):
-            if row.user_id == user.id:
-                season_stats["rank"] = f"#{idx + 1}"
-                break
-        
-        # 4. Histórico para Gráfico (Últimas corridas)
-        bets_history = db.query(Bet).join(Race).filter(
-            Bet.user_id == user.id,
-            Race.season_id == active_season.id,
-            Race.status == 'FINISHED'
-        ).order_by(Race.race_date).all()
-
-        season_stats["history"] = [
-            {"race": b.race.name, "points": b.points} for b in bets_history
-        ]
-
-    # 5. Buscar Medalhas (GARANTINDO QUE ESTÃO AQUI)
-    badges = db.query(UserAchievement).options(
-        joinedload(UserAchievement.achievement), 
-        joinedload(UserAchievement.team)
-    ).filter(UserAchievement.user_id == user.id).all()
-    
-    # 6. Pontos Totais da Carreira
-    career_points = db.query(func.sum(Bet.points)).filter(Bet.user_id == user.id).scalar() or 0
-    races_count = db.query(Bet).filter(Bet.user_id == user.id).count()
+@router.get("/{user_id}/ranking-history")
+def get_user_ranking_history(
+    user_id: int,
+    season_id: Optional[int] = Query(None),
+    db: Session = Depends(deps.get_db)
+):
+    """Posição do piloto no campeonato após cada corrida (temporada ativa por padrão)."""
+    if not season_id:
+        active_season = db.query(Season).filter(Season.is_active == True).first()
+        if not active_season: return []
+        season_id = active_season.id
+    return RankingHistoryService().get_trajectory(db, season_id, 'DRIVER', user_id)
 
-    return {
-        "id": user.id,
-        "name": user.full_name,
-        "photo": user.profile_image_url,
-        "joined_at": user.created_at,
-        "team": team_data,
-        "stats": {
-            "career_points": career_points,
-            "races": races_count,
-            "season_points": season_stats["points"], # Novo
-            "season_rank": season_stats["rank"],     # Novo
-            "season_history": season_stats["history"] # Novo
-        },
-        "badges": badges 
-    }
 # --- ROTAS PÚBLICAS ---
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -149,6 +89,7 @@ async def create_user(
     )
     db.add(user)
     db.commit()
+    search_index.invalidate("users")
     db.refresh(user)
 
     # --- ENVIO DE EMAIL (BACKGROUND) ---
@@ -165,6 +106,7 @@ def read_user_me(current_user: User = Depends(deps.get_current_user)):
 # --- NOVO ENDPOINT DE ATUALIZAÇÃO DE PERFIL ---
 @router.put("/me", response_model=UserResponse)
 async def update_user_me(
+    background_tasks: BackgroundTasks,
     full_name: str = Form(...),
     photo: UploadFile = File(None),
     db: Session = Depends(deps.get_db),
@@ -189,55 +131,48 @@ async def update_user_me(
         url = await process_and_validate_image(photo, "users")
         current_user.profile_image_url = url
 
+    # Nome/foto também aparecem no ranking (cache) e na tela da equipe do parceiro
+    data_version.bump_users(db, [current_user.id], with_teammates=True)
+    seasons = LeaderboardService().refresh_display(db, user_ids=[current_user.id])
     db.commit()
+    search_index.invalidate("users")
+    background_tasks.add_task(publish_snapshots, ranking_seasons=seasons)
     db.refresh(current_user)
     return current_user
 
 @router.get("/me/history")
 def get_my_bet_history(
+    request: Request,
+    season_id: Optional[int] = Query(None),
+    stream: bool = Query(False, description="NDJSON: uma corrida por linha, enviada conforme é lida"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    bets = db.query(Bet).join(Race).filter(
-        Bet.user_id == current_user.id,
-        Race.status == 'FINISHED'
-    ).order_by(Race.race_date.desc()).all()
-    
-    history = []
-    for bet in bets:
-        race = bet.race
-        result = race.result
-        bet_data = {c.name: getattr(bet, c.name) for c in bet.__table__.columns}
-        result_data = None
-        if result:
-            result_data = {c.name: getattr(result, c.name) for c in result.__table__.columns}
-
-        history.append({
-            "race_name": race.name,
-            "race_date": race.race_date,
-            "points": bet.points,
-            "my_bet": bet_data,
-            "official_result": result_data
-        })
-    return history
+    """
+    Histórico de apostas finalizadas (aposta + gabarito) numa única query.
+    Com ?stream=true (ou Accept: application/x-ndjson) a resposta é NDJSON em streaming.
+    """
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            bet_history.stream_history_ndjson(current_user.id, season_id),
+            media_type="application/x-ndjson"
+        )
+    return bet_history.get_history(db, current_user.id, season_id)
 
 # --- ROTAS ADMINISTRATIVAS ---
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=Page[UserResponse])
 def read_all_users(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
     search: str | None = None,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_admin),
 ):
-    query = db.query(User)
     if search:
-        query = query.filter(
-            or_(User.full_name.ilike(f"%{search}%"), User.email.ilike(f"%{search}%"))
-        )
-    users = query.offset(skip).limit(limit).all()
-    return users
+        # Nome ou e-mail, pelo índice de busca (inclui usuários banidos)
+        return search_page(db, "users", User, search, limit, cursor)
+    return keyset_page(db.query(User), [(User.id, False)], limit, cursor)
 
 @router.put("/{user_id}/status", response_model=UserResponse)
 def toggle_user_status(
@@ -251,6 +186,7 @@ def toggle_user_status(
     if user.id == current_user.id: raise HTTPException(400, "Você não pode banir a si mesmo.")
     user.is_active = is_active
     db.commit()
+    search_index.invalidate("users")
     db.refresh(user)
     return user
 
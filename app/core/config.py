@@ -32,6 +32,28 @@ class Settings(BaseSettings):
     VAPID_PUBLIC_KEY: str
     VAPID_CLAIMS_EMAIL: str
 
+    # --- PONTUAÇÃO ---
+    # Janela (segundos) para agrupar envios seguidos do resultado de uma mesma corrida
+    SCORING_DEBOUNCE_SECONDS: int = 5
+    # Lease (segundos) de um job em execução; precisa cobrir a fase mais longa
+    SCORING_JOB_LEASE_SECONDS: int = 600
+    # Lease (segundos) de uma tarefa em background; precisa cobrir o intervalo entre dois progressos
+    BACKGROUND_JOB_LEASE_SECONDS: int = 600
+
+    # --- SNAPSHOTS (JSON pré-gerado das rotas públicas) ---
+    SNAPSHOT_DIR: str = "snapshots"
+    SNAPSHOT_GZIP: bool = True
+    SNAPSHOT_KEEP: int = 3 # Versões antigas mantidas no disco por snapshot
+
+    # --- CACHE DE PERFIS PÚBLICOS (LRU em memória, por processo) ---
+    PROFILE_CACHE_SIZE: int = 2048
+
+    # --- BUSCA (índice em memória de usuários/equipes) ---
+    SEARCH_INDEX_MAX_AGE: int = 300 # Segundos até reconstruir (mudanças feitas por outros processos)
+
+    # --- GRID DE REFERÊNCIA (pilotos/equipes por temporada, em memória) ---
+    GRID_LOOKUP_MAX_AGE: int = 600 # Segundos até recarregar (mudanças feitas por outros processos)
+
     class Config:
         env_file = ".env"
         case_sensitive = True 
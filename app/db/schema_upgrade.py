@@ -0,0 +1,72 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from app.db.base import Base
+
+# O projeto não tem migrations: o create_all cria tabelas novas, mas nunca altera as existentes.
+# Colunas adicionadas depois em tabelas antigas entram aqui (tabela, coluna, tipo + default).
+# Só acrescentar: a lista roda inteira em todo boot e tem que ser idempotente.
+ADDED_COLUMNS = [
+    ("users", "data_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("seasons", "data_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("seasons", "ranking_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("ranking_cache", "display", "JSON"),
+    ("scoring_jobs", "locked_until", "TIMESTAMP WITH TIME ZONE"),
+    ("background_jobs", "locked_until", "TIMESTAMP WITH TIME ZONE"),
+]
+
+# Índices únicos novos sobre dados antigos: remove as duplicatas (fica a linha mais antiga) antes de criar
+DEDUPLICATE_BEFORE_INDEX = {
+    "uq_user_achievements_user_badge_season": """
+        DELETE FROM user_achievements WHERE id NOT IN (
+            SELECT MIN(id) FROM user_achievements GROUP BY user_id, achievement_id, COALESCE(season_id, 0)
+        )
+    """,
+}
+
+def _index_names(conn, inspector, table: str) -> set:
+    """Nomes dos índices da tabela. No SQLite a reflexão pula índices de expressão, então lê o catálogo."""
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"), {"table": table})
+        return {row.name for row in rows}
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+def upgrade_schema(engine) -> list:
+    """
+    Acerta um banco criado por uma versão anterior: adiciona as colunas que faltam (ADDED_COLUMNS)
+    e cria os índices declarados nos modelos que ainda não existem. Tabelas inexistentes ficam
+    para o create_all. Devolve as colunas adicionadas ("tabela.coluna").
+    """
+    # IMPORTAÇÃO TARDIA: registra todos os modelos no metadata (índices)
+    from app.models import (  # noqa: F401
+        user, season, team, race, bet, achievement, rivalry, ranking_cache, subscription,
+        scoring_job, user_stats, background_job, ranking_history
+    )
+
+    postgres = engine.dialect.name == "postgresql"
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    added = []
+
+    with engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            if column in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            # IF NOT EXISTS: outro worker subindo ao mesmo tempo pode ter acabado de adicionar
+            if_not_exists = "IF NOT EXISTS " if postgres else ""
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {if_not_exists}{column} {ddl}"))
+            added.append(f"{table}.{column}")
+
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = _index_names(conn, inspector, table.name)
+            for index in table.indexes:
+                if index.name not in existing:
+                    if index.name in DEDUPLICATE_BEFORE_INDEX:
+                        conn.execute(text(DEDUPLICATE_BEFORE_INDEX[index.name]))
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+
+    return added
@@ -7,10 +7,16 @@ import os
 from app.core.config import settings
 from app.api.v1.router import api_router
 # Importa do scheduler atualizado
-from app.services.scheduler import start_scheduler, stop_scheduler, check_race_status_job 
+from app.services.scheduler import start_scheduler, stop_scheduler, check_race_status_job, backfill_user_stats_job, upgrade_schema_job
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Banco de versão anterior: colunas e índices novos antes de qualquer leitura
+    upgrade_schema_job()
+
+    # Banco anterior ao UserStats: preenche antes de qualquer ranking ou pontuação
+    backfill_user_stats_job()
+
     # Inicia o agendador em background
     start_scheduler()
     
@@ -54,6 +60,12 @@ if not os.path.exists(uploads_dir):
 app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Snapshots JSON publicados a cada mudança (ranking, grid, temporadas)
+snapshots_dir = os.path.join(base_dir, settings.SNAPSHOT_DIR)
+if not os.path.exists(snapshots_dir):
+    os.makedirs(snapshots_dir)
+app.mount("/snapshots", StaticFiles(directory=snapshots_dir), name="snapshots")
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -50,4 +50,12 @@ class UserAchievement(Base):
     user = relationship("User")
     achievement = relationship("Achievement")
     race = relationship("Race")
-    team = relationship("Team")
\ No newline at end of file
+    team = relationship("Team")
+
+# Uma medalha por usuário; as de temporada, uma por temporada (season_id NULL = de corrida).
+# COALESCE porque o unique comum trata NULLs como distintos. Inserts usam ON CONFLICT DO NOTHING
+Index(
+    "uq_user_achievements_user_badge_season",
+    UserAchievement.user_id, UserAchievement.achievement_id, func.coalesce(UserAchievement.season_id, 0),
+    unique=True
+)
\ No newline at end of file
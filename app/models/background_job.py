@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy.sql import func
+from app.db.base import Base
+import enum
+
+class BackgroundJobKind(str, enum.Enum):
+    ACHIEVEMENT_BACKFILL = "ACHIEVEMENT_BACKFILL"
+    SEASON_AWARDS = "SEASON_AWARDS"
+
+class BackgroundJobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+class BackgroundJob(Base):
+    """Tarefa administrativa longa (fora da requisição), com progresso consultável"""
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), default=BackgroundJobStatus.QUEUED, nullable=False)
+
+    payload = Column(JSON, nullable=True) # Parâmetros (ex: {"achievement_id": 3})
+    progress = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    # Lease do worker dono da tarefa (renovado a cada progresso). RUNNING com lease vencido = dono morreu
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
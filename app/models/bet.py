@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -6,6 +6,9 @@ from app.db.base import Base
 class Bet(Base):
     """O Palpite do Usuário"""
     __tablename__ = "bets"
+    __table_args__ = (
+        Index("ix_bets_user_id", "user_id", "id"), # "Minhas apostas" (paginação por cursor)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
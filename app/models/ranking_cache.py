@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
 class RankingCache(Base):
     __tablename__ = "ranking_cache"
+    __table_args__ = (
+        Index("ix_ranking_cache_season_category_position", "season_id", "category", "position"), # Páginas / faixas
+        Index("ix_ranking_cache_season_category_entity", "season_id", "category", "entity_id"), # "Perto de mim"
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False, index=True)
@@ -16,5 +20,8 @@ class RankingCache(Base):
     
     points = Column(Integer, default=0)
     position = Column(Integer, default=0)
+
+    # Campos de exibição copiados no refresh (nome, foto, equipe...), para o ranking sair numa query só
+    display = Column(JSON, nullable=True)
     
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.db.base import Base
+
+class RankingHistory(Base):
+    """
+    Foto do campeonato após cada corrida (gravada pelo processamento de pontos).
+    Alimenta o gráfico de posição ao longo da temporada e o "quem mais subiu".
+    """
+    __tablename__ = "ranking_history"
+    __table_args__ = (
+        Index("ix_ranking_history_entity", "season_id", "category", "entity_id", "race_id"), # Trajetória
+        Index("ix_ranking_history_race", "race_id", "category", "position"), # Foto de uma corrida
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False)
+
+    # 'DRIVER' (Pilotos) ou 'TEAM' (Construtores), como no RankingCache
+    category = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+
+    points = Column(Integer, default=0, nullable=False) # Acumulado até esta corrida
+    position = Column(Integer, nullable=False)
+    previous_position = Column(Integer, nullable=True) # Posição após a corrida anterior (NULL = estreia)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -12,6 +12,11 @@ class RivalryStatus(str, enum.Enum):
 
 class Rivalry(Base):
     __tablename__ = "rivalries"
+    __table_args__ = (
+        # Duelos de um piloto, mais recentes primeiro (paginação por cursor)
+        Index("ix_rivalries_challenger_created", "challenger_id", "created_at", "id"),
+        Index("ix_rivalries_opponent_created", "opponent_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
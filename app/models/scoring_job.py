@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+import enum
+
+class ScoringJobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+class ScoringPhase(str, enum.Enum):
+    SCORING = "SCORING"   # Fases 1-3: rollback, cálculo e rivais (uma única transação)
+    BADGES = "BADGES"
+    RANKING = "RANKING"
+    NOTIFY = "NOTIFY"
+
+class ScoringJob(Base):
+    """Execução (durável) do processamento de pontos de uma corrida"""
+    __tablename__ = "scoring_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False, index=True)
+
+    status = Column(String(20), default=ScoringJobStatus.QUEUED, nullable=False)
+    phase = Column(String(20), nullable=True) # Fase atual (ou última concluída)
+
+    # Tempo (segundos) de cada fase concluída. Ex: {"SCORING": 0.42, "RANKING": 0.1}
+    phase_timings = Column(JSON, default=dict)
+    summary = Column(JSON, nullable=True)
+
+    # Gabarito efetivamente pontuado por este job (base para correções incrementais)
+    result_snapshot = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    # Lease do worker dono do job (renovado a cada fase). RUNNING com lease vencido = dono morreu
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    # Envios do resultado que chegaram com o job ainda na fila e foram agrupados nele
+    coalesced_requests = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    race = relationship("Race")
@@ -9,6 +9,8 @@ class Season(Base):
     year = Column(Integer, unique=True, nullable=False) # Ex: 2025
     is_active = Column(Boolean, default=False) # Só uma deve ser True
     is_finished = Column(Boolean, default=False)
+    ranking_version = Column(Integer, default=0, nullable=False) # Incrementa a cada mudança no RankingCache
+    data_version = Column(Integer, default=0, nullable=False) # Incrementa a cada mudança no calendário/resultados (ETag)
 
     races = relationship("Race", back_populates="season", cascade="all, delete-orphan")
 
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_full_name_id", "full_name", "id"), # Listagem por nome (paginação por cursor)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String(255), nullable=False)
@@ -15,4 +18,7 @@ class User(Base):
     # NOVO CAMPO
     profile_image_url = Column(String(255), nullable=True)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Incrementa a cada mudança nos dados "do usuário" (apostas, equipe, conquistas, pontos) -> ETag
+    data_version = Column(Integer, default=0, nullable=False)
\ No newline at end of file
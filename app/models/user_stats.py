@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class UserStats(Base):
+    """
+    Contadores materializados por usuário, mantidos pelo processamento de pontos.
+    season_id preenchido = estatísticas da temporada; season_id NULL = carreira (todas as temporadas).
+    Só corridas já pontuadas entram na conta.
+    """
+    __tablename__ = "user_stats"
+    __table_args__ = (UniqueConstraint("user_id", "season_id", name="uq_user_stats_user_season"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=True)
+
+    points = Column(Integer, default=0, nullable=False)
+    races = Column(Integer, default=0, nullable=False)
+    pole_hits = Column(Integer, default=0, nullable=False)
+    winner_hits = Column(Integer, default=0, nullable=False)
+    dotd_hits = Column(Integer, default=0, nullable=False)
+    exact_hits = Column(Integer, default=0, nullable=False) # Acertos de posição exata no Top 10
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -28,6 +28,7 @@ class AchievementCreate(AchievementBase):
 class AchievementResponse(AchievementBase):
     id: int
     created_at: datetime
+    backfill_job_id: Optional[int] = None # Só na criação/edição (entrega retroativa em background)
 
     class Config:
         from_attributes = True
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+class BackgroundJobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    payload: Optional[Dict[str, Any]] = None
+    progress: int
+    total: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
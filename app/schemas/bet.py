@@ -52,4 +52,33 @@ class BetResponse(BetBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DriverRef(BaseModel):
+    id: int
+    name: str
+    number: Optional[int] = None
+    photo_url: Optional[str] = None
+    team_id: Optional[int] = None
+    team_name: Optional[str] = None
+
+class TeamRef(BaseModel):
+    id: int
+    name: str
+    logo_url: Optional[str] = None
+
+class BetDetailResponse(BetResponse):
+    """Palpite com pilotos/equipe resolvidos ao lado dos ids (services/grid_lookup.py)."""
+    pole_driver: Optional[DriverRef] = None
+    dotd_driver: Optional[DriverRef] = None
+    winning_team: Optional[TeamRef] = None
+    p1_driver: Optional[DriverRef] = None
+    p2_driver: Optional[DriverRef] = None
+    p3_driver: Optional[DriverRef] = None
+    p4_driver: Optional[DriverRef] = None
+    p5_driver: Optional[DriverRef] = None
+    p6_driver: Optional[DriverRef] = None
+    p7_driver: Optional[DriverRef] = None
+    p8_driver: Optional[DriverRef] = None
+    p9_driver: Optional[DriverRef] = None
+    p10_driver: Optional[DriverRef] = None
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+class ScoringJobResponse(BaseModel):
+    id: int
+    race_id: int
+    status: str
+    phase: Optional[str] = None
+    phase_timings: Optional[Dict[str, float]] = None
+    summary: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    coalesced_requests: Optional[int] = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class SeasonBase(BaseModel):
@@ -10,6 +11,7 @@ class SeasonResponse(SeasonBase):
     id: int
     is_active: bool
     is_finished: bool
+    awards_job_id: Optional[int] = None # Só no fechamento (premiação em background)
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,118 @@
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import update, or_, and_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.background_job import BackgroundJob, BackgroundJobKind, BackgroundJobStatus
+from app.services.badge import BadgeService
+
+def enqueue_job(db: Session, kind: BackgroundJobKind, payload: dict = None) -> BackgroundJob:
+    """Registra a tarefa na fila. A execução é feita por run_background_job (BackgroundTasks / Scheduler)."""
+    job = BackgroundJob(kind=kind.value, status=BackgroundJobStatus.QUEUED, payload=payload or {}, progress=0, total=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _lease():
+    return _now() + timedelta(seconds=settings.BACKGROUND_JOB_LEASE_SECONDS)
+
+def _claimable():
+    """Na fila, ou RUNNING com o lease vencido (o worker dono morreu). Sem lease = tarefa antiga, também retomável."""
+    return or_(
+        BackgroundJob.status == BackgroundJobStatus.QUEUED,
+        and_(
+            BackgroundJob.status == BackgroundJobStatus.RUNNING,
+            or_(BackgroundJob.locked_until.is_(None), BackgroundJob.locked_until < _now())
+        )
+    )
+
+def _backfill_achievement(db: Session, job: BackgroundJob, report_progress):
+    return BadgeService().backfill_achievement(db, job.payload["achievement_id"], report_progress=report_progress)
+
+def _season_awards(db: Session, job: BackgroundJob, report_progress):
+    return BadgeService().process_season_end_awards(db, job.payload["season_id"], report_progress=report_progress)
+
+# Tipo da tarefa -> função (db, job, report_progress) que devolve o resultado (dict)
+HANDLERS = {
+    BackgroundJobKind.ACHIEVEMENT_BACKFILL.value: _backfill_achievement,
+    BackgroundJobKind.SEASON_AWARDS.value: _season_awards,
+}
+
+def run_background_job(job_id: int):
+    """
+    Executa uma tarefa da fila. O progresso é gravado numa sessão separada,
+    então o admin acompanha em GET /admin/jobs/{id} enquanto a tarefa roda.
+    """
+    tracker = SessionLocal()
+    db = SessionLocal()
+    job = None
+    try:
+        # Só um worker consegue pegar a tarefa: UPDATE condicional ao status/lease.
+        # RUNNING cujo dono ainda renova o lease nunca é tomado
+        claimed = tracker.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, _claimable())
+            .values(status=BackgroundJobStatus.RUNNING, started_at=_now(), locked_until=_lease())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        tracker.commit()
+        if not claimed:
+            return
+
+        job = tracker.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+        handler = HANDLERS.get(job.kind)
+        if not handler:
+            raise ValueError(f"Tipo de tarefa desconhecido: {job.kind}")
+
+        print(f"--- ⏳ Iniciando Tarefa #{job.id} ({job.kind}) ---")
+
+        def report_progress(done: int, total: int):
+            job.progress = done
+            job.total = total
+            job.locked_until = _lease() # Cada progresso renova o lease
+            tracker.commit()
+
+        job.result = handler(db, job, report_progress)
+        job.status = BackgroundJobStatus.DONE
+        job.finished_at = _now()
+        job.locked_until = None
+        tracker.commit()
+        print(f"--- ✅ Tarefa #{job.id} Concluída: {job.result} ---")
+
+    except Exception as e:
+        db.rollback()
+        print(f"--- ❌ Erro na Tarefa #{job_id}: {e}")
+        if job:
+            tracker.rollback()
+            job.status = BackgroundJobStatus.FAILED
+            job.error = str(e)
+            job.finished_at = _now()
+            job.locked_until = None
+            tracker.commit()
+    finally:
+        db.close()
+        tracker.close()
+
+def resume_background_jobs():
+    """
+    Executa tarefas na fila e as interrompidas (RUNNING com lease vencido). Chamado na inicialização.
+    Tarefas de outro worker ainda vivo (lease em dia) ficam com ele; retomar é seguro porque
+    as medalhas entram com ON CONFLICT DO NOTHING.
+    """
+    db = SessionLocal()
+    try:
+        job_ids = [row.id for row in db.query(BackgroundJob.id).filter(
+            _claimable()
+        ).order_by(BackgroundJob.id).all()]
+    finally:
+        db.close()
+
+    if job_ids:
+        print(f"--- 🔁 Retomando {len(job_ids)} tarefa(s) pendente(s) ---")
+    for job_id in job_ids:
+        run_background_job(job_id)
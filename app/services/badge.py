@@ -1,10 +1,26 @@
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select
+from sqlalchemy.dialects import postgresql, sqlite
 from app.models.achievement import Achievement, UserAchievement, AchievementRuleType
 from app.models.user import User
 from app.models.bet import Bet
 from app.models.race import Race, RaceResult
 from app.models.team import Team
+from app.models.user_stats import UserStats
+from app.services import ranking_query, data_version
+
+def insert_new_badges(db: Session, rows: list) -> list:
+    """
+    INSERT em lote de UserAchievement com ON CONFLICT DO NOTHING (unique usuário/medalha/temporada):
+    duas execuções simultâneas (job retomado, premiação disparada duas vezes) nunca duplicam.
+    Devolve os user_id das linhas realmente gravadas. SEM commit.
+    """
+    if not rows:
+        return []
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(UserAchievement).on_conflict_do_nothing().returning(UserAchievement.user_id)
+    return [row.user_id for row in db.execute(stmt, rows).all()]
 
 class BadgeService:
     
@@ -36,17 +52,181 @@ class BadgeService:
         
         return new_badges
 
+    # Regras avaliadas após cada corrida (as de ranking ficam para o fim da temporada)
+    RACE_RULES = [
+        AchievementRuleType.TOTAL_POINTS, AchievementRuleType.RACE_POINTS,
+        AchievementRuleType.POLE_HITS, AchievementRuleType.WINNER_HITS,
+        AchievementRuleType.DOTD_HITS, AchievementRuleType.RACES_PARTICIPATED
+    ]
+
+    def check_achievements_for_race(self, db: Session, race_id: int, user_ids: list = None) -> int:
+        """
+        Versão em lote de check_achievements_after_race para todos os participantes da corrida
+        (ou apenas `user_ids`). Os agregados vêm do UserStats (carreira), as regras são
+        avaliadas sobre arrays e as novas conquistas entram num único INSERT com um commit.
+        Retorna a quantidade de medalhas concedidas.
+        """
+        badges = db.query(Achievement).filter(
+            Achievement.rule_type.in_([r.value for r in self.RACE_RULES])
+        ).all()
+        if not badges:
+            return 0
+
+        if user_ids is None:
+            participants = select(Bet.user_id).where(Bet.race_id == race_id).scalar_subquery()
+        else:
+            if not user_ids:
+                return 0
+            participants = list(user_ids)
+
+        # 1. Pontos da corrida (define a lista de usuários avaliados)
+        race_rows = db.query(Bet.user_id, Bet.points).filter(
+            Bet.race_id == race_id,
+            Bet.user_id.in_(participants)
+        ).all()
+        if not race_rows:
+            return 0
+
+        users = np.array([r.user_id for r in race_rows], dtype=np.int64)
+        index = {int(u): i for i, u in enumerate(users)}
+        metrics = {rule: np.zeros(len(users), dtype=np.int64) for rule in self.RACE_RULES}
+        metrics[AchievementRuleType.RACE_POINTS] = np.array([r.points or 0 for r in race_rows], dtype=np.int64)
+
+        # 2. Pontos totais, corridas disputadas e acertos (estatísticas de carreira materializadas)
+        career = db.query(UserStats).filter(
+            UserStats.user_id.in_(participants),
+            UserStats.season_id.is_(None)
+        ).all()
+
+        for row in career:
+            i = index.get(row.user_id)
+            if i is not None:
+                metrics[AchievementRuleType.TOTAL_POINTS][i] = row.points
+                metrics[AchievementRuleType.RACES_PARTICIPATED][i] = row.races
+                metrics[AchievementRuleType.POLE_HITS][i] = row.pole_hits
+                metrics[AchievementRuleType.WINNER_HITS][i] = row.winner_hits
+                metrics[AchievementRuleType.DOTD_HITS][i] = row.dotd_hits
+
+        # 3. Conquistas que os participantes já têm
+        existing = set(db.query(UserAchievement.user_id, UserAchievement.achievement_id).filter(
+            UserAchievement.user_id.in_(participants),
+            UserAchievement.achievement_id.in_([b.id for b in badges])
+        ).all())
+
+        new_rows = []
+        for badge in badges:
+            eligible = users[metrics[AchievementRuleType(badge.rule_type)] >= badge.threshold]
+            for user_id in eligible:
+                user_id = int(user_id)
+                if (user_id, badge.id) not in existing:
+                    new_rows.append({
+                        "user_id": user_id,
+                        "achievement_id": badge.id,
+                        "race_id": race_id,
+                        "seen": False
+                    })
+
+        granted = insert_new_badges(db, new_rows)
+        if granted:
+            data_version.bump_users(db, granted)
+            db.commit()
+
+        return len(granted)
+
+    # Coluna do UserStats (carreira) usada por cada regra acumulada
+    STATS_COLUMNS = {
+        AchievementRuleType.TOTAL_POINTS: UserStats.points,
+        AchievementRuleType.RACES_PARTICIPATED: UserStats.races,
+        AchievementRuleType.POLE_HITS: UserStats.pole_hits,
+        AchievementRuleType.WINNER_HITS: UserStats.winner_hits,
+        AchievementRuleType.DOTD_HITS: UserStats.dotd_hits,
+    }
+
+    BACKFILL_CHUNK_SIZE = 1000
+
+    def backfill_achievement(self, db: Session, achievement_id: int, report_progress=None) -> dict:
+        """
+        Concede retroativamente uma conquista de corrida a todos que já atingiram a meta.
+        Uma query agregada por regra, paginada por user_id (lotes de BACKFILL_CHUNK_SIZE),
+        com um INSERT em lote e um commit por lote. Idempotente: quem já tem fica fora da consulta
+        e, se ganhar a medalha no meio (corrida pontuada, tarefa retomada), o ON CONFLICT ignora.
+        """
+        badge = db.query(Achievement).filter(Achievement.id == achievement_id).first()
+        if not badge:
+            raise ValueError("Conquista não encontrada.")
+
+        rule = AchievementRuleType(badge.rule_type)
+        if rule not in self.RACE_RULES:
+            # Regras de ranking são entregues no fechamento da temporada
+            return {"granted": 0, "skipped": f"Regra {rule.value} é avaliada no fim da temporada."}
+
+        already_has = select(UserAchievement.user_id).where(
+            UserAchievement.achievement_id == badge.id
+        ).scalar_subquery()
+
+        if rule == AchievementRuleType.RACE_POINTS:
+            # Primeira corrida (menor id) em que o usuário fez a pontuação mínima
+            query = db.query(
+                Bet.user_id.label("user_id"),
+                func.min(Bet.race_id).label("race_id")
+            ).join(Race).filter(
+                Race.status == 'FINISHED',
+                Bet.points >= badge.threshold,
+                Bet.user_id.notin_(already_has)
+            ).group_by(Bet.user_id)
+            user_col = Bet.user_id
+        else:
+            column = self.STATS_COLUMNS[rule]
+            query = db.query(
+                UserStats.user_id.label("user_id"),
+                UserStats.season_id.label("race_id") # Sempre NULL aqui (linha de carreira)
+            ).filter(
+                UserStats.season_id.is_(None),
+                column >= badge.threshold,
+                UserStats.user_id.notin_(already_has)
+            )
+            user_col = UserStats.user_id
+
+        total = query.count()
+        if report_progress:
+            report_progress(0, total)
+
+        granted, done = 0, 0
+        last_user_id = 0
+        while True:
+            chunk = query.filter(user_col > last_user_id).order_by(user_col).limit(self.BACKFILL_CHUNK_SIZE).all()
+            if not chunk:
+                break
+
+            inserted = insert_new_badges(db, [
+                {"user_id": row.user_id, "achievement_id": badge.id, "race_id": row.race_id, "seen": False}
+                for row in chunk
+            ])
+            if inserted:
+                data_version.bump_users(db, inserted)
+            db.commit()
+
+            granted += len(inserted)
+            done += len(chunk)
+            last_user_id = chunk[-1].user_id
+            if report_progress:
+                report_progress(done, max(total, done))
+
+        print(f"--- 🏅 Backfill '{badge.name}': {granted} medalhas entregues ---")
+        return {"achievement_id": badge.id, "granted": granted}
+
     def _grant_badge(self, db: Session, user_id: int, achievement_id: int, race_id: int = None, team_id: int = None, season_id: int = None):
-        """Salva a conquista no banco com todos os contextos"""
-        new_ua = UserAchievement(
-            user_id=user_id,
-            achievement_id=achievement_id,
-            race_id=race_id,
-            team_id=team_id,
-            season_id=season_id, # <--- Importante para Campeões
-            seen=False
-        )
-        db.add(new_ua)
+        """Salva a conquista no banco com todos os contextos (já existente = ignorada)"""
+        granted = insert_new_badges(db, [{
+            "user_id": user_id,
+            "achievement_id": achievement_id,
+            "race_id": race_id,
+            "team_id": team_id,
+            "season_id": season_id, # <--- Importante para Campeões
+            "seen": False
+        }])
+        if granted:
+            data_version.bump_users(db, granted)
         db.commit()
 
     def _check_rule(self, db: Session, badge: Achievement, user_id: int, current_bet: Bet, result: RaceResult) -> bool:
@@ -94,7 +274,13 @@ class BadgeService:
         return hits
 
     # --- PREMIAÇÃO DE FIM DE TEMPORADA ---
-    def process_season_end_awards(self, db: Session, season_id: int):
+    def process_season_end_awards(self, db: Session, season_id: int, report_progress=None) -> dict:
+        """
+        Premiação de fim de temporada (PILOT_RANKING / TEAM_RANKING).
+        As posições finais vêm da classificação oficial (ranking_query, RANK() com desempates):
+        empatados em todos os critérios recebem a mesma medalha. As medalhas são gravadas num
+        INSERT em lote com ON CONFLICT DO NOTHING (quem já tem na temporada é ignorado).
+        """
         print(f"--- 🏆 Iniciando Premiação da Temporada {season_id} ---")
         
         ranking_badges = db.query(Achievement).filter(
@@ -102,62 +288,60 @@ class BadgeService:
         ).all()
         
         if not ranking_badges:
-            return
-
-        # Ranking Pilotos
-        driver_ranking = db.query(
-            Bet.user_id,
-            func.sum(Bet.points).label("total")
-        ).join(Race).filter(
-            Race.season_id == season_id
-        ).group_by(Bet.user_id).order_by(desc("total")).all()
-        
-        driver_ids_ranked = [row.user_id for row in driver_ranking]
+            return {"season_id": season_id, "granted": 0}
+
+        positions = list({badge.threshold for badge in ranking_badges})
+
+        # Ranking Pilotos: posição -> [user_id] (só as posições premiadas)
+        driver_at = {}
+        for row in ranking_query.get_standings(db, season_id, 'DRIVER', positions=positions):
+            driver_at.setdefault(row.position, []).append(row.entity_id)
 
-        # Ranking Construtores
-        team_ranking = db.query(Team).filter(
-            Team.season_id == season_id
-        ).order_by(desc(Team.total_points)).all()
+        # Ranking Construtores: posição -> [equipe]
+        team_at = {}
+        team_rows = ranking_query.get_standings(db, season_id, 'TEAM', positions=positions)
+        teams = {team.id: team for team in db.query(Team).filter(Team.id.in_([row.entity_id for row in team_rows]))} if team_rows else {}
+        for row in team_rows:
+            team_at.setdefault(row.position, []).append(teams[row.entity_id])
 
-        count = 0
+        candidates = []
         for badge in ranking_badges:
-            target_pos = badge.threshold 
-            idx = target_pos - 1 
+            target_pos = badge.threshold
             
             if badge.rule_type == AchievementRuleType.PILOT_RANKING:
-                if idx < len(driver_ids_ranked):
-                    winner_id = driver_ids_ranked[idx]
-                    # Passa season_id para permitir multicampeonato
-                    self._grant_badge_if_not_exists(db, winner_id, badge.id, season_id=season_id)
-                    count += 1
+                for winner_id in driver_at.get(target_pos, []):
+                    candidates.append((winner_id, badge.id, None))
 
             elif badge.rule_type == AchievementRuleType.TEAM_RANKING:
-                if idx < len(team_ranking):
-                    winner_team = team_ranking[idx]
-                    # Passa season_id e team_id
-                    self._grant_badge_if_not_exists(db, winner_team.captain_id, badge.id, team_id=winner_team.id, season_id=season_id)
-                    count += 1
+                for winner_team in team_at.get(target_pos, []):
+                    candidates.append((winner_team.captain_id, badge.id, winner_team.id))
                     if winner_team.partner_id:
-                        self._grant_badge_if_not_exists(db, winner_team.partner_id, badge.id, team_id=winner_team.id, season_id=season_id)
-                        count += 1
+                        candidates.append((winner_team.partner_id, badge.id, winner_team.id))
+
+        if report_progress:
+            report_progress(0, len(candidates))
+
+        # Quem já recebeu a medalha NESSA temporada é ignorado pelo unique (permite multicampeonato):
+        # fechar a temporada duas vezes, ou retomar a tarefa, não duplica nada
+        granted = insert_new_badges(db, [
+            {
+                "user_id": user_id, "achievement_id": achievement_id,
+                "team_id": team_id, "season_id": season_id, "seen": False
+            } for user_id, achievement_id, team_id in candidates
+        ])
+        if granted:
+            data_version.bump_users(db, granted)
+        db.commit()
+
+        if report_progress:
+            report_progress(len(candidates), len(candidates))
         
-        print(f"--- 🎉 Premiação Concluída. {count} medalhas entregues. ---")
+        print(f"--- 🎉 Premiação Concluída. {len(granted)} medalhas entregues. ---")
+        return {"season_id": season_id, "granted": len(granted)}
 
     def _grant_badge_if_not_exists(self, db: Session, user_id: int, achievement_id: int, team_id: int = None, season_id: int = None):
         """
-        Verifica duplicidade.
-        Se for badge de temporada (season_id != None), verifica se já tem NESSA temporada.
-        Se for badge comum, verifica se já tem ALGUMA vez.
+        Duplicidade resolvida pelo unique (usuário, medalha, temporada):
+        badge de temporada (season_id != None) é uma por temporada; badge comum, uma só.
         """
-        query = db.query(UserAchievement).filter(
-            UserAchievement.user_id == user_id,
-            UserAchievement.achievement_id == achievement_id
-        )
-
-        if season_id:
-            query = query.filter(UserAchievement.season_id == season_id)
-        
-        exists = query.first()
-        
-        if not exists:
-            self._grant_badge(db, user_id, achievement_id, team_id=team_id, season_id=season_id)
\ No newline at end of file
+        self._grant_badge(db, user_id, achievement_id, team_id=team_id, season_id=season_id)
@@ -0,0 +1,83 @@
+import json
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.bet import Bet
+from app.models.race import Race, RaceResult, RaceStatus
+from app.services import grid_lookup
+
+# Colunas serializadas (fixas): a linha do JOIN é lida por posição, sem reflexão por objeto
+BET_COLUMNS = [column.name for column in Bet.__table__.columns]
+RESULT_COLUMNS = [column.name for column in RaceResult.__table__.columns]
+
+_BET_START = 3 # race_name, race_date, season_id
+_RESULT_START = _BET_START + len(BET_COLUMNS)
+
+def history_query(db: Session, user_id: int, season_id: int = None):
+    """
+    Apostas finalizadas do usuário com corrida e gabarito numa query só (mais recentes primeiro).
+    Linha: race_name, race_date, season_id, colunas da aposta..., colunas do gabarito (NULL se não houver).
+    """
+    query = db.query(
+        Race.name, Race.race_date, Race.season_id,
+        *[Bet.__table__.c[name] for name in BET_COLUMNS],
+        *[RaceResult.__table__.c[name] for name in RESULT_COLUMNS]
+    ).select_from(Bet).join(Race, Race.id == Bet.race_id).outerjoin(
+        RaceResult, RaceResult.race_id == Race.id
+    ).filter(
+        Bet.user_id == user_id,
+        Race.status == RaceStatus.FINISHED
+    )
+    if season_id:
+        query = query.filter(Race.season_id == season_id)
+    return query.order_by(Race.race_date.desc(), Race.id.desc())
+
+def serialize(row, grid: grid_lookup.SeasonGrid = None) -> dict:
+    """
+    Item do histórico a partir da tupla da query. Com o grid da temporada, aposta e gabarito
+    ganham os pilotos/equipe resolvidos ao lado dos ids (p1_driver_id -> p1_driver: {nome, número, foto}).
+    """
+    bet_data = dict(zip(BET_COLUMNS, row[_BET_START:_RESULT_START]))
+    result_values = row[_RESULT_START:]
+    result_data = dict(zip(RESULT_COLUMNS, result_values)) if result_values[0] is not None else None
+    if grid is not None:
+        bet_data.update(grid.resolve(bet_data))
+        if result_data is not None:
+            result_data.update(grid.resolve(result_data))
+    return {
+        "race_name": row[0],
+        "race_date": row[1],
+        "points": bet_data["points"],
+        "my_bet": bet_data,
+        "official_result": result_data
+    }
+
+def get_history(db: Session, user_id: int, season_id: int = None) -> list:
+    rows = history_query(db, user_id, season_id).all()
+    grids = grid_lookup.get_grids(db, {row.season_id for row in rows}) # Em memória: nenhuma query por linha
+    return [serialize(row, grids.get(row.season_id)) for row in rows]
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} não é serializável")
+
+STREAM_BATCH_SIZE = 200
+
+def stream_history_ndjson(user_id: int, season_id: int = None):
+    """
+    Gerador NDJSON (uma corrida por linha) para StreamingResponse.
+    Usa sessão própria: o corpo é enviado depois que a sessão da requisição já foi fechada.
+    As linhas vêm do banco em lotes (yield_per), então a memória não cresce com o histórico.
+    """
+    db = SessionLocal()
+    try:
+        grids = {}
+        rows = history_query(db, user_id, season_id).yield_per(STREAM_BATCH_SIZE)
+        for row in rows:
+            if row.season_id not in grids: # Uma consulta ao grid por temporada, não por linha
+                grids[row.season_id] = grid_lookup.get_grid(db, row.season_id)
+            yield json.dumps(serialize(row, grids[row.season_id]), default=_json_default, ensure_ascii=False) + "\n"
+    finally:
+        db.close()
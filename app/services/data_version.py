@@ -0,0 +1,55 @@
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+from app.models.bet import Bet
+from app.models.race import Race
+from app.models.season import Season
+from app.models.team import Team
+from app.models.user import User
+
+# Contadores usados nos ETags (app/api/etag.py). Todas as funções são SEM commit:
+# o incremento entra na mesma transação da mudança, então o ETag nunca fica à frente do dado.
+#   Season.data_version -> calendário, status e resultados das corridas da temporada
+#   User.data_version   -> apostas, equipe, conquistas e pontos do usuário
+#   Season.ranking_version (LeaderboardService) -> ranking
+
+def bump_season(db: Session, season_id: int):
+    """Incrementa a versão de dados da temporada (atômico, SEM commit)."""
+    if season_id is None:
+        return
+    db.query(Season).filter(Season.id == season_id).update(
+        {Season.data_version: Season.data_version + 1}, synchronize_session=False
+    )
+
+def bump_users(db: Session, user_ids, with_teammates: bool = False):
+    """
+    Incrementa a versão de dados dos usuários (atômico, SEM commit).
+    `user_ids` pode ser uma lista ou um SELECT de ids (ex: apostadores de uma corrida).
+    with_teammates=True inclui os parceiros de equipe (a tela "minha equipe" mostra os dois).
+    """
+    if isinstance(user_ids, (list, tuple, set, frozenset)):
+        user_ids = [uid for uid in set(user_ids) if uid is not None]
+        if not user_ids:
+            return
+
+    condition = User.id.in_(user_ids)
+    if with_teammates:
+        condition = or_(
+            condition,
+            User.id.in_(select(Team.captain_id).where(Team.partner_id.in_(user_ids))),
+            User.id.in_(select(Team.partner_id).where(Team.captain_id.in_(user_ids)))
+        )
+    db.query(User).filter(condition).update(
+        {User.data_version: User.data_version + 1}, synchronize_session=False
+    )
+
+def bump_team_members(db: Session, *teams):
+    """Incrementa a versão dos membros (capitão e parceiro) das equipes (SEM commit)."""
+    bump_users(db, [uid for team in teams if team is not None for uid in (team.captain_id, team.partner_id)])
+
+def bump_race_bettors(db: Session, race_id: int):
+    """Incrementa a versão de todos que apostaram na corrida e dos seus parceiros (SEM commit)."""
+    bump_users(db, select(Bet.user_id).where(Bet.race_id == race_id), with_teammates=True)
+
+def bump_season_bettors(db: Session, season_id: int):
+    """Incrementa a versão de todos que apostaram em alguma corrida da temporada e dos parceiros (SEM commit)."""
+    bump_users(db, select(Bet.user_id).join(Race).where(Race.season_id == season_id).distinct(), with_teammates=True)
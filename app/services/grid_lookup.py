@@ -0,0 +1,93 @@
+import time
+import threading
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.season import RealDriver, RealTeam
+
+# Campos de palpite (iguais em Bet e RaceResult) que apontam para pilotos/equipes reais.
+# No payload, cada "<campo>_id" ganha ao lado o "<campo>" resolvido (ex: p1_driver_id -> p1_driver).
+DRIVER_FIELDS = ["pole_driver_id", "dotd_driver_id"] + [f"p{position}_driver_id" for position in range(1, 11)]
+TEAM_FIELDS = ["winning_team_id"]
+
+class SeasonGrid:
+    """Pilotos e equipes de uma temporada em dicionários por id (referência pequena e quase imutável)."""
+
+    def __init__(self, season_id: int, teams: list, drivers: list):
+        self.season_id = season_id
+        self.teams = {
+            team.id: {"id": team.id, "name": team.name, "logo_url": team.logo_url} for team in teams
+        }
+        self.drivers = {
+            driver.id: {
+                "id": driver.id,
+                "name": driver.name,
+                "number": driver.number,
+                "photo_url": driver.photo_url,
+                "team_id": driver.real_team_id,
+                "team_name": self.teams.get(driver.real_team_id, {}).get("name")
+            } for driver in drivers
+        }
+        self.built_at = time.monotonic()
+
+    def resolve(self, picks: dict) -> dict:
+        """{"p1_driver": {...}, "winning_team": {...}, ...} para os ids de `picks` (None se não achar)."""
+        resolved = {field[:-3]: self.drivers.get(picks.get(field)) for field in DRIVER_FIELDS}
+        resolved.update({field[:-3]: self.teams.get(picks.get(field)) for field in TEAM_FIELDS})
+        return resolved
+
+# season_id -> SeasonGrid. O CRUD de F1 do admin marca a temporada como suja depois do commit
+# (recarregada na próxima leitura); GRID_LOOKUP_MAX_AGE cobre mudanças feitas por outros processos.
+_grids = {}
+_dirty = set()
+_grids_guard = threading.Lock()
+
+def invalidate(season_id: int = None):
+    """Marca o grid da temporada para recarga (todos se season_id for None). Chamar após o commit."""
+    with _grids_guard:
+        if season_id is None:
+            _dirty.update(_grids)
+        else:
+            _dirty.add(season_id)
+
+def _is_fresh(season_id: int, grid: SeasonGrid) -> bool:
+    return (
+        grid is not None and season_id not in _dirty
+        and time.monotonic() - grid.built_at < settings.GRID_LOOKUP_MAX_AGE
+    )
+
+def get_grids(db: Session, season_ids) -> dict:
+    """
+    {season_id: SeasonGrid} das temporadas pedidas. As que faltam (ou expiraram) são carregadas
+    juntas: 1 query de equipes + 1 de pilotos, independente de quantas temporadas/linhas.
+    """
+    season_ids = {season_id for season_id in season_ids if season_id is not None}
+    grids = {season_id: _grids.get(season_id) for season_id in season_ids}
+    missing = [season_id for season_id, grid in grids.items() if not _is_fresh(season_id, grid)]
+    if missing:
+        with _grids_guard:
+            _dirty.difference_update(missing) # Invalidações durante a carga marcam de novo
+        teams = db.query(RealTeam).filter(RealTeam.season_id.in_(missing)).all()
+        drivers = db.query(RealDriver).filter(RealDriver.season_id.in_(missing)).all()
+        loaded = {
+            season_id: SeasonGrid(
+                season_id,
+                [team for team in teams if team.season_id == season_id],
+                [driver for driver in drivers if driver.season_id == season_id]
+            ) for season_id in missing
+        }
+        with _grids_guard:
+            # Invalidada durante a carga: devolve o que leu, mas não guarda (a próxima leitura recarrega)
+            _grids.update({season_id: grid for season_id, grid in loaded.items() if season_id not in _dirty})
+        grids.update(loaded)
+    return grids
+
+def get_grid(db: Session, season_id: int) -> SeasonGrid:
+    """Atalho para uma temporada só."""
+    return get_grids(db, [season_id]).get(season_id)
+
+def resolve(grid: SeasonGrid, picks: dict) -> dict:
+    """Como SeasonGrid.resolve, mas tolera temporada inexistente (tudo None)."""
+    if grid is None:
+        return {field[:-3]: None for field in DRIVER_FIELDS + TEAM_FIELDS}
+    return grid.resolve(picks)
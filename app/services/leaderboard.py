@@ -1,64 +1,302 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import update, insert
 from app.models.ranking_cache import RankingCache
-from app.models.bet import Bet
 from app.models.team import Team
-from app.models.race import Race
+from app.models.season import Season
+from app.models.user import User
+from app.services import rank_index, points_matrix, ranking_query
+from app.services.snapshots import SnapshotService
 
 class LeaderboardService:
     
     def refresh_leaderboard(self, db: Session, season_id: int):
         """
-        Recalcula todo o ranking da temporada e salva no cache.
+        Recalcula todo o ranking da temporada e sincroniza com o cache.
         Chamado após processamento de corridas ou penalidades.
+        Só as linhas que mudaram (pontos/posição) são gravadas, numa única transação:
+        quem lê o ranking nunca vê o cache vazio.
         """
         print(f"--- 🔄 Atualizando Cache de Ranking (Temporada {season_id}) ---")
         
-        # 1. Limpar Cache Antigo desta temporada
-        db.query(RankingCache).filter(RankingCache.season_id == season_id).delete()
-        
-        # --- 2. CACHE DE PILOTOS (DRIVERS) ---
-        # Soma pontos de todas as corridas finalizadas
-        drivers_data = db.query(
-            Bet.user_id,
-            func.sum(Bet.points).label("total")
-        ).join(Race).filter(
-            Race.season_id == season_id,
-            Race.status == 'FINISHED'
-        ).group_by(Bet.user_id).order_by(desc("total")).all()
-        
-        driver_cache = []
-        for i, (user_id, points) in enumerate(drivers_data):
-            driver_cache.append(RankingCache(
-                season_id=season_id,
-                category='DRIVER',
-                entity_id=user_id,
-                points=points,
-                position=i + 1
-            ))
-        
-        if driver_cache:
-            db.add_all(driver_cache)
-
-        # --- 3. CACHE DE CONSTRUTORES (TEAMS) ---
-        # Para times, podemos confiar no campo 'total_points' que já mantemos atualizado,
-        # ou recalcular tudo para garantir consistência. Vamos confiar no Team.total_points por enquanto.
-        teams_data = db.query(Team).filter(
-            Team.season_id == season_id
-        ).order_by(desc(Team.total_points)).all()
-        
-        team_cache = []
-        for i, team in enumerate(teams_data):
-            team_cache.append(RankingCache(
-                season_id=season_id,
-                category='TEAM',
-                entity_id=team.id,
-                points=team.total_points,
-                position=i + 1
-            ))
-            
-        if team_cache:
-            db.add_all(team_cache)
+        # Classificação calculada no banco (RANK() com desempates), sincronizada categoria a categoria.
+        # Pilotos: pontos materializados no UserStats; Construtores: Team.total_points
+        standings, changed = {}, 0
+        for category in ('DRIVER', 'TEAM'):
+            standings[category], category_changed = self.sync_standings(db, season_id, category)
+            changed += category_changed
+        if changed:
+            self.bump_version(db, season_id)
             
         db.commit()
-        print("--- ✅ Cache Atualizado com Sucesso ---")
\ No newline at end of file
+
+        # Índice de posições em memória já sai pronto com a classificação nova
+        version = self.get_version(db, season_id)
+        for category, rows in standings.items():
+            rank_index.publish(season_id, category, version, {
+                entity_id: (points, position) for entity_id, points, position in rows
+            })
+        # Matriz usuários x corridas (classificação por janela de corridas)
+        points_matrix.refresh(db, season_id)
+        self.publish_snapshots(db, season_id)
+        print(f"--- ✅ Cache Atualizado com Sucesso ({changed} linhas alteradas) ---")
+        return changed
+
+    def sync_standings(self, db: Session, season_id: int, category: str, with_display: bool = True):
+        """
+        Sincroniza uma categoria do cache com a classificação do banco, SEM commit.
+        Só as linhas que mudaram (pontos/posição/exibição) são gravadas; sobras (ex: equipe excluída) saem.
+        with_display=False: mantém a exibição gravada (montada só para linhas novas).
+        Retorna ([(entity_id, points, position)], linhas alteradas).
+        """
+        standings = [
+            (row.entity_id, row.points or 0, row.position)
+            for row in ranking_query.get_standings(db, season_id, category)
+        ]
+        existing = db.query(
+            RankingCache.id, RankingCache.entity_id, RankingCache.points, RankingCache.position, RankingCache.display
+        ).filter(RankingCache.season_id == season_id, RankingCache.category == category).all()
+        current = {row.entity_id: row for row in existing}
+
+        display_ids = [entity_id for entity_id, _, _ in standings if with_display or entity_id not in current]
+        displays = self.build_display(db, season_id, category, display_ids)
+
+        updates, inserts = [], []
+        for entity_id, points, position in standings:
+            row = current.pop(entity_id, None)
+            if row is None:
+                inserts.append({
+                    "season_id": season_id, "category": category, "entity_id": entity_id,
+                    "points": points, "position": position, "display": displays.get(entity_id)
+                })
+                continue
+            display = displays.get(entity_id) if with_display else row.display
+            if row.points != points or row.position != position or row.display != display:
+                updates.append({"id": row.id, "points": points, "position": position, "display": display})
+
+        # Sobras: quem saiu do ranking (ex: equipe excluída)
+        stale_ids = [row.id for row in current.values()]
+
+        if updates:
+            db.execute(update(RankingCache), updates)
+        if inserts:
+            db.execute(insert(RankingCache), inserts)
+        if stale_ids:
+            db.query(RankingCache).filter(RankingCache.id.in_(stale_ids)).delete(synchronize_session=False)
+
+        return standings, len(updates) + len(inserts) + len(stale_ids)
+
+    def build_display(self, db: Session, season_id: int, category: str, entity_ids: list) -> dict:
+        """
+        Campos de exibição do ranking, em lote: {entity_id: dict}.
+        Entidades que não existem mais (usuário/equipe excluídos) ficam de fora.
+        """
+        if not entity_ids:
+            return {}
+
+        if category == 'DRIVER':
+            users = db.query(User.id, User.full_name, User.profile_image_url).filter(User.id.in_(entity_ids)).all()
+
+            # Equipe de cada piloto na temporada (capitão ou parceiro)
+            teams = db.query(
+                Team.id, Team.name, Team.primary_color, Team.logo_url, Team.captain_id, Team.partner_id
+            ).filter(
+                Team.season_id == season_id,
+                (Team.captain_id.in_(entity_ids)) | (Team.partner_id.in_(entity_ids))
+            ).order_by(Team.id).all()
+            team_of = {}
+            for team in teams:
+                for member_id in (team.captain_id, team.partner_id):
+                    if member_id:
+                        team_of.setdefault(member_id, team)
+
+            display = {}
+            for user in users:
+                team = team_of.get(user.id)
+                display[user.id] = {
+                    "name": user.full_name,
+                    "profile_image_url": user.profile_image_url,
+                    "team_id": team.id if team else None,
+                    "team_name": team.name if team else "Sem Equipe",
+                    "team_color": team.primary_color if team else "#666",
+                    "team_logo": team.logo_url if team else None
+                }
+            return display
+
+        teams = db.query(Team).filter(Team.id.in_(entity_ids)).all()
+        member_ids = {m for team in teams for m in (team.captain_id, team.partner_id) if m}
+        members = {
+            u.id: {"id": u.id, "name": u.full_name, "photo": u.profile_image_url}
+            for u in db.query(User.id, User.full_name, User.profile_image_url).filter(User.id.in_(member_ids)).all()
+        } if member_ids else {}
+
+        return {
+            team.id: {
+                "name": team.name,
+                "logo_url": team.logo_url,
+                "primary_color": team.primary_color,
+                "secondary_color": team.secondary_color,
+                "captain": members.get(team.captain_id),
+                "partner": members.get(team.partner_id)
+            } for team in teams
+        }
+
+    def refresh_display(self, db: Session, user_ids: list = (), team_ids: list = ()):
+        """
+        Atualiza os campos de exibição após edição de perfil/equipe (todas as temporadas). SEM commit.
+        Usuários arrastam as equipes em que estão; equipes arrastam seus membros.
+        O ranking de equipes das temporadas tocadas é reclassificado (pontos e posições do banco).
+        Retorna as temporadas cujo ranking mudou (para republicar os snapshots após o commit).
+        """
+        db.flush() # A sessão não usa autoflush: as edições pendentes precisam valer nas queries abaixo
+        user_ids = {u for u in user_ids if u}
+        team_ids = {t for t in team_ids if t}
+        if user_ids:
+            team_ids |= {row.id for row in db.query(Team.id).filter(
+                (Team.captain_id.in_(user_ids)) | (Team.partner_id.in_(user_ids))
+            ).all()}
+        if team_ids:
+            for team in db.query(Team.captain_id, Team.partner_id).filter(Team.id.in_(team_ids)).all():
+                user_ids |= {m for m in (team.captain_id, team.partner_id) if m}
+        if not user_ids and not team_ids:
+            return set()
+
+        rows = db.query(RankingCache.id, RankingCache.season_id, RankingCache.category, RankingCache.entity_id, RankingCache.display).filter(
+            ((RankingCache.category == 'DRIVER') & RankingCache.entity_id.in_(user_ids or [0])) |
+            ((RankingCache.category == 'TEAM') & RankingCache.entity_id.in_(team_ids or [0]))
+        ).all()
+
+        groups = {}
+        for row in rows:
+            groups.setdefault((row.season_id, row.category), []).append(row)
+
+        updates, stale_ids, seasons = [], [], set()
+        for (season_id, category), group in groups.items():
+            display = self.build_display(db, season_id, category, [row.entity_id for row in group])
+            for row in group:
+                if row.entity_id not in display:
+                    stale_ids.append(row.id) # Equipe/usuário excluído
+                elif row.display != display[row.entity_id]:
+                    updates.append({"id": row.id, "display": display[row.entity_id]})
+                else:
+                    continue
+                seasons.add(season_id)
+
+        if updates:
+            db.execute(update(RankingCache), updates)
+        if stale_ids:
+            db.query(RankingCache).filter(RankingCache.id.in_(stale_ids)).delete(synchronize_session=False)
+
+        # Equipe excluída, saída/expulsão (débito de pontos e acertos da dupla): reclassifica as equipes
+        team_seasons = {season_id for season_id, category in groups if category == 'TEAM'}
+        if team_ids:
+            team_seasons |= {row.season_id for row in db.query(Team.season_id).filter(Team.id.in_(team_ids)).all()}
+        for season_id in team_seasons:
+            _, changed = self.sync_standings(db, season_id, 'TEAM', with_display=False)
+            if changed:
+                seasons.add(season_id)
+
+        for season_id in seasons:
+            self.bump_version(db, season_id)
+        return seasons
+
+    def publish_snapshots(self, db: Session, season_id: int):
+        """Republica o JSON estático do ranking (falha aqui não derruba o processamento)."""
+        try:
+            SnapshotService().publish_rankings(db, season_id)
+        except Exception as e:
+            print(f"❌ Erro ao publicar snapshot do ranking (Temporada {season_id}): {e}")
+
+    def bump_version(self, db: Session, season_id: int):
+        """Incrementa a versão do ranking da temporada (atômico, SEM commit)."""
+        db.query(Season).filter(Season.id == season_id).update(
+            {Season.ranking_version: Season.ranking_version + 1}, synchronize_session=False
+        )
+
+    def get_version(self, db: Session, season_id: int) -> int:
+        """Versão atual do ranking da temporada (0 se a temporada não existe)."""
+        version = db.query(Season.ranking_version).filter(Season.id == season_id).scalar()
+        return version or 0
+
+    def apply_point_deltas(self, db: Session, season_id: int, driver_deltas: dict, team_deltas: dict):
+        """
+        Atualização incremental do cache (correções de resultado), SEM commit.
+        Soma os saldos nas linhas afetadas e recalcula as posições só da categoria alterada
+        (mesma classificação do refresh, sobre os pontos já ajustados nesta transação),
+        sem refazer a agregação sobre todas as apostas.
+        """
+        for category, deltas in (('DRIVER', driver_deltas), ('TEAM', team_deltas)):
+            if not deltas:
+                continue
+
+            rows = db.query(RankingCache).filter(
+                RankingCache.season_id == season_id,
+                RankingCache.category == category
+            ).all()
+            by_entity = {row.entity_id: row for row in rows}
+
+            new_ids = [entity_id for entity_id in deltas if entity_id not in by_entity]
+            new_display = self.build_display(db, season_id, category, new_ids)
+
+            for entity_id, delta in deltas.items():
+                row = by_entity.get(entity_id)
+                if row:
+                    row.points = (row.points or 0) + delta
+                else:
+                    row = RankingCache(
+                        season_id=season_id, category=category, entity_id=entity_id,
+                        points=delta, position=0, display=new_display.get(entity_id)
+                    )
+                    db.add(row)
+                    rows.append(row)
+
+            db.flush()
+            positions = {
+                row.entity_id: row.position for row in ranking_query.get_standings(db, season_id, category)
+            }
+            for row in rows:
+                position = positions.get(row.entity_id, len(positions) + 1)
+                if row.position != position:
+                    row.position = position
+
+        if driver_deltas or team_deltas:
+            self.bump_version(db, season_id)
+
+        print(f"--- 🔄 Cache de Ranking Ajustado (Temporada {season_id}: {len(driver_deltas)} pilotos, {len(team_deltas)} equipes) ---")
+
+    def project_standings(self, db: Session, season_id: int, category: str, deltas: dict, hit_deltas: dict = None) -> list:
+        """
+        Classificação projetada (SOMENTE LEITURA): classificação atual + saldos de pontos (`deltas`)
+        e de acertos exatos (`hit_deltas`), com os desempates do ranking (ranking_query.assign_positions).
+        Retorna [{entity_id, points, position, previous_position, previous_points}] ordenado.
+        """
+        hit_deltas = hit_deltas or {}
+        current = ranking_query.ranking_subquery(season_id, category)
+        rows = {row.entity_id: row for row in db.query(
+            current.c.entity_id, current.c.points, current.c.exact_hits, current.c.signup, current.c.position
+        ).all()}
+
+        # Quem ainda não está na classificação entra com o que ganhar nesta corrida
+        newcomers = [entity_id for entity_id in set(deltas) | set(hit_deltas) if entity_id not in rows]
+        if category == 'DRIVER':
+            signup = dict(db.query(User.id, User.created_at).filter(User.id.in_(newcomers)).all()) if newcomers else {}
+        else:
+            signup = {team_id: team_id for team_id in newcomers} # Equipes: ordem de criação
+
+        entries = [
+            (entity_id, (row.points or 0) + deltas.get(entity_id, 0),
+             (row.exact_hits or 0) + hit_deltas.get(entity_id, 0), row.signup)
+            for entity_id, row in rows.items()
+        ] + [
+            (entity_id, deltas.get(entity_id, 0), hit_deltas.get(entity_id, 0), signup.get(entity_id))
+            for entity_id in newcomers
+        ]
+
+        return [
+            {
+                "entity_id": entity_id,
+                "points": points,
+                "position": position,
+                "previous_points": (rows[entity_id].points or 0) if entity_id in rows else 0,
+                "previous_position": rows[entity_id].position if entity_id in rows else None
+            } for entity_id, points, position in ranking_query.assign_positions(entries)
+        ]
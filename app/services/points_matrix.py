@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+from app.models.bet import Bet
+from app.models.race import Race, RaceResult, RaceStatus
+from app.models.season import Season
+from app.models.user import User
+from app.services import ranking_query
+from app.services.user_stats import TOP10_FIELDS
+
+class PointsMatrix:
+    """
+    Pontos e acertos exatos da temporada em memória: usuários x corridas finalizadas
+    (ordem de data), com somas acumuladas por linha. O total de qualquer janela de corridas
+    é uma subtração de duas colunas, sem GROUP BY no banco.
+    """
+
+    def __init__(self, version: int, race_ids: list, user_ids: np.ndarray, points: np.ndarray,
+                 exact_hits: np.ndarray = None, signup: dict = None):
+        self.version = version
+        self.race_ids = race_ids
+        self.race_pos = {race_id: i for i, race_id in enumerate(race_ids)}
+        self.user_ids = user_ids
+        self.signup = signup or {}
+        # prefix[:, j] = pontos das j primeiras corridas (coluna 0 = zero); exact_prefix idem para acertos
+        self.prefix = np.zeros((len(user_ids), len(race_ids) + 1), dtype=np.int64)
+        np.cumsum(points, axis=1, out=self.prefix[:, 1:])
+        self.exact_prefix = np.zeros_like(self.prefix)
+        if exact_hits is not None:
+            np.cumsum(exact_hits, axis=1, out=self.exact_prefix[:, 1:])
+
+    def window_standings(self, from_race: int = None, to_race: int = None) -> list:
+        """
+        Classificação da janela [from_race, to_race] (ids de corrida, inclusive; sem limites = temporada).
+        Retorna [(user_id, points, position)] com os desempates do ranking (acertos exatos da janela,
+        inscrição) e posições como o RANK() do ranking_query. None se a corrida não está na matriz.
+        """
+        start = self.race_pos.get(from_race, None) if from_race else 0
+        end = self.race_pos.get(to_race, None) if to_race else len(self.race_ids) - 1
+        if start is None or end is None:
+            return None
+        if end < start or len(self.user_ids) == 0:
+            return []
+
+        window = self.prefix[:, end + 1] - self.prefix[:, start]
+        exact = self.exact_prefix[:, end + 1] - self.exact_prefix[:, start]
+        return ranking_query.assign_positions([
+            (user_id, points, hits, self.signup.get(user_id))
+            for user_id, points, hits in zip(self.user_ids.tolist(), window.tolist(), exact.tolist())
+        ])
+
+def build(db: Session, season_id: int, version: int) -> PointsMatrix:
+    """Monta a matriz com UMA query sobre as apostas das corridas finalizadas."""
+    race_ids = [row.id for row in db.query(Race.id).filter(
+        Race.season_id == season_id,
+        Race.status == RaceStatus.FINISHED
+    ).order_by(Race.race_date, Race.id).all()]
+
+    exact_hits = sum(
+        case(((getattr(Bet, f) != None) & (getattr(Bet, f) == getattr(RaceResult, f)), 1), else_=0)
+        for f in TOP10_FIELDS
+    )
+    rows = db.query(Bet.user_id, Bet.race_id, Bet.points, exact_hits.label("exact_hits")).outerjoin(
+        RaceResult, RaceResult.race_id == Bet.race_id
+    ).filter(
+        Bet.race_id.in_(race_ids)
+    ).all() if race_ids else []
+
+    if not rows:
+        return PointsMatrix(version, race_ids, np.zeros(0, dtype=np.int64), np.zeros((0, len(race_ids)), dtype=np.int64))
+
+    data = np.array([(r.user_id, r.race_id, r.points or 0, r.exact_hits or 0) for r in rows], dtype=np.int64)
+    user_ids, user_idx = np.unique(data[:, 0], return_inverse=True)
+    race_lookup = {race_id: i for i, race_id in enumerate(race_ids)}
+    race_idx = np.array([race_lookup[race_id] for race_id in data[:, 1].tolist()], dtype=np.int64)
+
+    points = np.zeros((len(user_ids), len(race_ids)), dtype=np.int64)
+    np.add.at(points, (user_idx, race_idx), data[:, 2])
+    exact = np.zeros_like(points)
+    np.add.at(exact, (user_idx, race_idx), data[:, 3])
+
+    # Último desempate do ranking: inscrição mais antiga
+    signup = dict(db.query(User.id, User.created_at).filter(User.id.in_(user_ids.tolist())).all())
+    return PointsMatrix(version, race_ids, user_ids, points, exact, signup)
+
+# season_id -> PointsMatrix, validada pela Season.ranking_version (como o rank_index)
+_matrices = {}
+_matrices_guard = threading.Lock()
+
+def refresh(db: Session, season_id: int) -> PointsMatrix:
+    """Reconstrói a matriz da temporada (chamado pelo LeaderboardService após o refresh)."""
+    version = db.query(Season.ranking_version).filter(Season.id == season_id).scalar() or 0
+    matrix = build(db, season_id, version)
+    with _matrices_guard:
+        _matrices[season_id] = matrix
+    return matrix
+
+def get_matrix(db: Session, season_id: int) -> PointsMatrix:
+    """Matriz atualizada da temporada. Reconstrói se o ranking mudou desde a montagem."""
+    version = db.query(Season.ranking_version).filter(Season.id == season_id).scalar() or 0
+    matrix = _matrices.get(season_id)
+    if matrix is not None and matrix.version == version:
+        return matrix
+    return refresh(db, season_id)
@@ -0,0 +1,81 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.models.ranking_cache import RankingCache
+from app.models.season import Season, RealDriver, RealTeam
+
+# Consultas das rotas públicas que também viram snapshot (services/snapshots.py):
+# a rota e o publicador chamam a mesma função, então o JSON estático é idêntico ao da API.
+
+def seasons_list(db: Session) -> list:
+    """Temporadas, da mais recente para a mais antiga."""
+    seasons = db.query(Season).order_by(Season.year.desc()).all()
+    return [{"id": s.id, "year": s.year, "is_active": s.is_active} for s in seasons]
+
+def grid_info(db: Session, season_id: Optional[int] = None) -> list:
+    """Equipes reais da temporada (ou da ativa), cada uma com seus pilotos."""
+    if season_id:
+        season = db.query(Season).filter(Season.id == season_id).first()
+    else:
+        season = db.query(Season).filter(Season.is_active == True).first()
+
+    if not season: return []
+
+    teams = db.query(RealTeam).filter(RealTeam.season_id == season.id).all()
+    drivers = db.query(RealDriver).filter(RealDriver.season_id == season.id).all()
+
+    grid = []
+    for t in teams:
+        team_drivers = [d for d in drivers if d.real_team_id == t.id]
+        grid.append({
+            "id": t.id,
+            "name": t.name,
+            "logo_url": t.logo_url,
+            "drivers": [{"id": d.id, "name": d.name, "number": d.number, "photo_url": d.photo_url} for d in team_drivers]
+        })
+    return grid
+
+def ranking_window(
+    db: Session, season_id: int, category: str,
+    offset: int = 0, limit: Optional[int] = None,
+    position_from: Optional[int] = None, position_to: Optional[int] = None,
+    around: Optional[int] = None, radius: int = 5
+) -> list:
+    """
+    Fatia do ranking no cache, sempre por faixa de posição (índice season/category/position):
+    - around: posições [p - radius, p + radius] em volta da entidade (usuário ou equipe)
+    - position_from/position_to: faixa fechada de posições
+    - offset/limit: paginação simples (sem limit = tabela inteira)
+    """
+    query = db.query(
+        RankingCache.entity_id, RankingCache.points, RankingCache.position, RankingCache.display
+    ).filter(
+        RankingCache.season_id == season_id,
+        RankingCache.category == category
+    )
+
+    if around is not None:
+        center = db.query(RankingCache.position).filter(
+            RankingCache.season_id == season_id,
+            RankingCache.category == category,
+            RankingCache.entity_id == around
+        ).scalar()
+        if center is None:
+            return []
+        position_from, position_to = max(1, center - radius), center + radius
+
+    if position_from is not None:
+        query = query.filter(RankingCache.position >= position_from)
+    if position_to is not None:
+        query = query.filter(RankingCache.position <= position_to)
+
+    query = query.order_by(RankingCache.position, RankingCache.entity_id)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+
+    return [
+        {"id": row.entity_id, **row.display, "points": row.points, "position": row.position} # Pontos do cache
+        for row in query.all() if row.display
+    ]
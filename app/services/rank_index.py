@@ -0,0 +1,78 @@
+import threading
+from bisect import bisect_right
+from sqlalchemy.orm import Session
+from app.models.ranking_cache import RankingCache
+from app.models.season import Season
+
+class RankIndex:
+    """
+    Estatística de ordem de uma temporada/categoria em memória.
+    Pontos ordenados (crescente) + (pontos, posição) por entidade: percentil e
+    "pontos para subir" saem em O(log n) com bisect. A posição é a da classificação
+    oficial (ranking_query: RANK() com desempates), gravada no cache.
+    """
+
+    def __init__(self, version: int, standings: dict):
+        self.version = version
+        self.standings = standings
+        self.sorted_points = sorted(points for points, _ in standings.values())
+
+    def __len__(self):
+        return len(self.sorted_points)
+
+    def lookup(self, entity_id: int):
+        """{rank, percentile, points, points_to_next, total} ou None se a entidade não está no ranking."""
+        if entity_id not in self.standings:
+            return None
+        points, position = self.standings[entity_id]
+
+        total = len(self.sorted_points)
+        at_or_below = bisect_right(self.sorted_points, points)
+        above = total - at_or_below
+
+        return {
+            "rank": position,
+            # % do grid com pontuação menor ou igual (o líder fica com 100)
+            "percentile": round(100 * at_or_below / total, 1),
+            "points": points,
+            # Diferença para a próxima pontuação acima (None para o líder)
+            "points_to_next": self.sorted_points[at_or_below] - points if above else None,
+            "total": total
+        }
+
+# (season_id, category) -> RankIndex. Cada índice lembra a Season.ranking_version de origem,
+# então mudanças feitas por outro processo (workers/CLI) também invalidam o índice deste.
+_indexes = {}
+_indexes_guard = threading.Lock()
+
+def publish(season_id: int, category: str, version: int, standings: dict):
+    """
+    Substitui o índice com a classificação recém-gravada (chamado após o refresh do ranking).
+    standings: {entity_id: (pontos, posição)}
+    """
+    index = RankIndex(version, standings)
+    with _indexes_guard:
+        _indexes[(season_id, category)] = index
+    return index
+
+def get_index(db: Session, season_id: int, category: str, version: int = None) -> RankIndex:
+    """
+    Índice atualizado da temporada/categoria. Reconstrói a partir do RankingCache se a versão mudou.
+    `version`: Season.ranking_version já lida pelo chamador (evita a query de versão).
+    """
+    if version is None:
+        version = db.query(Season.ranking_version).filter(Season.id == season_id).scalar() or 0
+
+    index = _indexes.get((season_id, category))
+    if index is not None and index.version == version:
+        return index
+
+    rows = db.query(RankingCache.entity_id, RankingCache.points, RankingCache.position).filter(
+        RankingCache.season_id == season_id,
+        RankingCache.category == category
+    ).all()
+    return publish(season_id, category, version, {row.entity_id: (row.points or 0, row.position) for row in rows})
+
+def lookup(db: Session, season_id: int, category: str, entity_id: int, version: int = None):
+    """Atalho: posição/percentil/pontos para subir de uma entidade (None se fora do ranking)."""
+    return get_index(db, season_id, category, version).lookup(entity_id)
@@ -0,0 +1,180 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, or_, case
+from app.models.ranking_history import RankingHistory
+from app.models.ranking_cache import RankingCache
+from app.models.race import Race, RaceResult, RaceStatus
+from app.models.bet import Bet
+from app.models.team import Team
+from app.models.user import User
+from app.services import ranking_query
+from app.services.user_stats import TOP10_FIELDS
+
+class RankingHistoryService:
+
+    def _finished_races(self, db: Session, season_id: int) -> list:
+        return [row.id for row in db.query(Race.id).filter(
+            Race.season_id == season_id,
+            Race.status == RaceStatus.FINISHED
+        ).order_by(Race.race_date, Race.id).all()]
+
+    def _previous_positions(self, db: Session, race_id: int) -> dict:
+        """{(category, entity_id): position} da foto de uma corrida."""
+        if race_id is None:
+            return {}
+        rows = db.query(RankingHistory.category, RankingHistory.entity_id, RankingHistory.position).filter(
+            RankingHistory.race_id == race_id
+        ).all()
+        return {(row.category, row.entity_id): row.position for row in rows}
+
+    def snapshot_race(self, db: Session, race: Race) -> int:
+        """
+        Grava a foto do campeonato após a corrida. Chamado na fase RANKING do processamento.
+        Corrida mais recente: copia o RankingCache (já atualizado). Correção de uma corrida
+        antiga: refaz a foto dela e de todas as seguintes, pois o acumulado mudou.
+        """
+        race_ids = self._finished_races(db, race.season_id)
+        if race.id not in race_ids:
+            return 0
+        idx = race_ids.index(race.id)
+        if idx < len(race_ids) - 1:
+            return self.rebuild(db, race.season_id, from_race_id=race.id)
+
+        previous = self._previous_positions(db, race_ids[idx - 1] if idx > 0 else None)
+        cache = db.query(
+            RankingCache.category, RankingCache.entity_id, RankingCache.points, RankingCache.position
+        ).filter(RankingCache.season_id == race.season_id).all()
+
+        rows = [{
+            "season_id": race.season_id, "race_id": race.id, "category": row.category,
+            "entity_id": row.entity_id, "points": row.points or 0, "position": row.position,
+            "previous_position": previous.get((row.category, row.entity_id))
+        } for row in cache]
+
+        db.query(RankingHistory).filter(RankingHistory.race_id == race.id).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(RankingHistory), rows)
+        db.commit()
+        return len(rows)
+
+    def rebuild(self, db: Session, season_id: int, from_race_id: int = None) -> int:
+        """
+        Refaz as fotos da temporada (todas, ou de `from_race_id` em diante) a partir das apostas:
+        uma agregação por (corrida, piloto) e uma por (corrida, equipe), acumuladas em ordem de data.
+        Mesmo critério do ranking: pilotos somam as próprias apostas; equipes somam as apostas
+        feitas pela equipe de quem ainda é membro. Posições com os desempates do ranking_query
+        (acertos exatos acumulados até a corrida, inscrição).
+        """
+        race_ids = self._finished_races(db, season_id)
+        start = race_ids.index(from_race_id) if from_race_id in race_ids else 0
+
+        exact_hits = sum(
+            case(((getattr(Bet, f) != None) & (getattr(Bet, f) == getattr(RaceResult, f)), 1), else_=0)
+            for f in TOP10_FIELDS
+        )
+        driver_rows = db.query(
+            Bet.race_id, Bet.user_id, func.coalesce(func.sum(Bet.points), 0), func.coalesce(func.sum(exact_hits), 0)
+        ).outerjoin(RaceResult, RaceResult.race_id == Bet.race_id).filter(
+            Bet.race_id.in_(race_ids)
+        ).group_by(Bet.race_id, Bet.user_id).all() if race_ids else []
+
+        team_rows = db.query(
+            Bet.race_id, Team.id, func.coalesce(func.sum(Bet.points), 0)
+        ).join(Team, Team.id == Bet.team_id).filter(
+            Bet.race_id.in_(race_ids),
+            or_(Bet.user_id == Team.captain_id, Bet.user_id == Team.partner_id)
+        ).group_by(Bet.race_id, Team.id).all() if race_ids else []
+
+        driver_points, driver_exact = {}, {}
+        for race_id, user_id, points, exact in driver_rows:
+            driver_points.setdefault(race_id, []).append((user_id, int(points)))
+            driver_exact.setdefault(race_id, []).append((user_id, int(exact)))
+        team_points = {}
+        for race_id, team_id, points in team_rows:
+            team_points.setdefault(race_id, []).append((team_id, int(points)))
+
+        signup = dict(db.query(User.id, User.created_at).filter(
+            User.id.in_({user_id for _, user_id, _, _ in driver_rows})
+        ).all()) if driver_rows else {}
+
+        # Todas as equipes da temporada aparecem desde a primeira corrida (como no cache)
+        teams = db.query(Team.id, Team.captain_id, Team.partner_id).filter(Team.season_id == season_id).all()
+        previous = self._previous_positions(db, race_ids[start - 1] if start > 0 else None)
+
+        running_points = {'DRIVER': {}, 'TEAM': {team.id: 0 for team in teams}}
+        running_exact = {}
+        rows = []
+        for race_pos, race_id in enumerate(race_ids):
+            for user_id, points in driver_points.get(race_id, []):
+                running_points['DRIVER'][user_id] = running_points['DRIVER'].get(user_id, 0) + points
+            for user_id, exact in driver_exact.get(race_id, []):
+                running_exact[user_id] = running_exact.get(user_id, 0) + exact
+            for team_id, points in team_points.get(race_id, []):
+                if team_id in running_points['TEAM']:
+                    running_points['TEAM'][team_id] += points
+
+            entries = {
+                'DRIVER': [
+                    (user_id, points, running_exact.get(user_id, 0), signup.get(user_id))
+                    for user_id, points in running_points['DRIVER'].items()
+                ],
+                'TEAM': [
+                    (team.id, running_points['TEAM'][team.id],
+                     running_exact.get(team.captain_id, 0) + running_exact.get(team.partner_id, 0), team.id)
+                    for team in teams
+                ]
+            }
+
+            positions = {}
+            for category, category_entries in entries.items():
+                for entity_id, points, position in ranking_query.assign_positions(category_entries):
+                    positions[(category, entity_id)] = position
+                    if race_pos >= start:
+                        rows.append({
+                            "season_id": season_id, "race_id": race_id, "category": category,
+                            "entity_id": entity_id, "points": points, "position": position,
+                            "previous_position": previous.get((category, entity_id))
+                        })
+            previous = positions
+
+        db.query(RankingHistory).filter(
+            RankingHistory.race_id.in_(race_ids[start:] or [0])
+        ).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(RankingHistory), rows)
+        db.commit()
+        return len(rows)
+
+    def get_trajectory(self, db: Session, season_id: int, category: str, entity_id: int) -> list:
+        """Posição e pontos acumulados após cada corrida (gráfico de posição ao longo da temporada)."""
+        rows = db.query(
+            RankingHistory.race_id, Race.name, RankingHistory.points, RankingHistory.position
+        ).join(Race, Race.id == RankingHistory.race_id).filter(
+            RankingHistory.season_id == season_id,
+            RankingHistory.category == category,
+            RankingHistory.entity_id == entity_id
+        ).order_by(Race.race_date, Race.id).all()
+        return [{"race_id": row.race_id, "race": row.name, "points": row.points, "position": row.position} for row in rows]
+
+    def get_climbers(self, db: Session, race_id: int, category: str, limit: int = 5) -> list:
+        """Quem mais ganhou posições na corrida (estreantes ficam de fora)."""
+        gained = (RankingHistory.previous_position - RankingHistory.position).label("gained")
+        rows = db.query(
+            RankingHistory.entity_id, RankingHistory.points, RankingHistory.position,
+            RankingHistory.previous_position, gained, RankingCache.display
+        ).outerjoin(RankingCache, (RankingCache.season_id == RankingHistory.season_id) &
+                    (RankingCache.category == RankingHistory.category) &
+                    (RankingCache.entity_id == RankingHistory.entity_id)
+        ).filter(
+            RankingHistory.race_id == race_id,
+            RankingHistory.category == category,
+            RankingHistory.previous_position != None
+        ).order_by(gained.desc(), RankingHistory.position).limit(limit).all()
+
+        return [{
+            "id": row.entity_id,
+            **(row.display or {}),
+            "points": row.points,
+            "position": row.position,
+            "previous_position": row.previous_position,
+            "gained": row.gained
+        } for row in rows]
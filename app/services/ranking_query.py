@@ -0,0 +1,76 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, or_
+from app.models.user import User
+from app.models.team import Team
+from app.models.user_stats import UserStats
+
+# Critérios de desempate (em ordem): pontos, acertos de posição exata, inscrição mais antiga.
+# Para equipes, "inscrição" é a ordem de criação da equipe e os acertos são a soma da dupla.
+
+def ranking_subquery(season_id: int, category: str, method: str = "rank"):
+    """
+    Classificação da temporada calculada no banco (funções de janela).
+    Colunas: entity_id, points, exact_hits, signup, position.
+    method="rank": empatados em TODOS os critérios dividem a posição e a seguinte é pulada (1, 1, 3);
+    method="dense": mesma coisa sem pular (1, 1, 2).
+    Pilotos saem do UserStats da temporada; equipes do Team.total_points.
+    """
+    if category == 'DRIVER':
+        base = select(
+            UserStats.user_id.label("entity_id"),
+            UserStats.points.label("points"),
+            UserStats.exact_hits.label("exact_hits"),
+            User.created_at.label("signup")
+        ).join(User, User.id == UserStats.user_id).where(
+            UserStats.season_id == season_id,
+            UserStats.races > 0
+        ).subquery()
+    else:
+        base = select(
+            Team.id.label("entity_id"),
+            func.coalesce(Team.total_points, 0).label("points"),
+            func.coalesce(func.sum(UserStats.exact_hits), 0).label("exact_hits"),
+            Team.id.label("signup")
+        ).outerjoin(UserStats, (UserStats.season_id == Team.season_id) & or_(
+            UserStats.user_id == Team.captain_id, UserStats.user_id == Team.partner_id
+        )).where(
+            Team.season_id == season_id
+        ).group_by(Team.id, Team.total_points).subquery()
+
+    rank_function = func.dense_rank if method == "dense" else func.rank
+    position = rank_function().over(
+        order_by=(base.c.points.desc(), base.c.exact_hits.desc(), base.c.signup.asc().nulls_last())
+    )
+    return select(
+        base.c.entity_id, base.c.points, base.c.exact_hits, base.c.signup, position.label("position")
+    ).subquery()
+
+def get_standings(db: Session, season_id: int, category: str, method: str = "rank", positions: list = None) -> list:
+    """
+    Linhas (entity_id, points, exact_hits, position) ordenadas pela classificação.
+    `positions` filtra só algumas posições (ex: premiação dos 3 primeiros).
+    """
+    ranking = ranking_subquery(season_id, category, method)
+    query = db.query(
+        ranking.c.entity_id, ranking.c.points, ranking.c.exact_hits, ranking.c.position
+    )
+    if positions is not None:
+        query = query.filter(ranking.c.position.in_(positions))
+    return query.order_by(ranking.c.position, ranking.c.entity_id).all()
+
+def assign_positions(entries: list) -> list:
+    """
+    Mesma classificação de ranking_subquery (method="rank") para dados já em memória
+    (ex: fotos históricas). entries: [(entity_id, points, exact_hits, signup)].
+    Retorna [(entity_id, points, position)] na ordem da classificação.
+    """
+    # Inscrição NULL vai por último, como o NULLS LAST do SQL
+    ordered = sorted(entries, key=lambda e: (-e[1], -e[2], e[3] is None, e[3] or 0, e[0]))
+    ranked = []
+    previous_key, position = None, 0
+    for i, (entity_id, points, exact_hits, signup) in enumerate(ordered):
+        key = (points, exact_hits, signup)
+        if key != previous_key:
+            position, previous_key = i + 1, key
+        ranked.append((entity_id, points, position))
+    return ranked
@@ -8,6 +8,8 @@ import asyncio
 from app.db.session import SessionLocal
 from app.models.race import Race, RaceStatus
 from app.models.user import User
+from app.models.season import Season
+from app.services import data_version
 
 logger = logging.getLogger(__name__)
 scheduler = BackgroundScheduler()
@@ -41,6 +43,7 @@ def check_race_status_job():
         for race in races_to_open:
             logger.info(f"🟢 Abrindo apostas para: {race.name}")
             race.status = RaceStatus.OPEN
+            data_version.bump_season(db, race.season_id)
             db.commit()
             
             try:
@@ -62,6 +65,7 @@ def check_race_status_job():
         for race in races_to_close:
             logger.info(f"🔴 Fechando apostas para: {race.name}")
             race.status = RaceStatus.CLOSED
+            data_version.bump_season(db, race.season_id)
             db.commit()
             
             try:
@@ -124,9 +128,103 @@ def check_race_status_job():
     finally:
         db.close()
 
+def upgrade_schema_job():
+    """
+    Adiciona colunas/índices que faltam num banco de versão anterior (execução única no boot).
+    Se a exibição do ranking acabou de ser criada (vazia), recalcula o cache das temporadas.
+    """
+    
+    # IMPORTAÇÃO TARDIA
+    from app.db.session import engine
+    from app.db.schema_upgrade import upgrade_schema
+    from app.models.ranking_cache import RankingCache
+    from app.services.leaderboard import LeaderboardService
+
+    added = upgrade_schema(engine)
+    if not added:
+        return
+    logger.info(f"--- 🧱 Colunas adicionadas no boot: {', '.join(added)} ---")
+
+    if "ranking_cache.display" in added:
+        db = SessionLocal()
+        try:
+            season_ids = [row.season_id for row in db.query(RankingCache.season_id).distinct().all()]
+            for season_id in season_ids:
+                LeaderboardService().refresh_leaderboard(db, season_id)
+        except Exception as e:
+            logger.error(f"❌ Erro ao preencher a exibição do ranking: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+def backfill_user_stats_job():
+    """
+    Reconstrói o UserStats (e o ranking) se a tabela estiver vazia num banco com corridas pontuadas.
+    O ranking de pilotos sai do UserStats, então roda no boot antes do Scheduler (execução única).
+    """
+    
+    # IMPORTAÇÃO TARDIA
+    from app.services.user_stats import UserStatsService
+    from app.services.leaderboard import LeaderboardService
+    
+    db = SessionLocal()
+    try:
+        service = UserStatsService()
+        if not service.needs_backfill(db):
+            return
+        users = service.rebuild(db)
+        db.commit()
+
+        season_ids = [row.season_id for row in db.query(Race.season_id).filter(
+            Race.status == RaceStatus.FINISHED
+        ).distinct().all()]
+        for season_id in season_ids:
+            LeaderboardService().refresh_leaderboard(db, season_id)
+        logger.info(f"--- 📊 UserStats reconstruído no boot ({users} usuários, {len(season_ids)} temporadas) ---")
+    except Exception as e:
+        # Outro worker pode ter feito o mesmo ao mesmo tempo (unique de user_stats)
+        logger.error(f"❌ Erro ao reconstruir UserStats: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def resume_scoring_jobs_job():
+    """Retoma processamentos de pontos e tarefas em background interrompidos (execução única no boot)"""
+    
+    # IMPORTAÇÃO TARDIA
+    from app.services.scoring_jobs import resume_scoring_jobs
+    from app.services.background_jobs import resume_background_jobs
+    
+    try:
+        resume_scoring_jobs()
+    except Exception as e:
+        logger.error(f"❌ Erro ao retomar jobs de pontuação: {e}")
+
+    try:
+        resume_background_jobs()
+    except Exception as e:
+        logger.error(f"❌ Erro ao retomar tarefas em background: {e}")
+
+def publish_snapshots_job():
+    """Gera os snapshots JSON das rotas públicas de todas as temporadas (execução única no boot)"""
+    
+    # IMPORTAÇÃO TARDIA
+    from app.services.snapshots import publish_snapshots
+    
+    db = SessionLocal()
+    try:
+        season_ids = [row.id for row in db.query(Season.id).all()]
+    finally:
+        db.close()
+
+    publish_snapshots(ranking_seasons=season_ids, grid_seasons=season_ids, seasons_list=True)
+    logger.info(f"--- 📦 Snapshots publicados ({len(season_ids)} temporadas) ---")
+
 def start_scheduler():
     if not scheduler.running:
         scheduler.add_job(check_race_status_job, 'interval', minutes=1)
+        scheduler.add_job(resume_scoring_jobs_job) # Sem trigger: roda uma vez, logo após o start
+        scheduler.add_job(publish_snapshots_job)
         scheduler.start()
         logger.info("--- 🕒 Scheduler Iniciado (1 min) ---")
 
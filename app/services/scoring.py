@@ -1,3 +1,5 @@
+import numpy as np
+from sqlalchemy import update, select, func, or_
 from sqlalchemy.orm import Session
 from app.models.bet import Bet
 from app.models.race import Race, RaceResult, RaceStatus
@@ -7,87 +9,373 @@ from app.models.rivalry import Rivalry, RivalryStatus
 from app.services.badge import BadgeService 
 from app.services.leaderboard import LeaderboardService 
 from app.services.push import PushService # <--- Importar PushService
-from app.db.session import SessionLocal
+from app.services.user_stats import UserStatsService
+from app.services import data_version
 
-def calculate_race_points(db: Session, race_id: int):
+# Ordem das colunas da matriz de palpites: 3 extras + Top 10
+PICK_FIELDS = (
+    "pole_driver_id", "dotd_driver_id", "winning_team_id",
+    "p1_driver_id", "p2_driver_id", "p3_driver_id", "p4_driver_id", "p5_driver_id",
+    "p6_driver_id", "p7_driver_id", "p8_driver_id", "p9_driver_id", "p10_driver_id",
+)
+TOP10_SLICE = slice(3, len(PICK_FIELDS))
+
+class BetMatrix:
     """
-    Calcula a pontuação, distribui medalhas, resolve rivais, atualiza cache e notifica.
+    Todas as apostas de uma corrida em formato colunar.
+    `picks` é uma matriz inteira (n_apostas x 13) na ordem de PICK_FIELDS; NULL vira 0.
+    """
+    def __init__(self, rows):
+        self.ids = np.array([r.id for r in rows], dtype=np.int64)
+        self.user_ids = np.array([r.user_id for r in rows], dtype=np.int64)
+        self.team_ids = np.array([r.team_id or 0 for r in rows], dtype=np.int64)
+        self.old_points = np.array([r.points or 0 for r in rows], dtype=np.int64)
+        self.picks = np.array(
+            [[getattr(r, f) or 0 for f in PICK_FIELDS] for r in rows], dtype=np.int64
+        ).reshape(len(rows), len(PICK_FIELDS))
+
+    def __len__(self):
+        return len(self.ids)
+
+def load_bet_matrix(db: Session, race_id: int) -> BetMatrix:
+    """Carrega as apostas da corrida com uma única query (sem instanciar objetos ORM)."""
+    rows = db.query(
+        Bet.id, Bet.user_id, Bet.team_id, Bet.points,
+        *[getattr(Bet, f) for f in PICK_FIELDS]
+    ).filter(Bet.race_id == race_id).order_by(Bet.id).all()
+    return BetMatrix(rows)
+
+def result_vector(result) -> np.ndarray:
+    """Converte o gabarito (RaceResult ou schema equivalente) no vetor de 13 posições."""
+    return np.array([getattr(result, f) or 0 for f in PICK_FIELDS], dtype=np.int64)
+
+def compare_picks(picks: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """
+    Matriz booleana de acertos (n_apostas x 13).
+    Palpite vazio (0) nunca pontua, em nenhuma coluna: NULL == NULL não é acerto,
+    igual ao CASE do UserStatsService.rebuild.
+    """
+    return (picks == vector) & (picks != 0)
+
+def score_matrix(picks: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """Pontuação de todas as apostas em uma única passada (1 ponto por acerto)."""
+    return compare_picks(picks, vector).sum(axis=1).astype(np.int64)
+
+def result_snapshot(result) -> dict:
+    """Cópia serializável (JSON) do gabarito, usada como base para re-cálculos incrementais."""
+    return {f: getattr(result, f) for f in PICK_FIELDS}
+
+def snapshot_vector(snapshot: dict) -> np.ndarray:
+    """Vetor de 13 posições a partir de um result_snapshot."""
+    return np.array([snapshot.get(f) or 0 for f in PICK_FIELDS], dtype=np.int64)
+
+def stats_deltas(picks: np.ndarray, old_vector, new_vector: np.ndarray,
+                 old_points: np.ndarray, new_points: np.ndarray, race_delta: int) -> dict:
+    """
+    Saldos de UserStats por aposta: acertos contra o gabarito novo menos acertos contra o antigo
+    (old_vector None = corrida ainda não contabilizada).
+    """
+    new_hits = compare_picks(picks, new_vector).astype(np.int64)
+    if old_vector is None:
+        hit_diff = new_hits
+    else:
+        hit_diff = new_hits - compare_picks(picks, old_vector).astype(np.int64)
+
+    return {
+        "points": new_points - old_points,
+        "races": np.full(len(picks), race_delta, dtype=np.int64),
+        "pole_hits": hit_diff[:, 0],
+        "dotd_hits": hit_diff[:, 1],
+        "winner_hits": hit_diff[:, 2],
+        "exact_hits": hit_diff[:, TOP10_SLICE].sum(axis=1)
+    }
+
+def score_bet(bet, result) -> int:
+    """
+    Implementação de referência, aposta a aposta.
+    Mantida para testes de paridade com o motor vetorizado (score_matrix).
+    """
+    points = 0
+
+    # Extras (palpite vazio não pontua)
+    if bet.pole_driver_id and bet.pole_driver_id == result.pole_driver_id: points += 1
+    if bet.dotd_driver_id and bet.dotd_driver_id == result.dotd_driver_id: points += 1
+    if bet.winning_team_id and bet.winning_team_id == result.winning_team_id: points += 1
+
+    # Top 10 (Posição Exata)
+    comparisons = [
+        (bet.p1_driver_id, result.p1_driver_id),
+        (bet.p2_driver_id, result.p2_driver_id),
+        (bet.p3_driver_id, result.p3_driver_id),
+        (bet.p4_driver_id, result.p4_driver_id),
+        (bet.p5_driver_id, result.p5_driver_id),
+        (bet.p6_driver_id, result.p6_driver_id),
+        (bet.p7_driver_id, result.p7_driver_id),
+        (bet.p8_driver_id, result.p8_driver_id),
+        (bet.p9_driver_id, result.p9_driver_id),
+        (bet.p10_driver_id, result.p10_driver_id),
+    ]
+
+    for b_id, r_id in comparisons:
+        if b_id and b_id == r_id: points += 1
+
+    return points
+
+def write_bet_points(db: Session, bet_ids: np.ndarray, points: np.ndarray, old_points: np.ndarray = None):
+    """
+    Grava os pontos com um único UPDATE em lote (executemany por chave primária).
+    Se `old_points` for informado, só as apostas que mudaram são escritas.
+    """
+    if old_points is not None:
+        changed = points != old_points
+        bet_ids, points = bet_ids[changed], points[changed]
+
+    if len(bet_ids) == 0:
+        return 0
+
+    db.execute(
+        update(Bet),
+        [{"id": int(b_id), "points": int(p)} for b_id, p in zip(bet_ids, points)]
+    )
+    return len(bet_ids)
+
+def aggregate_team_deltas(team_ids: np.ndarray, old_points: np.ndarray, new_points: np.ndarray) -> dict:
+    """
+    Soma por equipe (snapshot Bet.team_id) a diferença entre pontos novos e antigos.
+    Apostas sem equipe (team_id 0) e equipes com saldo zero são ignoradas.
+    """
+    with_team = team_ids != 0
+    if not with_team.any():
+        return {}
+
+    unique_teams, inverse = np.unique(team_ids[with_team], return_inverse=True)
+    totals = np.zeros(len(unique_teams), dtype=np.int64)
+    np.add.at(totals, inverse, (new_points - old_points)[with_team])
+
+    return {int(t): int(d) for t, d in zip(unique_teams, totals) if d != 0}
+
+def apply_team_deltas(db: Session, deltas: dict):
+    """
+    Aplica os saldos com incremento atômico no banco (total_points = total_points + delta),
+    sem leitura prévia. Não conflita com débitos concorrentes (leave/kick).
+    """
+    for team_id, delta in deltas.items():
+        db.execute(
+            update(Team)
+            .where(Team.id == team_id)
+            .values(total_points=Team.total_points + delta)
+            .execution_options(synchronize_session=False)
+        )
+    return len(deltas)
+
+def score_race(db: Session, race: Race, update_teams: bool = True, update_stats: bool = True,
+               previous_result: dict = None) -> dict:
+    """
+    Fases 1 a 3 (rollback, cálculo e rivais) SEM commit.
+    O chamador controla a transação, então as três fases são gravadas juntas ou nenhuma é.
+    Com update_teams/update_stats=False as equipes e o UserStats não são tocados
+    (a re-pontuação em lote reconstrói os dois no final).
+    `previous_result` é o gabarito pontuado anteriormente (se houver), base do saldo de UserStats.
+    Não incrementa as versões de ETag: o chamador faz isso (a re-pontuação em lote, uma vez no
+    final, em vez de travar as linhas de usuários e da temporada em todos os processos).
     """
-    race = db.query(Race).filter(Race.id == race_id).first()
-    if not race or not race.result:
-        return {"error": "Resultado oficial não encontrado."}
-    
     result = race.result
-    bets = db.query(Bet).filter(Bet.race_id == race_id).all()
-    
-    updates_count = 0
-    rollback_count = 0
-    badges_granted = 0 
-    
-    badge_service = BadgeService() 
-
-    # --- FASE 1: ROLLBACK (Zerar pontos anteriores para recalcular) ---
-    for bet in bets:
-        if bet.points > 0:
-            if bet.team_id:
-                historical_team = db.query(Team).filter(Team.id == bet.team_id).first()
-                if historical_team:
-                    historical_team.total_points -= bet.points
-                    rollback_count += 1
-            bet.points = 0
-    db.commit()
+    already_scored = previous_result is not None or race.status == RaceStatus.FINISHED
+    matrix = load_bet_matrix(db, race.id)
 
-    # --- FASE 2: CÁLCULO ---
-    for bet in bets:
-        points = 0
-        
-        # Extras
-        if bet.pole_driver_id == result.pole_driver_id: points += 1
-        if bet.dotd_driver_id == result.dotd_driver_id: points += 1
-        if bet.winning_team_id == result.winning_team_id: points += 1
-        
-        # Top 10 (Posição Exata)
-        comparisons = [
-            (bet.p1_driver_id, result.p1_driver_id),
-            (bet.p2_driver_id, result.p2_driver_id),
-            (bet.p3_driver_id, result.p3_driver_id),
-            (bet.p4_driver_id, result.p4_driver_id),
-            (bet.p5_driver_id, result.p5_driver_id),
-            (bet.p6_driver_id, result.p6_driver_id),
-            (bet.p7_driver_id, result.p7_driver_id),
-            (bet.p8_driver_id, result.p8_driver_id),
-            (bet.p9_driver_id, result.p9_driver_id),
-            (bet.p10_driver_id, result.p10_driver_id),
-        ]
-        
-        for b_id, r_id in comparisons:
-            if b_id and b_id == r_id: points += 1
-        
-        # Atualiza Aposta e Equipe
-        bet.points = points 
-        if bet.team_id:
-            ht = db.query(Team).filter(Team.id == bet.team_id).first()
-            if ht: ht.total_points += points
-            
-        updates_count += 1
-        db.commit() 
-        
-        # Verifica Medalhas
-        new_badges = badge_service.check_achievements_after_race(db, bet.user_id, race_id)
-        if new_badges:
-            badges_granted += len(new_badges)
+    # --- FASE 1 e 2: ROLLBACK + CÁLCULO (Vetorizado) ---
+    # O rollback não é mais gravado separadamente: cada equipe recebe apenas o saldo (novo - antigo).
+    rollback_count = int(((matrix.old_points > 0) & (matrix.team_ids != 0)).sum())
+    new_vector = result_vector(result)
+    new_points = score_matrix(matrix.picks, new_vector)
+    changed_bets = write_bet_points(db, matrix.ids, new_points, matrix.old_points)
+
+    team_deltas = {}
+    if update_teams:
+        team_deltas = aggregate_team_deltas(matrix.team_ids, matrix.old_points, new_points)
+        apply_team_deltas(db, team_deltas)
+
+    if update_stats:
+        stats_service = UserStatsService()
+        if already_scored and previous_result is None:
+            # Pontuada antes dos jobs (sem snapshot): não há como saber os acertos antigos
+            stats_service.rebuild(db, user_ids=[int(u) for u in np.unique(matrix.user_ids)])
+        else:
+            old_vector = snapshot_vector(previous_result) if previous_result else None
+            stats_service.apply_deltas(db, race.season_id, matrix.user_ids, stats_deltas(
+                matrix.picks, old_vector, new_vector, matrix.old_points, new_points,
+                race_delta=0 if already_scored else 1
+            ))
 
     # --- FASE 3: RIVAIS ---
-    process_rivalries(db, race_id)
+    process_rivalries(db, race.id)
 
     race.status = RaceStatus.FINISHED
-    db.commit()
-    
-    # --- FASE 4: ATUALIZAR CACHE DE RANKING ---
+
+    return {
+        "mode": "FULL",
+        "processed": len(matrix),
+        "changed_bets": changed_bets,
+        "rollbacks": rollback_count,
+        "teams_updated": len(team_deltas)
+    }
+
+def rebuild_team_points(db: Session, season_id: int):
+    """
+    Recalcula Team.total_points da temporada a partir das apostas (SEM commit).
+    Conta só as apostas feitas pela equipe (snapshot team_id) de quem ainda é membro,
+    o mesmo critério do débito aplicado em leave/kick.
+    """
+    contributed = select(func.coalesce(func.sum(Bet.points), 0)).where(
+        Bet.team_id == Team.id,
+        or_(Bet.user_id == Team.captain_id, Bet.user_id == Team.partner_id)
+    ).scalar_subquery()
+
+    db.execute(
+        update(Team)
+        .where(Team.season_id == season_id)
+        .values(total_points=contributed)
+        .execution_options(synchronize_session=False)
+    )
+
+def rescore_race_incremental(db: Session, race: Race, previous_result: dict) -> dict:
+    """
+    Correção de gabarito de uma corrida JÁ pontuada, SEM commit.
+    Compara o gabarito anterior (snapshot) com o atual e só carrega as apostas que
+    podem mudar: as que apostaram no valor antigo ou no novo de algum campo alterado.
+    Aplica os saldos em apostas, equipes, rivais e no cache de ranking.
+    """
+    old_vector = snapshot_vector(previous_result)
+    new_vector = result_vector(race.result)
+    changed_columns = np.nonzero(old_vector != new_vector)[0]
+
+    summary = {
+        "mode": "INCREMENTAL",
+        "changed_fields": [PICK_FIELDS[i] for i in changed_columns],
+        "processed": 0,
+        "changed_bets": 0,
+        "rollbacks": 0,
+        "teams_updated": 0,
+        "affected_user_ids": []
+    }
+    if len(changed_columns) == 0:
+        return summary
+
+    # Toda aposta com o valor antigo ou o novo numa coluna alterada (vazio = NULL) é recalculada
+    conditions = []
+    for i in changed_columns:
+        column = getattr(Bet, PICK_FIELDS[i])
+        values = {int(old_vector[i]), int(new_vector[i])}
+        conditions.append(column.in_(values))
+        if 0 in values:
+            conditions.append(column.is_(None))
+
+    rows = db.query(
+        Bet.id, Bet.user_id, Bet.team_id, Bet.points,
+        *[getattr(Bet, f) for f in PICK_FIELDS]
+    ).filter(Bet.race_id == race.id, or_(*conditions)).order_by(Bet.id).all()
+    matrix = BetMatrix(rows)
+
+    # Recalcula a aposta inteira contra o novo gabarito: o saldo é (novo - gravado)
+    new_points = score_matrix(matrix.picks, new_vector)
+    changed_bets = write_bet_points(db, matrix.ids, new_points, matrix.old_points)
+
+    team_deltas = aggregate_team_deltas(matrix.team_ids, matrix.old_points, new_points)
+    apply_team_deltas(db, team_deltas)
+
+    UserStatsService().apply_deltas(db, race.season_id, matrix.user_ids, stats_deltas(
+        matrix.picks, old_vector, new_vector, matrix.old_points, new_points, race_delta=0
+    ))
+
+    changed = new_points != matrix.old_points
+    driver_deltas = {
+        int(u): int(d) for u, d in zip(matrix.user_ids[changed], (new_points - matrix.old_points)[changed])
+    }
+    affected_user_ids = list(driver_deltas)
+
+    if affected_user_ids:
+        process_rivalries(db, race.id, user_ids=affected_user_ids)
+        LeaderboardService().apply_point_deltas(db, race.season_id, driver_deltas, team_deltas)
+        data_version.bump_users(db, affected_user_ids, with_teammates=True)
+
+    summary.update({
+        "processed": len(matrix),
+        "changed_bets": changed_bets,
+        "rollbacks": int(((matrix.old_points > 0) & changed & (matrix.team_ids != 0)).sum()),
+        "teams_updated": len(team_deltas),
+        "affected_user_ids": affected_user_ids
+    })
+    return summary
+
+def preview_race_result(db: Session, race: Race, candidate, top_movers: int = 10) -> dict:
+    """
+    Simula um gabarito candidato SEM gravar nada: pontos projetados das apostas,
+    maiores movimentações e classificação projetada de pilotos e equipes.
+    O saldo é (pontos projetados - pontos gravados), então funciona antes e depois da corrida ser pontuada.
+    Os acertos exatos (desempate) entram pelo mesmo saldo: candidato menos o último gabarito pontuado.
+    """
+    # IMPORTAÇÃO TARDIA (scoring_jobs importa este módulo)
+    from app.services.scoring_jobs import get_scored_snapshot
+
+    matrix = load_bet_matrix(db, race.id)
+    new_vector = result_vector(candidate)
+    new_points = score_matrix(matrix.picks, new_vector)
+    diff = new_points - matrix.old_points
+
+    # Gabarito já contabilizado no UserStats (nenhum se a corrida ainda não foi pontuada)
+    old_vector = None
+    if race.status == RaceStatus.FINISHED:
+        snapshot = get_scored_snapshot(db, race.id)
+        old_vector = snapshot_vector(snapshot) if snapshot else result_vector(race.result)
+    hit_diff = stats_deltas(matrix.picks, old_vector, new_vector, matrix.old_points, new_points, race_delta=0)["exact_hits"]
+
+    driver_deltas = {int(u): int(d) for u, d in zip(matrix.user_ids, diff) if d != 0}
+    driver_hit_deltas = {int(u): int(h) for u, h in zip(matrix.user_ids, hit_diff) if h != 0}
+    team_deltas = aggregate_team_deltas(matrix.team_ids, matrix.old_points, new_points)
+    # Acertos da equipe = soma dos acertos da dupla (como no ranking_query)
+    team_hit_deltas = {}
+    for team in db.query(Team.id, Team.captain_id, Team.partner_id).filter(Team.season_id == race.season_id):
+        hits = driver_hit_deltas.get(team.captain_id, 0) + driver_hit_deltas.get(team.partner_id, 0)
+        if hits:
+            team_hit_deltas[team.id] = hits
+
     leaderboard_service = LeaderboardService()
-    leaderboard_service.refresh_leaderboard(db, race.season_id)
-    
-    # --- FASE 5: NOTIFICAR RESULTADO (PUSH) ---
+    drivers = leaderboard_service.project_standings(db, race.season_id, 'DRIVER', driver_deltas, driver_hit_deltas)
+    teams = leaderboard_service.project_standings(db, race.season_id, 'TEAM', team_deltas, team_hit_deltas)
+
+    # Maiores ganhos de posição (quem ainda não estava no ranking entra pela última posição)
+    def gained(entry):
+        previous = entry["previous_position"] or len(drivers) + 1
+        return previous - entry["position"]
+
+    movers = sorted((d for d in drivers if gained(d) != 0), key=gained, reverse=True)[:top_movers]
+    names = {}
+    if movers:
+        names = dict(db.query(User.id, User.full_name).filter(
+            User.id.in_([m["entity_id"] for m in movers])
+        ).all())
+
+    return {
+        "race_id": race.id,
+        "bets": len(matrix),
+        "changed_bets": int((diff != 0).sum()),
+        "bet_points": [
+            {"bet_id": int(b), "user_id": int(u), "points": int(p), "previous_points": int(o)}
+            for b, u, p, o in zip(matrix.ids, matrix.user_ids, new_points, matrix.old_points)
+        ],
+        "top_movers": [
+            {**m, "name": names.get(m["entity_id"]), "positions_gained": gained(m)} for m in movers
+        ],
+        "drivers": drivers,
+        "teams": teams
+    }
+
+def award_race_badges(db: Session, race_id: int, user_ids: list = None) -> int:
+    """Verifica medalhas dos participantes da corrida (ou apenas de `user_ids`), em lote."""
+    return BadgeService().check_achievements_for_race(db, race_id, user_ids=user_ids)
+
+def notify_race_result(db: Session, race: Race):
+    """Push de broadcast avisando que o resultado saiu."""
     try:
         push_service = PushService()
         push_service.broadcast_notification(
@@ -98,33 +386,70 @@ def calculate_race_points(db: Session, race_id: int):
         )
     except Exception as e:
         print(f"❌ Erro ao enviar push de resultado: {e}")
+
+def calculate_race_points(db: Session, race_id: int):
+    """
+    Calcula a pontuação, distribui medalhas, resolve rivais, atualiza cache e notifica.
+    Execução síncrona; o fluxo do admin usa o job durável (app.services.scoring_jobs).
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race or not race.result:
+        return {"error": "Resultado oficial não encontrado."}
+    
+    # --- FASES 1 a 3 (atômicas) ---
+    summary = score_race(db, race)
+    # ETags: pontos de todos os apostadores (e parceiros) e o status da corrida mudaram
+    data_version.bump_race_bettors(db, race.id)
+    data_version.bump_season(db, race.season_id)
+    db.commit()
+
+    # Verifica Medalhas
+    badges_granted = award_race_badges(db, race_id)
+    
+    # --- FASE 4: ATUALIZAR CACHE DE RANKING ---
+    leaderboard_service = LeaderboardService()
+    leaderboard_service.refresh_leaderboard(db, race.season_id)
+    
+    # --- FASE 5: NOTIFICAR RESULTADO (PUSH) ---
+    notify_race_result(db, race)
     
     print(f"--- ✅ Processamento Concluído (Race {race_id}) ---")
     
     return {
         "message": "Cálculo realizado com sucesso.",
-        "processed": updates_count,
-        "rollbacks": rollback_count,
+        "processed": summary["processed"],
+        "rollbacks": summary["rollbacks"],
         "new_badges": badges_granted
     }
 
-def process_rivalries(db: Session, race_id: int):
+def process_rivalries(db: Session, race_id: int, user_ids: list = None):
     """
-    Resolve os duelos aceitos para esta corrida.
+    Resolve os duelos desta corrida (sem commit, faz parte da transação de pontuação).
+    Duelos já finalizados também são revistos, para refletir correções do gabarito.
+    Com `user_ids`, só os duelos que envolvem esses usuários são recalculados.
     """
     print(f"--- ⚔️ Processando Rivais (Race {race_id}) ---")
     
-    rivalries = db.query(Rivalry).filter(
+    query = db.query(Rivalry).filter(
         Rivalry.race_id == race_id,
-        Rivalry.status == RivalryStatus.ACCEPTED
-    ).all()
+        Rivalry.status.in_([RivalryStatus.ACCEPTED, RivalryStatus.FINISHED])
+    )
+    if user_ids is not None:
+        query = query.filter(or_(Rivalry.challenger_id.in_(user_ids), Rivalry.opponent_id.in_(user_ids)))
+    rivalries = query.all()
+    if not rivalries:
+        return
+
+    # Pontos de todos os envolvidos em uma única query
+    involved = {r.challenger_id for r in rivalries} | {r.opponent_id for r in rivalries}
+    points_by_user = dict(db.query(Bet.user_id, Bet.points).filter(
+        Bet.race_id == race_id,
+        Bet.user_id.in_(involved)
+    ).all())
     
     for r in rivalries:
-        bet_challenger = db.query(Bet).filter(Bet.user_id == r.challenger_id, Bet.race_id == race_id).first()
-        points_c = bet_challenger.points if bet_challenger else 0
-        
-        bet_opponent = db.query(Bet).filter(Bet.user_id == r.opponent_id, Bet.race_id == race_id).first()
-        points_o = bet_opponent.points if bet_opponent else 0
+        points_c = points_by_user.get(r.challenger_id) or 0
+        points_o = points_by_user.get(r.opponent_id) or 0
         
         if points_c > points_o:
             r.winner_id = r.challenger_id
@@ -137,15 +462,3 @@ def process_rivalries(db: Session, race_id: int):
             r.margin = 0
             
         r.status = RivalryStatus.FINISHED
-    
-    db.commit()
-
-def calculate_race_points_async_wrapper(race_id: int):
-    print(f"--- ⏳ Iniciando Processamento em Background (Race {race_id}) ---")
-    db = SessionLocal()
-    try:
-        calculate_race_points(db, race_id)
-    except Exception as e:
-        print(f"--- ❌ Erro no processamento (Race {race_id}): {e}")
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,283 @@
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update, or_, and_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.race import Race, RaceStatus
+from app.models.scoring_job import ScoringJob, ScoringJobStatus, ScoringPhase
+from app.services import data_version
+from app.services.leaderboard import LeaderboardService
+from app.services.ranking_history import RankingHistoryService
+from app.services.scoring import (
+    score_race, rescore_race_incremental, result_snapshot, award_race_badges, notify_race_result
+)
+
+# Após N tentativas (ex: worker reiniciando no meio) o job é marcado como FAILED
+MAX_ATTEMPTS = 3
+
+# Um lock por corrida: dois jobs da mesma corrida nunca rodam ao mesmo tempo neste processo.
+# Entre processos, a fase SCORING ainda trava a linha da corrida (SELECT ... FOR UPDATE).
+_race_locks = {}
+_race_locks_guard = threading.Lock()
+
+# Último envio de resultado por corrida (relógio monotônico), usado na janela de debounce
+_last_request = {}
+
+def _race_lock(race_id: int) -> threading.Lock:
+    with _race_locks_guard:
+        return _race_locks.setdefault(race_id, threading.Lock())
+
+def enqueue_scoring_job(db: Session, race_id: int):
+    """
+    Registra o job na fila. A execução é feita por run_scoring_job (BackgroundTasks / Scheduler).
+    Se já existir um job da corrida aguardando na fila, o envio é agrupado nele (ele vai ler
+    o gabarito mais recente ao rodar). Retorna (job, created).
+    """
+    _last_request[race_id] = time.monotonic()
+
+    queued = db.query(ScoringJob).filter(
+        ScoringJob.race_id == race_id,
+        ScoringJob.status == ScoringJobStatus.QUEUED
+    ).order_by(ScoringJob.id.desc()).with_for_update().first()
+
+    if queued:
+        queued.coalesced_requests = (queued.coalesced_requests or 0) + 1
+        db.commit()
+        return queued, False
+
+    job = ScoringJob(race_id=race_id, status=ScoringJobStatus.QUEUED, phase_timings={}, attempts=0, coalesced_requests=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job, True
+
+def _wait_debounce(race_id: int):
+    """Espera a janela de debounce passar sem novos envios para esta corrida."""
+    while True:
+        last = _last_request.get(race_id)
+        if last is None:
+            return
+        remaining = settings.SCORING_DEBOUNCE_SECONDS - (time.monotonic() - last)
+        if remaining <= 0:
+            return
+        time.sleep(remaining)
+
+def get_latest_scoring_job(db: Session, race_id: int):
+    return db.query(ScoringJob).filter(
+        ScoringJob.race_id == race_id
+    ).order_by(ScoringJob.id.desc()).first()
+
+def get_scored_snapshot(db: Session, race_id: int, before_job_id: int = None):
+    """
+    Gabarito pontuado pelo último job anterior da corrida (None se nunca foi pontuada por job).
+    Um job que falhou depois da fase SCORING também conta: os pontos dele já foram gravados.
+    Sem before_job_id: o último de todos (o que está valendo agora).
+    """
+    query = db.query(ScoringJob).filter(
+        ScoringJob.race_id == race_id,
+        ScoringJob.status.in_([ScoringJobStatus.DONE, ScoringJobStatus.FAILED]),
+        ScoringJob.result_snapshot != None
+    )
+    if before_job_id is not None:
+        query = query.filter(ScoringJob.id < before_job_id)
+    last_scored = query.order_by(ScoringJob.id.desc()).first()
+    return last_scored.result_snapshot if last_scored else None
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _lease():
+    return _now() + timedelta(seconds=settings.SCORING_JOB_LEASE_SECONDS)
+
+def _claimable():
+    """Na fila, ou RUNNING com o lease vencido (o worker dono morreu). Sem lease = job antigo, também retomável."""
+    return or_(
+        ScoringJob.status == ScoringJobStatus.QUEUED,
+        and_(
+            ScoringJob.status == ScoringJobStatus.RUNNING,
+            or_(ScoringJob.locked_until.is_(None), ScoringJob.locked_until < _now())
+        )
+    )
+
+def _claim_job(tracker: Session, job_id: int):
+    """
+    Marca o job como RUNNING e pega o lease. A atualização é condicional ao número de tentativas
+    lido e ao lease: se dois workers tentarem retomar o mesmo job apenas um vence, e um job
+    RUNNING cujo dono ainda renova o lease nunca é tomado.
+    """
+    job = tracker.query(ScoringJob).filter(ScoringJob.id == job_id).first()
+    if not job or job.status in (ScoringJobStatus.DONE, ScoringJobStatus.FAILED):
+        return None
+
+    seen_attempts = job.attempts or 0
+    if seen_attempts >= MAX_ATTEMPTS:
+        job.status = ScoringJobStatus.FAILED
+        job.error = job.error or "Número máximo de tentativas atingido."
+        job.finished_at = _now()
+        tracker.commit()
+        return None
+
+    claimed = tracker.execute(
+        update(ScoringJob)
+        .where(ScoringJob.id == job_id, ScoringJob.attempts == seen_attempts, _claimable())
+        .values(
+            status=ScoringJobStatus.RUNNING,
+            attempts=seen_attempts + 1,
+            started_at=job.started_at or _now(),
+            locked_until=_lease()
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    tracker.commit()
+
+    if not claimed:
+        return None
+    tracker.refresh(job)
+    return job
+
+@contextmanager
+def _phase(tracker: Session, job: ScoringJob, phase: ScoringPhase):
+    """Publica a fase atual (sessão própria, visível para o admin), renova o lease e registra a duração."""
+    job.phase = phase.value
+    job.locked_until = _lease()
+    tracker.commit()
+
+    start = time.perf_counter()
+    yield
+    elapsed = round(time.perf_counter() - start, 3)
+
+    timings = dict(job.phase_timings or {})
+    timings[phase.value] = elapsed
+    job.phase_timings = timings
+    job.locked_until = _lease()
+    tracker.commit()
+
+def run_scoring_job(job_id: int):
+    """
+    Executa o processamento de uma corrida.
+    - Aguarda a janela de debounce: envios seguidos do resultado viram um único processamento.
+    - Jobs da mesma corrida são serializados (lock por corrida).
+    - As fases 1-3 (SCORING) rodam em UMA transação: ou tudo é gravado, ou nada.
+    - O progresso é gravado numa sessão separada, sem interferir na transação de pontuação.
+    - Fases já concluídas (phase_timings) são puladas ao retomar um job interrompido.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(ScoringJob.race_id).filter(ScoringJob.id == job_id).first()
+    finally:
+        db.close()
+    if not row:
+        return
+
+    _wait_debounce(row.race_id)
+    with _race_lock(row.race_id):
+        _execute_scoring_job(job_id)
+
+def _execute_scoring_job(job_id: int):
+    tracker = SessionLocal()
+    db = SessionLocal()
+    job = None
+    try:
+        job = _claim_job(tracker, job_id)
+        if not job:
+            return
+
+        print(f"--- ⏳ Iniciando Job de Pontuação #{job.id} (Race {job.race_id}, tentativa {job.attempts}) ---")
+
+        # Trava a corrida até o commit da fase SCORING (serializa workers diferentes)
+        race = db.query(Race).filter(Race.id == job.race_id).with_for_update().first()
+        if not race or not race.result:
+            raise ValueError("Resultado oficial não encontrado.")
+
+        done = set(job.phase_timings or {})
+        # Snapshot gravado = pontos deste job já commitados (o dono anterior caiu antes de fechar a fase).
+        # Lido depois do lock da corrida, então vê o commit de um dono que ainda estava rodando.
+        if db.query(ScoringJob.result_snapshot).filter(ScoringJob.id == job.id).scalar() is not None:
+            done.add(ScoringPhase.SCORING.value)
+        summary = dict(job.summary or {})
+        affected_user_ids = None # None = todos os participantes
+
+        if ScoringPhase.SCORING.value not in done:
+            with _phase(tracker, job, ScoringPhase.SCORING):
+                # Corrida já pontuada: só o diff entre o gabarito anterior e o atual é aplicado
+                previous = get_scored_snapshot(db, race.id, before_job_id=job.id)
+                if previous and race.status == RaceStatus.FINISHED:
+                    stage = rescore_race_incremental(db, race, previous)
+                    affected_user_ids = stage.pop("affected_user_ids")
+                else:
+                    stage = score_race(db, race, previous_result=previous)
+                    # ETags: pontos de todos os apostadores (e parceiros) e o status da corrida mudaram
+                    data_version.bump_race_bettors(db, race.id)
+                    data_version.bump_season(db, race.season_id)
+                summary.update(stage)
+
+                # Gabarito e resumo entram na MESMA transação dos pontos: se o processo cair
+                # depois deste commit, a retomada vê o snapshot e não aplica os saldos de novo.
+                db.query(ScoringJob).filter(ScoringJob.id == job.id).update(
+                    {ScoringJob.result_snapshot: result_snapshot(race.result), ScoringJob.summary: summary},
+                    synchronize_session=False
+                )
+                db.commit()
+
+        if ScoringPhase.BADGES.value not in done:
+            with _phase(tracker, job, ScoringPhase.BADGES):
+                summary["new_badges"] = award_race_badges(db, race.id, user_ids=affected_user_ids)
+
+        if ScoringPhase.RANKING.value not in done:
+            with _phase(tracker, job, ScoringPhase.RANKING):
+                # No modo incremental o cache já foi ajustado na mesma transação dos pontos
+                if summary.get("mode") != "INCREMENTAL":
+                    LeaderboardService().refresh_leaderboard(db, race.season_id)
+                else:
+                    LeaderboardService().publish_snapshots(db, race.season_id)
+                # Foto do campeonato após a corrida (trajetória de posições)
+                summary["history_rows"] = RankingHistoryService().snapshot_race(db, race)
+
+        if ScoringPhase.NOTIFY.value not in done:
+            with _phase(tracker, job, ScoringPhase.NOTIFY):
+                # Correção que não mudou nenhum ponto não gera um novo aviso; a primeira pontuação sempre avisa
+                if summary.get("mode") != "INCREMENTAL" or summary.get("changed_bets", 0) > 0:
+                    notify_race_result(db, race)
+
+        job.summary = summary
+        job.status = ScoringJobStatus.DONE
+        job.finished_at = _now()
+        job.locked_until = None
+        tracker.commit()
+        print(f"--- ✅ Job de Pontuação #{job.id} Concluído (Race {job.race_id}) ---")
+
+    except Exception as e:
+        db.rollback()
+        print(f"--- ❌ Erro no Job de Pontuação #{job_id}: {e}")
+        if job:
+            tracker.rollback()
+            job.status = ScoringJobStatus.FAILED
+            job.error = str(e)
+            job.finished_at = _now()
+            job.locked_until = None
+            tracker.commit()
+    finally:
+        db.close()
+        tracker.close()
+
+def resume_scoring_jobs():
+    """
+    Retoma jobs que ficaram na fila ou foram interrompidos (ex: restart do worker).
+    Jobs RUNNING só são retomados com o lease vencido: os de outro worker vivo ficam com ele.
+    Chamado uma vez na inicialização pelo Scheduler.
+    """
+    db = SessionLocal()
+    try:
+        pending = db.query(ScoringJob.id).filter(_claimable()).order_by(ScoringJob.id).all()
+        job_ids = [row.id for row in pending]
+    finally:
+        db.close()
+
+    if job_ids:
+        print(f"--- 🔁 Retomando {len(job_ids)} job(s) de pontuação pendente(s) ---")
+    for job_id in job_ids:
+        run_scoring_job(job_id)
@@ -0,0 +1,137 @@
+import re
+import time
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.team import Team
+from app.models.user import User
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acento, só letras/números separados por espaço ("José-María" -> "jose maria")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", stripped.casefold()).split())
+
+class SearchIndex:
+    """
+    Índice de busca em memória (type-ahead): lista ordenada de (token normalizado, id).
+    Cada termo digitado vira uma faixa de prefixo achada com bisect em O(log n);
+    o resultado é a interseção das faixas, ranqueada e cortada no limite sem ordenar tudo.
+    """
+
+    def __init__(self, entries):
+        """entries: [(entity_id, [textos], ativo)]. O primeiro texto é o nome (base do ranking)."""
+        self.names = {}
+        self.words = {}
+        self.active = {}
+        pairs = []
+        for entity_id, texts, active in entries:
+            self.names[entity_id] = normalize(texts[0])
+            self.words[entity_id] = frozenset(self.names[entity_id].split())
+            self.active[entity_id] = active
+            for token in {token for text in texts for token in normalize(text).split()}:
+                pairs.append((token, entity_id))
+        pairs.sort()
+        self.tokens = [token for token, _ in pairs]
+        self.ids = [entity_id for _, entity_id in pairs]
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_ids(self, prefix: str) -> set:
+        start = bisect_left(self.tokens, prefix)
+        end = bisect_left(self.tokens, prefix + "\uffff", lo=start)
+        return set(self.ids[start:end])
+
+    def search(self, query: str, limit: int, after: tuple = None, only_active: bool = False) -> list:
+        """
+        [(chave de relevância, id)] em ordem. Todo termo precisa ser prefixo de alguma palavra (nome ou início do e-mail).
+        `after`: chave do último item da página anterior (paginação por cursor).
+        """
+        terms = normalize(query).split()
+        if not terms:
+            return []
+
+        candidates = None
+        for term in sorted(set(terms), key=len, reverse=True): # Termo mais longo = faixa menor
+            ids = self._prefix_ids(term)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        if only_active:
+            candidates = {entity_id for entity_id in candidates if self.active[entity_id]}
+
+        phrase = " ".join(terms)
+        names, words = self.names, self.words
+
+        def rank(entity_id):
+            name = names[entity_id]
+            if name.startswith(phrase):
+                tier, whole = (0 if name == phrase else 1), 0            # 1. nome idêntico / começa pela busca
+            else:
+                tier, whole = 2, -len(words[entity_id].intersection(terms)) # 2. termos que são palavras inteiras
+            return (tier, whole, len(name), name, entity_id)               # 3. nomes curtos, depois alfabética
+
+        ranked = map(lambda entity_id: (rank(entity_id), entity_id), candidates)
+        if after is not None:
+            after = tuple(after)
+            ranked = (item for item in ranked if item[0] > after)
+        return heapq.nsmallest(limit, ranked)
+
+def email_local_part(email: str) -> str:
+    """Só o que vem antes do @: tokens do domínio ("gmail", "com") casariam com quase todo usuário."""
+    return (email or "").split("@", 1)[0]
+
+def _load_users(db: Session):
+    rows = db.query(User.id, User.full_name, User.email, User.is_active).all()
+    return [(row.id, [row.full_name, email_local_part(row.email)], bool(row.is_active)) for row in rows]
+
+def _load_teams(db: Session):
+    return [(row.id, [row.name], True) for row in db.query(Team.id, Team.name).all()]
+
+LOADERS = {"users": _load_users, "teams": _load_teams}
+
+# Nome -> SearchIndex. Edições feitas por esta API marcam o índice como sujo (invalidate) e ele é
+# reconstruído na próxima busca; SEARCH_INDEX_MAX_AGE cobre mudanças feitas por outros processos.
+_indexes = {}
+_dirty = set()
+_indexes_guard = threading.Lock()
+
+def invalidate(name: str):
+    """Marca o índice para reconstrução (chamar após o commit da mudança)."""
+    with _indexes_guard:
+        _dirty.add(name)
+
+def get_index(db: Session, name: str) -> SearchIndex:
+    """Índice atual; reconstrói (uma query de id + textos) se foi invalidado ou passou da idade máxima."""
+    index = _indexes.get(name)
+    if index is not None and name not in _dirty and time.monotonic() - index.built_at < settings.SEARCH_INDEX_MAX_AGE:
+        return index
+
+    with _indexes_guard:
+        _dirty.discard(name) # Mudanças durante a reconstrução marcam de novo
+    index = SearchIndex(LOADERS[name](db))
+    with _indexes_guard:
+        _indexes[name] = index
+    return index
+
+def search(db: Session, name: str, query: str, limit: int, after: tuple = None, only_active: bool = False) -> list:
+    """Atalho: [(chave, id)] ranqueados do índice `name` ("users" ou "teams")."""
+    if name == "users" and "@" in query: # E-mail digitado inteiro: busca pela parte indexada
+        query = email_local_part(query)
+    return get_index(db, name).search(query, limit, after=after, only_active=only_active)
+
+def fetch_ranked(db: Session, model, ids: list, *criteria, options=()) -> list:
+    """Carrega as linhas dos ids (uma query por PK) preservando a ordem do ranking."""
+    if not ids:
+        return []
+    rows = db.query(model).options(*options).filter(model.id.in_(ids), *criteria).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[entity_id] for entity_id in ids if entity_id in by_id]
@@ -0,0 +1,151 @@
+import os
+import glob
+import gzip
+import json
+import hashlib
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.season import Season
+from app.services import public_data
+
+# Snapshots publicados (sufixo -s{id} = temporada específica; sem sufixo = temporada ativa):
+#   ranking-drivers, ranking-teams, grid-info, seasons-list
+# Para cada nome:
+#   {nome}.{hash}.json(.gz) -> versão imutável (as últimas SNAPSHOT_KEEP ficam no disco)
+#   {nome}.json(.gz)        -> cópia da versão atual (acesso direto pelo mount /snapshots)
+#   {nome}.latest           -> {"file": versão atual, "version": ranking_version} (usado pela API)
+
+def _atomic_write(path: str, content: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+class SnapshotService:
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.SNAPSHOT_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, name: str, data, version: int = None) -> str:
+        """
+        Grava o JSON (e o .gz) de uma resposta. Retorna o nome do arquivo versionado.
+        `version`: versão do dado no banco (ex: Season.ranking_version) lida ANTES da consulta.
+        """
+        payload = json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha1(payload).hexdigest()[:12]
+        versioned = f"{name}.{digest}.json"
+        versioned_path = os.path.join(self.directory, versioned)
+
+        compressed = gzip.compress(payload, compresslevel=6, mtime=0) if settings.SNAPSHOT_GZIP else None
+        if not os.path.exists(versioned_path):
+            if compressed is not None:
+                _atomic_write(versioned_path + ".gz", compressed)
+            _atomic_write(versioned_path, payload)
+
+        _atomic_write(os.path.join(self.directory, f"{name}.json"), payload)
+        if compressed is not None:
+            _atomic_write(os.path.join(self.directory, f"{name}.json.gz"), compressed)
+        latest = json.dumps({"file": versioned, "version": version})
+        _atomic_write(os.path.join(self.directory, f"{name}.latest"), latest.encode("utf-8"))
+
+        self._prune(name, keep=versioned)
+        return versioned
+
+    def _prune(self, name: str, keep: str):
+        """Apaga versões antigas, mantendo as SNAPSHOT_KEEP mais recentes."""
+        versions = [
+            path for path in glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(name)}.*.json"))
+            if os.path.basename(path).count(".") == 2 # {nome}.{hash}.json
+        ]
+        versions.sort(key=os.path.getmtime, reverse=True)
+        for path in versions[settings.SNAPSHOT_KEEP:]:
+            if os.path.basename(path) == keep:
+                continue
+            for old in (path, path + ".gz"):
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+    def _active_season_id(self, db: Session):
+        active = db.query(Season.id).filter(Season.is_active == True).first()
+        return active.id if active else None
+
+    def publish_rankings(self, db: Session, season_id: int):
+        """Ranking completo de pilotos e construtores da temporada (e o da temporada ativa)."""
+        # Versão lida antes do cache: se mudar no meio, o snapshot fica "velho" e a API cai no banco
+        version = db.query(Season.ranking_version).filter(Season.id == season_id).scalar() or 0
+        is_active = season_id == self._active_season_id(db)
+        for category, name in (('DRIVER', "ranking-drivers"), ('TEAM', "ranking-teams")):
+            data = public_data.ranking_window(db, season_id, category)
+            self.write(f"{name}-s{season_id}", data, version=version)
+            if is_active:
+                self.write(name, data, version=version)
+
+    def publish_grid(self, db: Session, season_id: int):
+        """Grid de equipes/pilotos reais da temporada (e o da temporada ativa)."""
+        data = public_data.grid_info(db, season_id)
+        self.write(f"grid-info-s{season_id}", data)
+        if season_id == self._active_season_id(db):
+            self.write("grid-info", data)
+
+    def publish_seasons(self, db: Session):
+        """Lista de temporadas + snapshots "da temporada ativa" (mudam quando a ativa muda)."""
+        self.write("seasons-list", public_data.seasons_list(db))
+        active_id = self._active_season_id(db)
+        if active_id:
+            self.publish_rankings(db, active_id)
+            self.publish_grid(db, active_id)
+        else:
+            for name in ("ranking-drivers", "ranking-teams", "grid-info"):
+                self.write(name, [], version=0)
+
+    def response(self, request: Request, name: str, version: int = None):
+        """
+        FileResponse da versão atual do snapshot (gzip se o cliente aceitar), ou None se ainda
+        não foi publicado. Não toca no banco. O ETag é o nome versionado (hash do conteúdo).
+        Com `version`, só serve o snapshot publicado nessa versão (None = o chamador vai ao banco).
+        """
+        try:
+            with open(os.path.join(self.directory, f"{name}.latest"), "rb") as f:
+                latest = json.loads(f.read().decode("utf-8"))
+        except (FileNotFoundError, ValueError): # ValueError: formato antigo (só o nome), republicado no boot
+            return None
+
+        if version is not None and latest.get("version") != version:
+            return None
+        versioned = latest["file"]
+
+        path = os.path.join(self.directory, versioned)
+        # O nome versionado já é o hash do conteúdo: serve de ETag forte (um por codificação)
+        headers = {"Vary": "Accept-Encoding", "X-Snapshot": versioned, "Cache-Control": "no-cache"}
+        if "gzip" in request.headers.get("accept-encoding", "") and os.path.exists(path + ".gz"):
+            headers["Content-Encoding"] = "gzip"
+            headers["ETag"] = f'"{versioned}.gz"'
+            return FileResponse(path + ".gz", media_type="application/json", headers=headers)
+        if os.path.exists(path):
+            headers["ETag"] = f'"{versioned}"'
+            return FileResponse(path, media_type="application/json", headers=headers)
+        return None
+
+def publish_snapshots(ranking_seasons=(), grid_seasons=(), seasons_list: bool = False):
+    """Publica snapshots numa sessão própria (para BackgroundTasks, após o commit da requisição)."""
+    db = SessionLocal()
+    try:
+        service = SnapshotService()
+        for season_id in set(ranking_seasons):
+            service.publish_rankings(db, season_id)
+        for season_id in set(grid_seasons):
+            service.publish_grid(db, season_id)
+        if seasons_list:
+            service.publish_seasons(db)
+    except Exception as e:
+        print(f"❌ Erro ao publicar snapshots: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, or_, true
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import settings
+from app.models.achievement import UserAchievement
+from app.models.bet import Bet
+from app.models.race import Race
+from app.models.season import Season
+from app.models.team import Team
+from app.models.user import User
+from app.models.user_stats import UserStats
+from app.services import rank_index
+
+class ProfileCache:
+    """
+    LRU limitado de perfis públicos já serializados: user_id -> (chave de versão, perfil).
+    A chave é (temporada ativa, Season.ranking_version, Season.data_version, User.data_version):
+    pontuação, medalhas, troca de equipe, edição de perfil e corridas renomeadas/excluídas
+    incrementam uma das versões, então o perfil antigo nunca é servido
+    (inclusive quando a mudança veio de outro processo).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._guard = threading.Lock()
+
+    def get(self, user_id: int, key: tuple):
+        with self._guard:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != key:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id: int, key: tuple, profile: dict):
+        with self._guard:
+            self._entries[user_id] = (key, profile)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids=None):
+        """Descarta perfis (todos se user_ids for None)."""
+        with self._guard:
+            if user_ids is None:
+                self._entries.clear()
+            for user_id in user_ids or ():
+                self._entries.pop(user_id, None)
+
+profile_cache = ProfileCache(settings.PROFILE_CACHE_SIZE)
+
+def _profile_rows(db: Session, user_id: int, season_id: int = None) -> list:
+    """
+    Dados do perfil numa query só: usuário + equipe, pontos da temporada e carreira (CTEs de 1 linha)
+    + uma linha por corrida finalizada da temporada (histórico do gráfico).
+    """
+    career = select(UserStats.points, UserStats.races).where(
+        UserStats.user_id == user_id, UserStats.season_id.is_(None)
+    ).cte("career")
+    columns = [
+        User.id, User.full_name, User.profile_image_url, User.created_at,
+        career.c.points.label("career_points"), career.c.races.label("career_races")
+    ]
+
+    if season_id is not None:
+        team = select(
+            Team.id, Team.name, Team.logo_url, Team.primary_color, Team.secondary_color
+        ).where(
+            Team.season_id == season_id, or_(Team.captain_id == user_id, Team.partner_id == user_id)
+        ).order_by(Team.id).limit(1).cte("team")
+        season_stats = select(UserStats.points).where(
+            UserStats.user_id == user_id, UserStats.season_id == season_id
+        ).cte("season_stats")
+        history = select(
+            Race.id.label("race_id"), Race.name.label("race_name"), Race.race_date, Bet.points
+        ).join(Race, Race.id == Bet.race_id).where(
+            Bet.user_id == user_id, Race.season_id == season_id, Race.status == 'FINISHED'
+        ).cte("history")
+        columns += [
+            team.c.id.label("team_id"), team.c.name.label("team_name"), team.c.logo_url.label("team_logo"),
+            team.c.primary_color, team.c.secondary_color,
+            season_stats.c.points.label("season_points"),
+            history.c.race_name, history.c.points.label("race_points")
+        ]
+
+    query = db.query(*columns).select_from(User).outerjoin(career, true())
+    if season_id is not None:
+        query = query.outerjoin(team, true()).outerjoin(season_stats, true()).outerjoin(history, true()) \
+            .order_by(history.c.race_date, history.c.race_id)
+    return query.filter(User.id == user_id).all()
+
+def build_public_profile(db: Session, user_id: int, season_id: int = None, ranking_version: int = 0) -> dict:
+    """Monta o perfil público (sem cache): 1 query de dados + 1 de medalhas (com conquista e equipe)."""
+    rows = _profile_rows(db, user_id, season_id)
+    if not rows:
+        return None
+    first = rows[0]
+
+    team_data = None
+    season_stats = {"rank": "N/A", "percentile": None, "points_to_next": None, "points": 0, "history": []}
+    if season_id is not None:
+        if first.team_id:
+            team_data = {
+                "id": first.team_id,
+                "name": first.team_name,
+                "logo": first.team_logo,
+                "colors": [first.primary_color, first.secondary_color]
+            }
+        season_stats["points"] = first.season_points or 0
+
+        # Posição no ranking (índice em memória sobre o cache, versão já conhecida)
+        standing = rank_index.lookup(db, season_id, 'DRIVER', user_id, version=ranking_version)
+        if standing:
+            season_stats["rank"] = f"#{standing['rank']}"
+            season_stats["percentile"] = standing["percentile"]
+            season_stats["points_to_next"] = standing["points_to_next"]
+
+        season_stats["history"] = [
+            {"race": row.race_name, "points": row.race_points} for row in rows if row.race_name is not None
+        ]
+
+    badges = db.query(UserAchievement).options(
+        joinedload(UserAchievement.achievement),
+        joinedload(UserAchievement.team)
+    ).filter(UserAchievement.user_id == user_id).all()
+
+    return jsonable_encoder({
+        "id": first.id,
+        "name": first.full_name,
+        "photo": first.profile_image_url,
+        "joined_at": first.created_at,
+        "team": team_data,
+        "stats": {
+            "career_points": first.career_points or 0,
+            "races": first.career_races or 0,
+            "season_points": season_stats["points"],
+            "season_rank": season_stats["rank"],
+            "season_percentile": season_stats["percentile"],
+            "points_to_next": season_stats["points_to_next"], # Pontos para subir uma posição
+            "season_history": season_stats["history"]
+        },
+        "badges": badges
+    })
+
+def get_public_profile(db: Session, user_id: int) -> dict:
+    """
+    Perfil público do piloto. Uma query pequena lê as versões (usuário + temporada ativa);
+    se o LRU tiver o perfil dessa versão, nada mais é consultado. None se o usuário não existe.
+    """
+    probe = db.query(
+        User.data_version, Season.id.label("season_id"), Season.ranking_version,
+        Season.data_version.label("season_data_version")
+    ).select_from(User).outerjoin(Season, Season.is_active == True).filter(User.id == user_id).first()
+    if probe is None:
+        return None
+
+    key = (probe.season_id, probe.ranking_version or 0, probe.season_data_version or 0, probe.data_version or 0)
+    profile = profile_cache.get(user_id, key)
+    if profile is None:
+        profile = build_public_profile(db, user_id, probe.season_id, probe.ranking_version or 0)
+        if profile is not None:
+            profile_cache.put(user_id, key, profile)
+    return profile
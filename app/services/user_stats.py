@@ -0,0 +1,141 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, update, insert, bindparam, or_
+from app.models.user_stats import UserStats
+from app.models.bet import Bet
+from app.models.race import Race, RaceResult, RaceStatus
+
+STAT_FIELDS = ("points", "races", "pole_hits", "winner_hits", "dotd_hits", "exact_hits")
+TOP10_FIELDS = [f"p{i}_driver_id" for i in range(1, 11)]
+
+class UserStatsService:
+
+    def apply_deltas(self, db: Session, season_id: int, user_ids: np.ndarray, deltas: dict):
+        """
+        Soma os saldos (um array por campo de STAT_FIELDS, alinhado com user_ids) nas linhas
+        da temporada e da carreira. Incremento atômico no banco; linhas inexistentes são criadas.
+        SEM commit (faz parte da transação de pontuação).
+        """
+        if len(user_ids) == 0:
+            return 0
+
+        # Agrega por usuário e descarta quem não mudou
+        unique_users, inverse = np.unique(user_ids, return_inverse=True)
+        totals = {}
+        for field in STAT_FIELDS:
+            values = np.zeros(len(unique_users), dtype=np.int64)
+            if field in deltas:
+                np.add.at(values, inverse, np.asarray(deltas[field], dtype=np.int64))
+            totals[field] = values
+
+        changed = np.zeros(len(unique_users), dtype=bool)
+        for values in totals.values():
+            changed |= values != 0
+        if not changed.any():
+            return 0
+
+        per_user = {
+            int(u): {field: int(totals[field][i]) for field in STAT_FIELDS}
+            for i, u in enumerate(unique_users) if changed[i]
+        }
+
+        existing = db.query(UserStats.id, UserStats.user_id, UserStats.season_id).filter(
+            UserStats.user_id.in_(list(per_user)),
+            or_(UserStats.season_id == season_id, UserStats.season_id.is_(None))
+        ).all()
+        found = {(row.user_id, row.season_id): row.id for row in existing}
+
+        updates, inserts = [], []
+        for user_id, values in per_user.items():
+            for scope in (season_id, None):
+                row_id = found.get((user_id, scope))
+                if row_id:
+                    updates.append({"row_id": row_id, **{f"d_{f}": v for f, v in values.items()}})
+                else:
+                    inserts.append({"user_id": user_id, "season_id": scope, **values})
+
+        if updates:
+            table = UserStats.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values({f: table.c[f] + bindparam(f"d_{f}") for f in STAT_FIELDS}),
+                updates
+            )
+        if inserts:
+            db.execute(insert(UserStats), inserts)
+
+        return len(per_user)
+
+    def rebuild(self, db: Session, user_ids: list = None):
+        """
+        Recalcula as estatísticas a partir das apostas (todas, ou só de `user_ids`). SEM commit.
+        Usado pelo comando rebuild_user_stats.py e quando não há base para o cálculo incremental.
+        """
+        delete_query = db.query(UserStats)
+        if user_ids is not None:
+            if not user_ids:
+                return 0
+            delete_query = delete_query.filter(UserStats.user_id.in_(user_ids))
+        delete_query.delete(synchronize_session=False)
+
+        exact_hits = sum(
+            case(
+                (
+                    (getattr(Bet, f) != None) & (getattr(Bet, f) == getattr(RaceResult, f)),
+                    1
+                ),
+                else_=0
+            ) for f in TOP10_FIELDS
+        )
+        query = db.query(
+            Bet.user_id,
+            Race.season_id,
+            func.coalesce(func.sum(Bet.points), 0).label("points"),
+            func.count(Bet.id).label("races"),
+            func.sum(case((Bet.pole_driver_id == RaceResult.pole_driver_id, 1), else_=0)).label("pole_hits"),
+            func.sum(case((Bet.winning_team_id == RaceResult.winning_team_id, 1), else_=0)).label("winner_hits"),
+            func.sum(case((Bet.dotd_driver_id == RaceResult.dotd_driver_id, 1), else_=0)).label("dotd_hits"),
+            func.sum(exact_hits).label("exact_hits")
+        ).join(Race, Bet.race_id == Race.id).outerjoin(RaceResult, RaceResult.race_id == Race.id).filter(
+            Race.status == RaceStatus.FINISHED
+        )
+        if user_ids is not None:
+            query = query.filter(Bet.user_id.in_(user_ids))
+        rows = query.group_by(Bet.user_id, Race.season_id).all()
+
+        season_rows = []
+        career = {}
+        for row in rows:
+            values = {f: int(getattr(row, f) or 0) for f in STAT_FIELDS}
+            season_rows.append({"user_id": row.user_id, "season_id": row.season_id, **values})
+            totals = career.setdefault(row.user_id, dict.fromkeys(STAT_FIELDS, 0))
+            for f in STAT_FIELDS:
+                totals[f] += values[f]
+
+        career_rows = [{"user_id": u, "season_id": None, **values} for u, values in career.items()]
+        if season_rows:
+            db.execute(insert(UserStats), season_rows + career_rows)
+
+        return len(career_rows)
+
+    def needs_backfill(self, db: Session) -> bool:
+        """Tabela vazia num banco que já tem apostas pontuadas (criada depois das corridas, rebuild nunca rodou)."""
+        if db.query(UserStats.id).first() is not None:
+            return False
+        return db.query(Bet.id).join(Race, Bet.race_id == Race.id).filter(
+            Race.status == RaceStatus.FINISHED
+        ).first() is not None
+
+    def get_stats(self, db: Session, user_ids: list, season_id: int = None) -> dict:
+        """Linhas de estatística por usuário (season_id None = carreira). Usuários sem linha ficam de fora."""
+        if not user_ids:
+            return {}
+        scope = UserStats.season_id.is_(None) if season_id is None else UserStats.season_id == season_id
+        rows = db.query(UserStats).filter(UserStats.user_id.in_(user_ids), scope).all()
+        return {row.user_id: row for row in rows}
+
+    def get_points(self, db: Session, user_ids: list, season_id: int = None) -> dict:
+        """Pontos por usuário (0 para quem ainda não tem estatística)."""
+        stats = self.get_stats(db, user_ids, season_id)
+        return {u: (stats[u].points if u in stats else 0) for u in user_ids}
@@ -1,6 +1,7 @@
 # init_db.py
 from app.db.session import engine
 from app.db.base import Base
+from app.db.schema_upgrade import upgrade_schema
 
 # IMPORTANTE: Importar todos os modelos aqui para que o SQLAlchemy
 # saiba que eles existem antes de criar as tabelas
@@ -13,6 +14,10 @@ from app.models.achievement import Achievement, UserAchievement
 from app.models.rivalry import Rivalry
 from app.models.ranking_cache import RankingCache
 from app.models.subscription import PushSubscription
+from app.models.scoring_job import ScoringJob
+from app.models.user_stats import UserStats
+from app.models.background_job import BackgroundJob
+from app.models.ranking_history import RankingHistory
 
 
 def init_db():
@@ -21,6 +26,11 @@ def init_db():
     
     # Cria todas as tabelas definidas nos modelos importados acima
     Base.metadata.create_all(bind=engine)
+
+    # Tabelas que já existiam: colunas e índices adicionados depois
+    added = upgrade_schema(engine)
+    if added:
+        print(f"Colunas adicionadas: {', '.join(added)}")
     
     print("Tabelas criadas com sucesso! Verifique seu MySQL.")
 
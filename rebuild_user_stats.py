@@ -0,0 +1,44 @@
+# rebuild_user_stats.py
+"""
+Reconstrói a tabela user_stats (temporada e carreira) a partir das apostas pontuadas.
+Rode após criar a tabela pela primeira vez ou se os contadores ficarem inconsistentes.
+
+Uso:
+    python rebuild_user_stats.py
+"""
+import time
+
+from app.db.session import SessionLocal
+
+# Importar todos os modelos para o SQLAlchemy resolver os relacionamentos
+from app.models.user import User
+from app.models.season import Season, RealDriver, RealTeam
+from app.models.team import Team
+from app.models.race import Race, RaceResult
+from app.models.bet import Bet
+from app.models.achievement import Achievement, UserAchievement
+from app.models.rivalry import Rivalry
+from app.models.ranking_cache import RankingCache
+from app.models.subscription import PushSubscription
+from app.models.scoring_job import ScoringJob
+from app.models.user_stats import UserStats
+from app.models.background_job import BackgroundJob
+from app.models.ranking_history import RankingHistory
+
+from app.services.user_stats import UserStatsService
+
+
+def rebuild_user_stats():
+    print("--- 📊 Reconstruindo estatísticas dos usuários ---")
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        users = UserStatsService().rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"--- ✅ {users} usuários processados em {time.perf_counter() - start:.2f}s ---")
+
+
+if __name__ == "__main__":
+    rebuild_user_stats()
@@ -0,0 +1,127 @@
+# rescore_season.py
+"""
+Re-pontua todas as corridas FINALIZADAS de uma temporada, uma corrida por processo.
+Sem push e sem atualizar o cache a cada corrida: no final, Team.total_points, o
+UserStats e o RankingCache são reconstruídos uma única vez.
+
+Uso:
+    python rescore_season.py 2025
+    python rescore_season.py 2025 --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.db.session import engine, SessionLocal
+
+# Importar todos os modelos para o SQLAlchemy resolver os relacionamentos
+from app.models.user import User
+from app.models.season import Season, RealDriver, RealTeam
+from app.models.team import Team
+from app.models.race import Race, RaceResult, RaceStatus
+from app.models.bet import Bet
+from app.models.achievement import Achievement, UserAchievement
+from app.models.rivalry import Rivalry
+from app.models.ranking_cache import RankingCache
+from app.models.subscription import PushSubscription
+from app.models.scoring_job import ScoringJob
+from app.models.user_stats import UserStats
+from app.models.background_job import BackgroundJob
+from app.models.ranking_history import RankingHistory
+
+from app.services import data_version
+from app.services.scoring import score_race, rebuild_team_points
+from app.services.leaderboard import LeaderboardService
+from app.services.ranking_history import RankingHistoryService
+from app.services.user_stats import UserStatsService
+
+
+def _init_worker():
+    # Conexões herdadas do processo pai não podem ser reutilizadas no filho
+    engine.dispose(close=False)
+
+def rescore_race(race_id: int) -> dict:
+    """Fases 1-3 de uma corrida (sem equipes, cache ou notificações), em transação própria."""
+    db = SessionLocal()
+    try:
+        race = db.query(Race).filter(Race.id == race_id).with_for_update().first()
+        start = time.perf_counter()
+        summary = score_race(db, race, update_teams=False, update_stats=False)
+        db.commit()
+        summary["race_id"] = race_id
+        summary["elapsed"] = time.perf_counter() - start
+        return summary
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def rescore_season(year: int, workers: int):
+    db = SessionLocal()
+    try:
+        season = db.query(Season).filter(Season.year == year).first()
+        if not season:
+            print(f"Temporada {year} não encontrada.")
+            return
+
+        race_ids = [row.id for row in db.query(Race.id).join(RaceResult).filter(
+            Race.season_id == season.id,
+            Race.status == RaceStatus.FINISHED
+        ).order_by(Race.race_date).all()]
+    finally:
+        db.close()
+
+    if not race_ids:
+        print(f"Nenhuma corrida finalizada na temporada {year}.")
+        return
+
+    print(f"--- 🔁 Re-pontuando {len(race_ids)} corridas da temporada {year} ({workers} processos) ---")
+    engine.dispose()
+    start = time.perf_counter()
+    total_bets = 0
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(rescore_race, race_id): race_id for race_id in race_ids}
+        for future in as_completed(futures):
+            race_id = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"❌ Corrida {race_id}: {e}")
+                continue
+            total_bets += summary["processed"]
+            print(f"✅ Corrida {race_id}: {summary['processed']} apostas ({summary['changed_bets']} alteradas) em {summary['elapsed']:.2f}s")
+
+    scoring_elapsed = time.perf_counter() - start
+
+    # Reconstrução única de equipes, estatísticas e cache
+    db = SessionLocal()
+    try:
+        rebuild_team_points(db, season.id)
+        UserStatsService().rebuild(db)
+        # ETags: um incremento só, aqui, em vez de um por corrida nos processos paralelos
+        # (que disputariam as mesmas linhas de usuários e da temporada)
+        data_version.bump_season_bettors(db, season.id)
+        data_version.bump_season(db, season.id)
+        db.commit()
+        LeaderboardService().refresh_leaderboard(db, season.id)
+        RankingHistoryService().rebuild(db, season.id)
+    finally:
+        db.close()
+
+    total_elapsed = time.perf_counter() - start
+    print(f"--- 🏁 {len(race_ids) - failures}/{len(race_ids)} corridas, {total_bets} apostas ---")
+    print(f"Pontuação: {scoring_elapsed:.2f}s ({len(race_ids) / scoring_elapsed:.1f} corridas/s, {total_bets / scoring_elapsed:.0f} apostas/s)")
+    print(f"Total (com equipes, estatísticas, ranking e histórico): {total_elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-pontua todas as corridas finalizadas de uma temporada.")
+    parser.add_argument("year", type=int, help="Ano da temporada (ex: 2025)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Número de processos")
+    args = parser.parse_args()
+    rescore_season(args.year, args.workers)
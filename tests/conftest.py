@@ -0,0 +1,154 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="bolao-tests-")
+
+# Settings exige estas variáveis; e-mail e push não são usados nos testes
+for name, value in {
+    "API_V1_STR": "/api/v1",
+    "PROJECT_NAME": "bolao-tests",
+    "SECRET_KEY": "tests",
+    "FRONTEND_URL": "http://localhost:4200",
+    "BACKEND_URL": "http://localhost:8000",
+    "MAIL_USERNAME": "tests",
+    "MAIL_PASSWORD": "tests",
+    "MAIL_FROM": "tests@example.com",
+    "MAIL_SERVER": "localhost",
+    "MAIL_PORT": "25",
+    "VAPID_PRIVATE_KEY": "",
+    "VAPID_PUBLIC_KEY": "",
+    "VAPID_CLAIMS_EMAIL": "tests@example.com",
+}.items():
+    os.environ.setdefault(name, value)
+
+# Banco, snapshots e debounce SEMPRE de teste: a fixture `db` apaga e recria todas as tabelas.
+# Arquivo (e não sqlite://) para que sessões separadas (tracker, jobs, rotas) vejam os mesmos dados
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(_tmp, 'tests.db')}"
+os.environ["SNAPSHOT_DIR"] = os.path.join(_tmp, "snapshots")
+os.environ["SCORING_DEBOUNCE_SECONDS"] = "0"
+
+def _reset_caches():
+    """Caches em memória são por processo e sobreviveriam à recriação do banco entre testes."""
+    from app.services import points_matrix, rank_index, grid_lookup, search_index, scoring_jobs
+    from app.services.user_profile import profile_cache
+
+    points_matrix._matrices.clear()
+    rank_index._indexes.clear()
+    grid_lookup._grids.clear()
+    grid_lookup._dirty.clear()
+    search_index._indexes.clear()
+    search_index._dirty.clear()
+    scoring_jobs._last_request.clear()
+    profile_cache.invalidate()
+
+@pytest.fixture
+def db():
+    """Sessão num banco SQLite recém-criado (todas as tabelas vazias)."""
+    from app.db.base import Base
+    from app.db.session import engine, SessionLocal
+    from app.models import (  # noqa: F401 (registra os modelos no metadata)
+        user, season, team, race, bet, achievement, rivalry, ranking_cache, subscription,
+        scoring_job, user_stats, background_job, ranking_history
+    )
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _reset_caches()
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def random_result(rng: random.Random, driver_ids: list, team_id: int) -> dict:
+    """Gabarito (ou palpite) completo com pilotos sorteados do grid."""
+    top10 = rng.sample(driver_ids, 10)
+    return {
+        "pole_driver_id": rng.choice(driver_ids),
+        "dotd_driver_id": rng.choice(driver_ids),
+        "winning_team_id": team_id,
+        **{f"p{position}_driver_id": driver_id for position, driver_id in enumerate(top10, start=1)}
+    }
+
+@pytest.fixture
+def league(db):
+    """
+    Temporada ativa com 12 pilotos, 8 usuários (duas equipes, uma com dupla), 3 corridas
+    fechadas e um palpite sorteado por usuário em cada corrida. Nenhuma corrida pontuada.
+    """
+    from app.models.user import User
+    from app.models.season import Season, RealDriver, RealTeam
+    from app.models.team import Team
+    from app.models.race import Race
+    from app.models.bet import Bet
+
+    rng = random.Random(42)
+    season = Season(year=2025, is_active=True)
+    db.add(season)
+    db.commit()
+
+    real_team = RealTeam(name="Red Bull", season_id=season.id)
+    db.add(real_team)
+    db.commit()
+    drivers = [RealDriver(name=f"Piloto {i}", number=i, real_team_id=real_team.id, season_id=season.id) for i in range(1, 13)]
+    db.add_all(drivers)
+
+    users = [User(full_name=f"Usuário {i}", email=f"user{i}@example.com", hashed_password="x") for i in range(8)]
+    db.add_all(users)
+    db.commit()
+
+    teams = [
+        Team(season_id=season.id, name="Equipe A", captain_id=users[0].id, partner_id=users[1].id, total_points=0),
+        Team(season_id=season.id, name="Equipe B", captain_id=users[2].id, total_points=0),
+    ]
+    db.add_all(teams)
+    races = []
+    for i in range(3):
+        race_date = datetime(2025, 3, 1 + 7 * i, 18)
+        races.append(Race(
+            season_id=season.id, name=f"GP {i}", country="Brasil", race_date=race_date,
+            bets_open_at=race_date - timedelta(days=5), bets_close_at=race_date - timedelta(hours=1), status="CLOSED"
+        ))
+    db.add_all(races)
+    db.commit()
+
+    team_of = {users[0].id: teams[0].id, users[1].id: teams[0].id, users[2].id: teams[1].id}
+    driver_ids = [driver.id for driver in drivers]
+    for race in races:
+        for user in users:
+            db.add(Bet(user_id=user.id, race_id=race.id, team_id=team_of.get(user.id), **random_result(rng, driver_ids, real_team.id)))
+    db.commit()
+
+    return SimpleNamespace(
+        season=season, real_team=real_team, driver_ids=driver_ids,
+        users=users, teams=teams, races=races, rng=rng
+    )
+
+@pytest.fixture
+def score(db, league):
+    """score(race, result): grava o gabarito e roda o job de pontuação até o fim (como o admin)."""
+    from app.models.race import RaceResult
+    from app.services.scoring_jobs import enqueue_scoring_job, run_scoring_job
+
+    def run(race, result: dict):
+        current = db.query(RaceResult).filter(RaceResult.race_id == race.id).first()
+        if current:
+            for field, value in result.items():
+                setattr(current, field, value)
+        else:
+            db.add(RaceResult(race_id=race.id, **result))
+        db.commit()
+
+        job, _ = enqueue_scoring_job(db, race.id)
+        run_scoring_job(job.id)
+        db.expire_all()
+        db.refresh(job)
+        assert job.status == "DONE", job.error
+        return job
+    return run
@@ -0,0 +1,91 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.pagination import keyset_page
+from app.core.security import create_access_token
+from app.main import app
+from app.models.bet import Bet
+from app.models.user import User
+
+from conftest import random_result
+
+@pytest.fixture
+def client(db):
+    # Sem o `with`: o lifespan (scheduler, backfill) não roda
+    return TestClient(app)
+
+def auth(user) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user.id)}"}
+
+def test_ranking_etag_revalidates_until_ranking_changes(db, league, score, client):
+    score(league.races[0], random_result(league.rng, league.driver_ids, league.real_team.id))
+    url = f"/api/v1/ranking/drivers?season_id={league.season.id}&limit=5"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    score(league.races[1], random_result(league.rng, league.driver_ids, league.real_team.id))
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+def test_ranking_snapshot_served_with_etag(db, league, score, client):
+    score(league.races[0], random_result(league.rng, league.driver_ids, league.real_team.id))
+    url = f"/api/v1/ranking/drivers?season_id={league.season.id}"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert [row["position"] for row in first.json()] == sorted(row["position"] for row in first.json())
+    assert client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+def test_races_etag_follows_season_version(db, league, score, client):
+    headers = auth(league.users[0])
+    url = f"/api/v1/races/?season_id={league.season.id}"
+
+    etag = client.get(url, headers=headers).headers["etag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # Pontuar muda o status da corrida (Season.data_version)
+    score(league.races[0], random_result(league.rng, league.driver_ids, league.real_team.id))
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 200
+
+def test_my_bets_cursor_walks_every_bet_once(db, league, client):
+    user = league.users[0]
+    expected = [bet_id for (bet_id,) in db.query(Bet.id).filter(Bet.user_id == user.id).order_by(Bet.id.desc())]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/bets/my-bets", params=params, headers=auth(user)).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == expected
+
+def test_my_bets_rejects_tampered_cursor(db, league, client):
+    response = client.get("/api/v1/bets/my-bets", params={"cursor": "nao-e-um-cursor"}, headers=auth(league.users[0]))
+    assert response.status_code == 400
+
+def test_keyset_page_with_duplicate_sort_keys(db):
+    # Nomes repetidos: o id desempata e nenhuma linha some ou repete entre páginas
+    db.add_all([User(full_name=name, email=f"{i}@example.com", hashed_password="x") for i, name in enumerate("BABACAB")])
+    db.commit()
+    order_by = [(User.full_name, False), (User.id, False)]
+    expected = [user.id for user in db.query(User).order_by(User.full_name, User.id)]
+
+    seen, cursor = [], None
+    while True:
+        page = keyset_page(db.query(User), order_by, 3, cursor)
+        seen.extend(user.id for user in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == expected
+    with pytest.raises(HTTPException):
+        keyset_page(db.query(User), order_by, 3, "e30") # Cursor de outra listagem ({})
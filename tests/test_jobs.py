@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+
+from app.db.session import SessionLocal
+from app.models.achievement import Achievement, UserAchievement
+from app.models.background_job import BackgroundJob
+from app.models.race import RaceResult
+from app.models.scoring_job import ScoringJob
+from app.models.user_stats import UserStats
+from app.services import background_jobs, scoring_jobs
+from app.services.badge import BadgeService, insert_new_badges
+
+def _ago(minutes: int):
+    return datetime.now(timezone.utc) - timedelta(minutes=minutes)
+
+def test_scoring_job_claimed_by_one_worker_only(db, league):
+    job, _ = scoring_jobs.enqueue_scoring_job(db, league.races[0].id)
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        assert scoring_jobs._claim_job(first, job.id) is not None
+        # Dono vivo (lease em dia): o segundo worker não toma o job
+        assert scoring_jobs._claim_job(second, job.id) is None
+    finally:
+        first.close()
+        second.close()
+
+    db.refresh(job)
+    assert job.status == "RUNNING"
+    assert job.attempts == 1
+
+def test_scoring_job_claim_is_conditional_on_attempts(db, league):
+    # Dois workers leram o mesmo job (attempts=0); o UPDATE do segundo não pode vencer
+    job, _ = scoring_jobs.enqueue_scoring_job(db, league.races[0].id)
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        seen = [session.get(ScoringJob, job.id).attempts for session in (first, second)]
+        assert scoring_jobs._claim_job(first, job.id) is not None
+
+        claimed = second.execute(
+            update(ScoringJob)
+            .where(ScoringJob.id == job.id, ScoringJob.attempts == seen[1], scoring_jobs._claimable())
+            .values(status="RUNNING", attempts=seen[1] + 1)
+        ).rowcount
+        second.commit()
+    finally:
+        first.close()
+        second.close()
+
+    assert claimed == 0
+
+def test_resume_skips_live_lease_and_takes_expired(db, league):
+    result = {"winning_team_id": league.real_team.id, "pole_driver_id": league.driver_ids[0]}
+    for race in league.races[:2]:
+        db.add(RaceResult(race_id=race.id, **result))
+    live = ScoringJob(race_id=league.races[0].id, status="RUNNING", attempts=1, phase_timings={},
+                      locked_until=datetime.now(timezone.utc) + timedelta(minutes=5))
+    dead = ScoringJob(race_id=league.races[1].id, status="RUNNING", attempts=1, phase_timings={},
+                      locked_until=_ago(5))
+    db.add_all([live, dead])
+    db.commit()
+
+    scoring_jobs.resume_scoring_jobs()
+    db.expire_all()
+
+    assert (live.status, live.attempts) == ("RUNNING", 1)
+    assert (dead.status, dead.attempts) == ("DONE", 2)
+
+def test_background_job_resume_respects_lease(db, league):
+    badge = Achievement(name="Pontuador", description="10 pontos", rule_type="TOTAL_POINTS", threshold=10)
+    db.add(badge)
+    db.add_all([UserStats(user_id=user.id, season_id=None, points=10, races=1) for user in league.users])
+    db.commit()
+
+    payload = {"achievement_id": badge.id}
+    live = BackgroundJob(kind="ACHIEVEMENT_BACKFILL", status="RUNNING", payload=payload,
+                         locked_until=datetime.now(timezone.utc) + timedelta(minutes=5))
+    dead = BackgroundJob(kind="ACHIEVEMENT_BACKFILL", status="RUNNING", payload=payload, locked_until=_ago(5))
+    queued = BackgroundJob(kind="ACHIEVEMENT_BACKFILL", status="QUEUED", payload=payload)
+    db.add_all([live, dead, queued])
+    db.commit()
+
+    background_jobs.resume_background_jobs()
+    db.expire_all()
+
+    assert live.status == "RUNNING"
+    assert (dead.status, dead.locked_until) == ("DONE", None)
+    assert queued.status == "DONE"
+    # Duas execuções da mesma conquista (a retomada e a da fila) não duplicam medalhas
+    assert dead.result["granted"] + queued.result["granted"] == len(league.users)
+    assert db.query(UserAchievement).count() == len(league.users)
+
+def test_badges_are_unique_per_user_and_season(db, league):
+    badge = Achievement(name="Campeão", description="1º lugar", rule_type="PILOT_RANKING", threshold=1)
+    db.add(badge)
+    db.commit()
+    user_id = league.users[0].id
+
+    race_badge = {"user_id": user_id, "achievement_id": badge.id, "season_id": None, "seen": False}
+    season_badge = {"user_id": user_id, "achievement_id": badge.id, "season_id": league.season.id, "seen": False}
+
+    assert insert_new_badges(db, [race_badge, season_badge]) == [user_id, user_id]
+    assert insert_new_badges(db, [race_badge, season_badge]) == []
+    db.commit()
+    assert db.query(UserAchievement).count() == 2
+
+def test_backfill_twice_grants_once(db, league):
+    badge = Achievement(name="Estreante", description="1 corrida", rule_type="RACES_PARTICIPATED", threshold=1)
+    db.add(badge)
+    db.add_all([UserStats(user_id=user.id, season_id=None, races=1) for user in league.users])
+    db.commit()
+
+    service = BadgeService()
+    assert service.backfill_achievement(db, badge.id)["granted"] == len(league.users)
+    assert service.backfill_achievement(db, badge.id)["granted"] == 0
+    assert db.query(UserAchievement).count() == len(league.users)
@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.bet import Bet
+from app.models.race import RaceResult
+from app.models.ranking_cache import RankingCache
+from app.models.season import Season
+from app.models.team import Team
+from app.models.user import User
+from app.models.user_stats import UserStats
+from app.services import ranking_query
+from app.services.leaderboard import LeaderboardService
+from app.services.scoring import score_bet, rebuild_team_points, preview_race_result
+from app.services.user_stats import UserStatsService
+
+from conftest import random_result
+
+def snapshot_state(db, season_id: int) -> dict:
+    """Tudo que a pontuação mantém: pontos das apostas, UserStats, equipes e o cache do ranking."""
+    db.expire_all()
+    return {
+        "bets": sorted(db.query(Bet.id, Bet.points).all()),
+        "stats": sorted(
+            (s.user_id, s.season_id or 0, s.points, s.races, s.pole_hits, s.winner_hits, s.dotd_hits, s.exact_hits)
+            for s in db.query(UserStats)
+        ),
+        "teams": sorted(db.query(Team.id, Team.total_points).all()),
+        "ranking": sorted(db.query(RankingCache.category, RankingCache.entity_id, RankingCache.points, RankingCache.position).filter(
+            RankingCache.season_id == season_id
+        ).all()),
+    }
+
+def full_rebuild(db, season_id: int):
+    """Refaz tudo do zero, como o rescore_season/rebuild_user_stats fazem."""
+    results = {r.race_id: r for r in db.query(RaceResult)}
+    for bet in db.query(Bet):
+        bet.points = score_bet(bet, results[bet.race_id])
+    db.flush()
+    rebuild_team_points(db, season_id)
+    UserStatsService().rebuild(db)
+    db.commit()
+    LeaderboardService().refresh_leaderboard(db, season_id)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_correction_matches_full_rebuild(db, league, score, seed):
+    for race in league.races:
+        score(race, random_result(league.rng, league.driver_ids, league.real_team.id))
+
+    # Correção de gabarito de uma corrida já pontuada -> modo incremental
+    corrected = random_result(league.rng, league.driver_ids, league.real_team.id)
+    job = score(league.races[seed], corrected)
+    assert job.summary["mode"] == "INCREMENTAL"
+
+    incremental = snapshot_state(db, league.season.id)
+    full_rebuild(db, league.season.id)
+    assert snapshot_state(db, league.season.id) == incremental
+
+def test_ranking_cache_matches_official_standings(db, league, score):
+    for race in league.races:
+        score(race, random_result(league.rng, league.driver_ids, league.real_team.id))
+
+    for category in ('DRIVER', 'TEAM'):
+        expected = [(r.entity_id, r.points, r.position) for r in ranking_query.get_standings(db, league.season.id, category)]
+        cached = db.query(RankingCache.entity_id, RankingCache.points, RankingCache.position).filter(
+            RankingCache.season_id == league.season.id, RankingCache.category == category
+        ).order_by(RankingCache.position, RankingCache.entity_id).all()
+        assert [tuple(row) for row in cached] == expected
+
+def test_refresh_leaderboard_only_bumps_version_on_change(db, league, score):
+    score(league.races[0], random_result(league.rng, league.driver_ids, league.real_team.id))
+    service = LeaderboardService()
+    version = service.get_version(db, league.season.id)
+
+    # Nada mudou: nenhuma linha gravada, versão (ETag do ranking) intacta
+    assert service.refresh_leaderboard(db, league.season.id) == 0
+    assert service.get_version(db, league.season.id) == version
+
+    last = ranking_query.get_standings(db, league.season.id, 'DRIVER')[-1]
+    db.query(UserStats).filter(UserStats.user_id == last.entity_id, UserStats.season_id == league.season.id).update(
+        {UserStats.points: UserStats.points + 1000}, synchronize_session=False
+    )
+    db.commit()
+
+    assert service.refresh_leaderboard(db, league.season.id) > 0
+    assert service.get_version(db, league.season.id) == version + 1
+    leader = db.query(RankingCache).filter(
+        RankingCache.season_id == league.season.id, RankingCache.category == 'DRIVER', RankingCache.position == 1
+    ).one()
+    assert leader.entity_id == last.entity_id
+
+def test_scoring_bumps_data_versions(db, league, score):
+    outsider = User(full_name="Sem palpite", email="outsider@example.com", hashed_password="x")
+    db.add(outsider)
+    db.commit()
+
+    score(league.races[0], random_result(league.rng, league.driver_ids, league.real_team.id))
+    db.expire_all()
+
+    assert db.get(Season, league.season.id).data_version > 0
+    assert all(db.get(User, user.id).data_version > 0 for user in league.users)
+    assert db.get(User, outsider.id).data_version == 0
+
+def test_preview_matches_scored_standings(db, league, score):
+    for race in league.races[:2]:
+        score(race, random_result(league.rng, league.driver_ids, league.real_team.id))
+
+    candidate = random_result(league.rng, league.driver_ids, league.real_team.id)
+    preview = preview_race_result(db, league.races[0], SimpleNamespace(**candidate))
+    score(league.races[0], candidate)
+
+    for category, key in (('DRIVER', 'drivers'), ('TEAM', 'teams')):
+        projected = [(e["entity_id"], e["points"], e["position"]) for e in preview[key]]
+        real = [(r.entity_id, r.points, r.position) for r in ranking_query.get_standings(db, league.season.id, category)]
+        assert projected == real
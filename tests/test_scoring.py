@@ -0,0 +1,53 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.scoring import (
+    PICK_FIELDS, result_vector, score_bet, score_matrix, snapshot_vector, stats_deltas
+)
+
+def random_picks(rng: random.Random, empty_rate: float = 0.2) -> SimpleNamespace:
+    """Palpite (ou gabarito) com ids pequenos para forçar acertos e campos vazios (None)."""
+    return SimpleNamespace(**{
+        field: None if rng.random() < empty_rate else rng.randint(1, 4) for field in PICK_FIELDS
+    })
+
+def as_matrix(bets) -> np.ndarray:
+    return np.array([[getattr(bet, f) or 0 for f in PICK_FIELDS] for bet in bets], dtype=np.int64)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_score_matrix_matches_score_bet(seed):
+    rng = random.Random(seed)
+    bets = [random_picks(rng) for _ in range(200)]
+    result = random_picks(rng, empty_rate=0.3)
+
+    expected = [score_bet(bet, result) for bet in bets]
+    assert score_matrix(as_matrix(bets), result_vector(result)).tolist() == expected
+
+@pytest.mark.parametrize("field", PICK_FIELDS)
+def test_empty_pick_never_scores(field):
+    # NULL == NULL (ou 0 == 0) não é acerto em nenhuma coluna, extras inclusive
+    bet = SimpleNamespace(**{f: 1 for f in PICK_FIELDS})
+    result = SimpleNamespace(**{f: 2 for f in PICK_FIELDS})
+    setattr(bet, field, None)
+    setattr(result, field, None)
+
+    assert score_bet(bet, result) == 0
+    assert score_matrix(as_matrix([bet]), result_vector(result)).tolist() == [0]
+
+def test_stats_deltas_hits_add_up_to_points():
+    rng = random.Random(7)
+    bets = [random_picks(rng) for _ in range(100)]
+    old_result, new_result = random_picks(rng), random_picks(rng)
+    picks = as_matrix(bets)
+
+    old_vector = snapshot_vector({f: getattr(old_result, f) for f in PICK_FIELDS})
+    new_vector = result_vector(new_result)
+    old_points = score_matrix(picks, old_vector)
+    new_points = score_matrix(picks, new_vector)
+    deltas = stats_deltas(picks, old_vector, new_vector, old_points, new_points, race_delta=0)
+
+    hits = deltas["pole_hits"] + deltas["dotd_hits"] + deltas["winner_hits"] + deltas["exact_hits"]
+    assert hits.tolist() == deltas["points"].tolist()